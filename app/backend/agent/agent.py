@@ -1,151 +1,360 @@
-import asyncio
-from typing import TypedDict, List, Dict, Any, Annotated
-from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.runnables import RunnableLambda
-from langchain_core.messages import ToolMessage
-from langchain_core.tools import tool
-from app.backend.services.market_data import get_market_data
-from app.backend.services.retrieval import get_vector_store
-from app.backend.services.synthesis import get_llm_service
-from app.backend.agent.tools import get_tools, TOOL_MAP
-import google.generativeai.types as genai_types
-
-
-class AgentState(TypedDict):
-    prompt: str
-    plan: str
-    tool_calls: List[Dict[str, Any]]
-    context: List[str]
-    output: str
-    replan_count: int
-
-# --- Services and Tools ---
-llm_service = get_llm_service()
-vector_store_service = get_vector_store()
-market_data_service = get_market_data()
-tools = get_tools()
-tool_declarations = [genai_types.FunctionDeclaration.from_callable(f) for f in tools]
-gemini_tools = [genai_types.Tool(function_declarations=tool_declarations)]
-
-
-# --- Nodes ---
-async def planner_node(state: AgentState):
-    print("---PLANNER---")
-    if state.get("replan_count", 0) > 3:
-        # If we've replanned too many times, we might be in a loop.
-        return {"output": "I'm sorry, I'm having trouble finding the answer. Please try rephrasing your question."}
-
-    response = await llm_service.generate_plan(state["prompt"], gemini_tools)
-    
-    tool_calls = []
-    plan_text = ""
-    for part in response.content:
-        if part.type == "tool_call":
-            tool_calls.append({
-                "name": part.name,
-                "args": part.input
-            })
-        elif part.type == "text":
-            plan_text += part.text
-
-    return {
-        "plan": plan_text,
-        "tool_calls": tool_calls,
-        "replan_count": state.get("replan_count", 0) + 1
-    }
-
-def toolbox_node(state: AgentState):
-    print("---TOOLBOX---")
-    context = state.get("context", [])
-    tool_calls = state["tool_calls"]
-    
-    for call in tool_calls:
-        tool_name = call["name"]
-        tool_args = call["args"]
-        if tool_name in TOOL_MAP:
-            result = TOOL_MAP[tool_name](**tool_args)
-            context.append(f"Tool: {tool_name}\nArguments: {tool_args}\nResult: {result}\n")
-    
-    return {"context": context}
-
-async def evaluator_node(state: AgentState):
-    print("---EVALUATOR---")
-    question = state["prompt"]
-    context = state["context"]
-    
-    if not context:
-        # No context gathered, need to replan
-        return {"context_enough": "REPLAN"}
-        
-    evaluation = await llm_service.evaluate_context(question, context)
-    
-    if "CONTINUE" in evaluation:
-        return {"context_enough": "CONTINUE"}
-    else:
-        return {"context_enough": "REPLAN"}
-
-async def synthesis_node(state: AgentState):
-    print("---SYNTHESIS---")
-    question = state["prompt"]
-    context = state["context"]
-    answer = await llm_service.synthesize_with_context(question, context)
-    return {"output": answer}
-
-# --- Conditional Edges ---
-def should_continue(state: AgentState):
-    if state.get("output"):
-        return END # If we have an output from planner (error) or synthesis
-    if state["tool_calls"]:
-        return "toolbox"
-    # If no tool calls, maybe the planner answered directly or has a question.
-    # For now, let's synthesize with what we have (empty context).
-    return "synthesis"
-
-def after_evaluator(state: AgentState):
-    if state["context_enough"] == "CONTINUE":
-        return "synthesis"
-    else:
-        return "planner"
-
-# --- Graph ---
-def create_graph():
-    workflow = StateGraph(AgentState)
-
-    workflow.add_node("planner", planner_node)
-    workflow.add_node("toolbox", toolbox_node)
-    workflow.add_node("evaluator", evaluator_node)
-    workflow.add_node("synthesis", synthesis_node)
-
-    workflow.set_entry_point("planner")
-
-    workflow.add_conditional_edges(
-        "planner",
-        should_continue,
-    )
-    workflow.add_edge("toolbox", "evaluator")
-    workflow.add_conditional_edges(
-        "evaluator",
-        after_evaluator,
-        {"CONTINUE": "synthesis", "REPLAN": "planner"},
-    )
-    workflow.add_edge("synthesis", END)
-
-    memory = MemorySaver()
-    app = workflow.compile(checkpointer=memory)
-    return app
-
-async def run_agent(question: str):
-    app = create_graph()
-    config = {"configurable": {"thread_id": "1"}}
-    async for event in app.astream(
-        {"prompt": question, "replan_count": 0},
-        config=config,
-    ):
-        for k, v in event.items():
-            if k != "__end__":
-                print(v)
-
-if __name__ == "__main__":
-    asyncio.run(run_agent("What were the earnings for NVDA in the last quarter?"))
-
+import asyncio
+import logging
+import operator
+import orjson
+import time
+import uuid
+from functools import lru_cache
+from typing import TypedDict, List, Dict, Any, Annotated, AsyncIterator, Callable, Optional
+from langgraph.graph import StateGraph, END
+from langgraph.config import get_stream_writer
+from langchain_core.runnables import RunnableLambda
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import tool
+from app.backend.services.market_data import get_market_data
+from app.backend.services.retrieval import get_vector_store
+from app.backend.services.synthesis import get_llm_service
+from app.backend.services.model_policy import get_model_policy
+from app.backend.services.profiler import staged
+from app.backend.agent.tools import get_tools, TOOL_MAP
+from app.backend.agent.intent_router import get_intent_router
+from app.backend.agent.speculation import SpeculationMetrics, evaluate_with_draft, has_data
+from app.backend.utils.shared_state import get_checkpointer
+from utils.config import Config
+import google.generativeai.types as genai_types
+
+logger = logging.getLogger("finbreaker")
+
+class AgentState(TypedDict):
+    prompt: str
+    plan: str
+    tool_calls: List[Dict[str, Any]]
+    context: List[str]
+    output: str
+    replan_count: int
+    context_enough: str
+    tools_ok: bool
+    budget: Dict[str, float]
+    model_log: Annotated[List[Dict[str, Any]], operator.add]
+    stream: bool
+
+# --- Services and Tools ---
+llm_service = get_llm_service()
+vector_store_service = get_vector_store()
+market_data_service = get_market_data()
+intent_router = get_intent_router()
+speculation = SpeculationMetrics()
+model_policy = get_model_policy()
+tools = get_tools()
+tool_declarations = [genai_types.FunctionDeclaration.from_callable(f) for f in tools]
+gemini_tools = [genai_types.Tool(function_declarations=tool_declarations)]
+
+
+def token_writer(state: AgentState) -> Optional[Callable[[str], None]]:
+    """Streamed runs send answer text to the client as it is generated, whichever node writes it."""
+    if not state.get("stream"):
+        return None
+    writer = get_stream_writer()
+    return lambda text: writer({"event": "token", "text": text})
+
+
+# --- Nodes ---
+async def router_node(state: AgentState):
+    print("---ROUTER---")
+    # Common question shapes get a tool plan without the planner LLM round trip
+    route = await asyncio.to_thread(intent_router.route, state["prompt"])
+    if route is None:
+        return {"tool_calls": []}
+    return {"plan": f"Routed to {route['intent']} (score {route['score']:.2f})", "tool_calls": route["tool_calls"]}
+
+async def planner_node(state: AgentState):
+    print("---PLANNER---")
+    if state.get("replan_count", 0) > 3:
+        # If we've replanned too many times, we might be in a loop.
+        return {"output": "I'm sorry, I'm having trouble finding the answer. Please try rephrasing your question."}
+
+    choice = model_policy.choose("planner", state["budget"], state.get("model_log", []))
+    start = time.perf_counter()
+    response = await llm_service.generate_plan(state["prompt"], gemini_tools, choice)
+    elapsed = time.perf_counter() - start
+    intent_router.record_planner_latency(elapsed)
+    
+    tool_calls = []
+    plan_text = ""
+    for part in response.content:
+        if part.type == "tool_call":
+            tool_calls.append({
+                "name": part.name,
+                "args": part.input
+            })
+        elif part.type == "text":
+            plan_text += part.text
+
+    return {
+        "plan": plan_text,
+        "tool_calls": tool_calls,
+        "replan_count": state.get("replan_count", 0) + 1,
+        "model_log": [model_policy.observe(choice, elapsed, response.usage)],
+    }
+
+async def toolbox_node(state: AgentState):
+    print("---TOOLBOX---")
+    context = state.get("context", [])
+    tool_calls = [call for call in state["tool_calls"] if call["name"] in TOOL_MAP]
+
+    # Tools are independent upstream calls; each provider pool bounds its own concurrency
+    start = time.perf_counter()
+    writer = get_stream_writer() if state.get("stream") else None
+
+    async def run(i: int, call: Dict[str, Any]):
+        try:
+            return i, await TOOL_MAP[call["name"]](**call["args"])
+        except Exception as e:
+            return i, e
+
+    results: List[Any] = [None] * len(tool_calls)
+    # Stream each result as soon as its tool returns; the context keeps the planned order
+    for finished in asyncio.as_completed([run(i, call) for i, call in enumerate(tool_calls)]):
+        i, result = await finished
+        results[i] = result
+        if writer:
+            writer(tool_event(tool_calls[i], result, time.perf_counter() - start))
+    model_policy.observe_tools(time.perf_counter() - start)
+    for call, result in zip(tool_calls, results):
+        if isinstance(result, Exception):
+            result = {"error": str(result)}
+        context.append(f"Tool: {call['name']}\nArguments: {call['args']}\nResult: {result}\n")
+
+    return {"context": context, "tools_ok": bool(tool_calls) and all(has_data(result) for result in results)}
+
+async def evaluator_node(state: AgentState):
+    print("---EVALUATOR---")
+    question = state["prompt"]
+    context = state["context"]
+    
+    if not context:
+        # No context gathered, need to replan
+        return {"context_enough": "REPLAN"}
+
+    if Config.EVALUATOR_SKIP_ON_CLEAN_TOOLS and state.get("tools_ok"):
+        # Every planned tool returned data; the LLM verdict would almost always be CONTINUE
+        speculation.record_skip()
+        return {"context_enough": "CONTINUE"}
+
+    budget, log = state["budget"], state.get("model_log", [])
+    if Config.SPECULATIVE_SYNTHESIS:
+        # Both calls run side by side, so neither has to leave time for the other
+        eval_choice = model_policy.choose("evaluator", budget, log, after=())
+        draft_choice = model_policy.choose("synthesis", budget, log)
+        entries = []
+        verdict, draft = await evaluate_with_draft(
+            llm_service, question, context, speculation, eval_choice, draft_choice,
+            observe=lambda choice, seconds, usage: entries.append(model_policy.observe(choice, seconds, usage)),
+            on_token=token_writer(state),
+        )
+        update = {"context_enough": verdict, "model_log": entries}
+        return {**update, "output": draft} if draft else update
+
+    choice = model_policy.choose("evaluator", budget, log)
+    start = time.perf_counter()
+    response = await llm_service.evaluate(question, context, choice)
+    elapsed = time.perf_counter() - start
+    speculation.record_evaluation(elapsed)
+    entry = model_policy.observe(choice, elapsed, response.usage)
+    
+    if "CONTINUE" in response.content[0].text:
+        return {"context_enough": "CONTINUE", "model_log": [entry]}
+    else:
+        return {"context_enough": "REPLAN", "model_log": [entry]}
+
+async def synthesis_node(state: AgentState):
+    print("---SYNTHESIS---")
+    question = state["prompt"]
+    context = state.get("context", [])
+    choice = model_policy.choose("synthesis", state["budget"], state.get("model_log", []))
+    start = time.perf_counter()
+    response = await llm_service.synthesize(question, context, choice, on_token=token_writer(state))
+    entry = model_policy.observe(choice, time.perf_counter() - start, response.usage)
+    return {"output": response.content[0].text, "model_log": [entry]}
+
+# --- Conditional Edges ---
+def after_router(state: AgentState):
+    return "toolbox" if state.get("tool_calls") else "planner"
+
+def should_continue(state: AgentState):
+    if state.get("output"):
+        return END # If we have an output from planner (error) or synthesis
+    if state["tool_calls"]:
+        return "toolbox"
+    # If no tool calls, maybe the planner answered directly or has a question.
+    # For now, let's synthesize with what we have (empty context).
+    return "synthesis"
+
+def after_evaluator(state: AgentState):
+    if state.get("output"):
+        return "DONE"  # the speculative draft was accepted
+    return state["context_enough"]
+
+# --- Graph ---
+def create_graph():
+    workflow = StateGraph(AgentState)
+
+    # Each node tags its context with its name so profiler samples are attributed to the stage
+    workflow.add_node("router", staged("router", router_node))
+    workflow.add_node("planner", staged("planner", planner_node))
+    workflow.add_node("toolbox", staged("toolbox", toolbox_node))
+    workflow.add_node("evaluator", staged("evaluator", evaluator_node))
+    workflow.add_node("synthesis", staged("synthesis", synthesis_node))
+
+    if Config.INTENT_ROUTER_ENABLED:
+        workflow.set_entry_point("router")
+        workflow.add_conditional_edges("router", after_router, ["toolbox", "planner"])
+    else:
+        workflow.set_entry_point("planner")
+
+    workflow.add_conditional_edges(
+        "planner",
+        should_continue,
+    )
+    workflow.add_edge("toolbox", "evaluator")
+    workflow.add_conditional_edges(
+        "evaluator",
+        after_evaluator,
+        {"CONTINUE": "synthesis", "REPLAN": "planner", "DONE": END},
+    )
+    workflow.add_edge("synthesis", END)
+
+    memory = get_checkpointer()
+    app = workflow.compile(checkpointer=memory)
+    return app
+
+@lru_cache
+def get_graph():
+    return create_graph()
+
+def initial_state(
+    question: str,
+    latency_budget: Optional[float] = None,
+    token_budget: Optional[int] = None,
+    stream: bool = False,
+) -> Dict:
+    return {
+        "prompt": question,
+        "replan_count": 0,
+        "budget": model_policy.new_budget(latency_budget, token_budget),
+        "model_log": [],
+        "stream": stream,
+    }
+
+async def run_question(question: str, latency_budget: Optional[float] = None, token_budget: Optional[int] = None) -> Dict:
+    """
+    Run the agent graph to completion under a latency and token budget.
+
+    Args:
+        question (str): the user's question
+        latency_budget (float): seconds for the whole request; Config.REQUEST_LATENCY_BUDGET_SECONDS if None
+        token_budget (int): input plus output tokens across all LLM calls; Config.REQUEST_TOKEN_BUDGET if None
+
+    Returns:
+        dict: {"answer": str, "models": per-stage model choices and realized latency, "latency_ms": int}
+    """
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    start = time.perf_counter()
+    state = await get_graph().ainvoke(initial_state(question, latency_budget, token_budget), config=config)
+    latency_ms = round((time.perf_counter() - start) * 1000)
+    models = state.get("model_log", [])
+    logger.info(
+        f"Answered in {latency_ms}ms: "
+        + ", ".join(f"{entry['stage']}={entry['model']} {entry['latency_ms']}ms" for entry in models)
+    )
+    return {"answer": state.get("output", ""), "models": models, "latency_ms": latency_ms}
+
+def tool_event(call: Dict[str, Any], result: Any, seconds: float) -> Dict[str, Any]:
+    """One finished tool call; JSON tool output is passed through as data rather than as a string."""
+    if isinstance(result, Exception):
+        payload = {"error": str(result)}
+    else:
+        try:
+            payload = orjson.loads(result) if isinstance(result, str) else result
+        except orjson.JSONDecodeError:
+            payload = result
+    return {
+        "event": "tool",
+        "name": call["name"],
+        "args": call["args"],
+        "ok": has_data(result),
+        "result": payload,
+        "ms": round(seconds * 1000),
+    }
+
+def progress_event(node: str, update: Dict[str, Any]) -> Dict[str, Any]:
+    """What a client needs to show for a finished node: its plan, the tools it planned or ran, or the evaluator's verdict."""
+    event = {"event": "progress", "stage": node}
+    if update.get("plan"):
+        event["plan"] = update["plan"]
+    if node in ("router", "planner", "toolbox") and update.get("tool_calls") is not None:
+        event["tools"] = [call["name"] for call in update["tool_calls"]]
+    if node in ("router", "planner") and update.get("tool_calls"):
+        event["tool_calls"] = update["tool_calls"]
+    if node == "toolbox":
+        event["tools_ok"] = update.get("tools_ok", False)
+    if node == "evaluator":
+        event["verdict"] = update.get("context_enough")
+        if update.get("output"):
+            event["speculative_answer"] = True  # the draft written alongside the evaluator was kept
+    if update.get("model_log"):
+        event["models"] = update["model_log"]
+    return event
+
+async def stream_question(
+    question: str,
+    latency_budget: Optional[float] = None,
+    token_budget: Optional[int] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run the agent graph like `run_question`, yielding events as it goes.
+
+    Yields:
+        dict: a `progress` event as each node finishes (with `node_ms`, the time since the previous
+            node finished), a `tool` event as each tool returns, `token` events while the answer is
+            generated, then one `answer` event with the same fields `run_question` returns.
+            Every event carries `ts`, a Unix timestamp.
+    """
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    start = last = time.perf_counter()
+    answer, models = "", []
+    async for mode, chunk in get_graph().astream(
+        initial_state(question, latency_budget, token_budget, stream=True),
+        config=config,
+        stream_mode=["updates", "custom"],
+    ):
+        if mode == "custom":
+            yield {**chunk, "ts": time.time()}
+            continue
+        for node, update in chunk.items():
+            update = update or {}
+            answer = update.get("output") or answer
+            models += update.get("model_log", [])
+            now = time.perf_counter()
+            yield {**progress_event(node, update), "node_ms": round((now - last) * 1000), "ts": time.time()}
+            last = now
+    yield {
+        "event": "answer",
+        "answer": answer,
+        "models": models,
+        "latency_ms": round((time.perf_counter() - start) * 1000),
+        "ts": time.time(),
+    }
+
+async def answer_question(question: str) -> str:
+    """Run the agent graph to completion and return the final answer."""
+    return (await run_question(question))["answer"]
+
+async def run_agent(question: str):
+    async for event in stream_question(question):
+        if event["event"] != "token":
+            print(event)
+
+if __name__ == "__main__":
+    asyncio.run(run_agent("What were the earnings for NVDA in the last quarter?"))
+
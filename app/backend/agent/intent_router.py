@@ -0,0 +1,270 @@
+# Intent Router
+# Deterministic fast path in front of the LLM planner for the common question shapes
+
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from utils.config import Config
+from app.backend.services.market_data import NEWS_TOPICS
+from app.backend.services.retrieval import get_vector_store
+import json
+import logging
+import numpy as np
+import re
+import time
+
+logger = logging.getLogger("finbreaker")
+
+TICKER_PATTERN = re.compile(r"(\$?)\b([A-Z]{1,5}(?:\.[A-Z])?)\b")
+WORD_PATTERN = re.compile(r"[A-Za-z0-9&.'-]+")
+COMPANY_SUFFIXES = re.compile(
+    r"[,.]|\b(inc|incorporated|corp|corporation|co|company|ltd|limited|plc|holdings?|group|sa|ag|nv|se|adr|com|the)\b"
+)
+# All-caps words that are also listed symbols; only taken as tickers when written as $TICKER
+AMBIGUOUS_TICKERS = frozenset(
+    "A AI ALL AM ARE BE BIG CAN CEO EPS FOR GO HAS I IPO IT NEW NOW ON ONE OR OUT Q SO SEE TWO US USA WELL".split()
+)
+WATCHLIST_WORDS = re.compile(r"\b(our|my) (watchlist|portfolio|book|holdings)\b")
+# Topic labels that are also everyday question words ("NVDA's earnings", "finance team"). Next to a
+# ticker or watchlist they are left in place for the classifier, unless used as a sector ("technology news")
+GENERIC_TOPICS = frozenset(("earnings", "finance", "technology", "ipo"))
+SECTOR_NOUNS = r"(news|headlines|sector|stocks|industry|markets?)"
+
+# Entities are masked before embedding, so exemplars are written with the same placeholders
+MASKS = {"tickers": "the company", "topics": "the sector", "watchlist": "the portfolio"}
+INTENT_EXEMPLARS = {
+    "earnings": [
+        "What were the company's earnings last quarter?",
+        "Did the company beat earnings estimates?",
+        "Show me the earnings surprise for the company",
+        "What EPS did the company report?",
+        "When does the company report earnings and what is the estimate?",
+        "How did the company do in its latest quarterly results?",
+    ],
+    "price": [
+        "What is the company's stock price?",
+        "How is the company trading today?",
+        "Price of the company right now",
+        "How much did the company's shares move today?",
+        "Show the company's stock chart for the last month",
+        "What did the company close at yesterday?",
+    ],
+    "company_news": [
+        "What's the latest news on the company?",
+        "Any headlines about the company today?",
+        "Why is the company in the news?",
+        "Summarize recent news for the company",
+        "What are analysts saying about the company this week?",
+    ],
+    "topic_news": [
+        "What's the latest news in the sector?",
+        "Give me the sector headlines",
+        "Summarize news about the sector",
+        "Any major developments in the sector today?",
+        "What is happening in the sector market?",
+    ],
+    "exposure": [
+        "What's our risk exposure in the portfolio today, and highlight any earnings surprises?",
+        "How exposed are we to the portfolio?",
+        "Give me a risk summary for the portfolio",
+        "How is the portfolio doing today?",
+        "Morning brief for the portfolio",
+        "Summarize the overnight news for the portfolio",
+    ],
+}
+
+
+def simplify_name(name: str) -> str:
+    """"Apple Inc." -> "apple"; used to match company names in questions."""
+    return " ".join(COMPANY_SUFFIXES.sub(" ", name.lower().replace("'s", "")).split())
+
+
+def load_symbols(path: str) -> Dict[str, Optional[str]]:
+    """Load {ticker: company name} from an SEC company_tickers.json file, if present."""
+    try:
+        data = json.loads(Path(path).read_text())
+    except (FileNotFoundError, ValueError) as e:
+        logger.info(f"No symbol list loaded from {path}: {e}")
+        return {}
+    return {row["ticker"].upper(): row.get("title") for row in data.values()}
+
+
+class IntentRouter:
+    """
+    Maps a question to a tool plan without calling the LLM.
+
+    Entities come from the symbol list, the topic list of `fetch_topic_news` and the configured
+    watchlists. The intent is the nearest exemplar by embedding similarity over the masked
+    question. Anything below the confidence thresholds is left to the LLM planner.
+    """
+
+    def __init__(self, embeddings, symbols: Dict[str, Optional[str]], watchlists: Dict[str, List[str]]):
+        self.embeddings = embeddings
+        self.symbols = set(symbols)
+        self.names = {simplify_name(name): ticker for ticker, name in symbols.items() if name and len(simplify_name(name)) > 2}
+        self.max_name_words = max((len(name.split()) for name in self.names), default=0)
+        self.watchlists = {name.lower(): (name, tickers) for name, tickers in watchlists.items()}
+        self.topics = {}
+        for label, topic in NEWS_TOPICS.items():
+            self.topics[label.lower()] = topic
+            self.topics[label.lower().replace("&", "and")] = topic
+            self.topics[topic.replace("_", " ")] = topic
+        self._exemplars: Optional[Tuple[np.ndarray, List[str]]] = None
+        self._lock = Lock()
+        self.planner_latency: Optional[float] = None
+        self.decisions = Counter()
+
+    # --- Entities ---
+    def extract_entities(self, question: str) -> Dict:
+        """
+        Returns:
+            dict: tickers, topics and watchlist found in the question, plus the (text, placeholder)
+                mentions to mask before classification
+        """
+        tickers, mentions = [], []
+        for dollar, symbol in TICKER_PATTERN.findall(question):
+            if symbol in self.symbols and (dollar or symbol not in AMBIGUOUS_TICKERS):
+                mentions.append((dollar + symbol, MASKS["tickers"]))
+                if symbol not in tickers:
+                    tickers.append(symbol)
+
+        # Company names only count when capitalised, so "price target" is not Target Corp
+        words = WORD_PATTERN.findall(question)
+        for size in range(min(self.max_name_words, len(words)), 0, -1):
+            for i in range(len(words) - size + 1):
+                if not words[i][0].isupper():
+                    continue
+                phrase = " ".join(words[i:i + size])
+                ticker = self.names.get(simplify_name(phrase))
+                if ticker:
+                    mentions.append((phrase, MASKS["tickers"]))
+                    if ticker not in tickers:
+                        tickers.append(ticker)
+
+        lowered = question.lower()
+        watchlist = next((name for key, (name, _) in self.watchlists.items() if key in lowered), None)
+        topics = []
+        for phrase, topic in self.topics.items():
+            if not re.search(rf"\b{re.escape(phrase)}\b", lowered):
+                continue
+            if phrase in GENERIC_TOPICS and (tickers or watchlist):
+                if not re.search(rf"\b{re.escape(phrase)}\s+{SECTOR_NOUNS}\b", lowered):
+                    continue
+            mentions.append((phrase, MASKS["topics"]))
+            if topic not in topics:
+                topics.append(topic)
+
+        if watchlist:
+            mentions.append((watchlist, MASKS["watchlist"]))
+        elif len(self.watchlists) == 1 and WATCHLIST_WORDS.search(lowered):
+            watchlist = next(iter(self.watchlists.values()))[0]
+
+        return {"tickers": tickers, "topics": topics, "watchlist": watchlist, "mentions": mentions}
+
+    @staticmethod
+    def mask(question: str, entities: Dict) -> str:
+        # Longest first, so a watchlist name is masked before a topic word inside it
+        for text, placeholder in sorted(entities["mentions"], key=lambda m: len(m[0]), reverse=True):
+            question = re.sub(rf"(?<!\w){re.escape(text)}(?!\w)", placeholder, question, flags=re.I)
+        return question
+
+    # --- Classifier ---
+    def _exemplar_matrix(self) -> Tuple[np.ndarray, List[str]]:
+        with self._lock:
+            if self._exemplars is None:
+                labels = [intent for intent, texts in INTENT_EXEMPLARS.items() for _ in texts]
+                texts = [text for texts in INTENT_EXEMPLARS.values() for text in texts]
+                matrix = np.asarray(self.embeddings.embed_documents(texts), dtype="float32")
+                matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+                self._exemplars = (matrix, labels)
+        return self._exemplars
+
+    def classify(self, text: str) -> Tuple[str, float, float]:
+        """
+        Returns:
+            tuple: (intent, cosine score of its nearest exemplar, margin over the runner-up intent)
+        """
+        matrix, labels = self._exemplar_matrix()
+        query = np.asarray(self.embeddings.embed_query(text), dtype="float32")
+        scores = matrix @ (query / np.linalg.norm(query))
+        best: Dict[str, float] = {}
+        for label, score in zip(labels, scores.tolist()):
+            best[label] = max(best.get(label, -1.0), score)
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        return ranked[0][0], ranked[0][1], ranked[0][1] - ranked[1][1]
+
+    # --- Plans ---
+    def build_plan(self, intent: str, entities: Dict, question: str) -> Optional[List[Dict]]:
+        tickers = entities["tickers"]
+        if entities["watchlist"] and (intent == "exposure" or not tickers):
+            tickers = self.watchlists[entities["watchlist"].lower()][1]
+        if len(tickers) > Config.INTENT_ROUTER_MAX_TICKERS:
+            return None
+
+        if intent == "earnings" and tickers:
+            return [{"name": "fetch_earnings", "args": {"ticker": t}} for t in tickers]
+        if intent == "price" and tickers:
+            return [{"name": "fetch_time_series_market_data", "args": {"ticker": t}} for t in tickers]
+        if intent == "company_news" and tickers:
+            return [{"name": "fetch_company_news", "args": {"ticker": t}} for t in tickers]
+        if intent == "topic_news" and entities["topics"]:
+            return [{"name": "fetch_topic_news", "args": {"topic": topic}} for topic in entities["topics"]]
+        if intent == "exposure" and tickers:
+            calls = []
+            for t in tickers:
+                calls.append({"name": "fetch_time_series_market_data", "args": {"ticker": t}})
+                calls.append({"name": "fetch_earnings", "args": {"ticker": t}})
+            calls.append({"name": "retrieve_from_vector_store", "args": {"query": question}})
+            return calls
+        return None
+
+    def route(self, question: str) -> Optional[Dict]:
+        """
+        Returns:
+            dict: {"intent", "score", "tool_calls"} when confident, otherwise None (use the LLM planner)
+        """
+        start = time.perf_counter()
+        entities = self.extract_entities(question)
+        intent, score, margin = self.classify(self.mask(question, entities))
+        plan = None
+        if score < Config.INTENT_ROUTER_MIN_SCORE:
+            reason = f"low score {score:.2f}"
+        elif margin < Config.INTENT_ROUTER_MIN_MARGIN:
+            reason = f"ambiguous (margin {margin:.2f})"
+        else:
+            plan = self.build_plan(intent, entities, question)
+            reason = "missing or too many entities"
+        elapsed = time.perf_counter() - start
+
+        if plan is None:
+            self.decisions["deferred"] += 1
+            logger.info(
+                f"Intent router deferred to planner: {intent} {reason}, tickers={entities['tickers']} "
+                f"topics={entities['topics']} watchlist={entities['watchlist']} ({elapsed * 1000:.0f}ms)"
+            )
+            return None
+
+        self.decisions[intent] += 1
+        saved = f"~{(self.planner_latency - elapsed) * 1000:.0f}ms" if self.planner_latency else "n/a"
+        logger.info(
+            f"Intent router: {intent} (score={score:.2f}, margin={margin:.2f}) -> {len(plan)} tool calls "
+            f"in {elapsed * 1000:.0f}ms, planner latency saved {saved}"
+        )
+        return {"intent": intent, "score": score, "tool_calls": plan}
+
+    def record_planner_latency(self, seconds: float):
+        """Running average of LLM planner round trips, used to report the latency saved."""
+        self.planner_latency = seconds if self.planner_latency is None else 0.8 * self.planner_latency + 0.2 * seconds
+
+    def stats(self) -> Dict:
+        return {"decisions": dict(self.decisions), "planner_latency_ms": round(self.planner_latency * 1000) if self.planner_latency else None}
+
+
+@lru_cache
+def get_intent_router() -> IntentRouter:
+    symbols = load_symbols(Config.SYMBOLS_FILE)
+    for ticker in Config.WATCHLIST_TICKERS + [t for tickers in Config.BRIEF_WATCHLISTS.values() for t in tickers]:
+        symbols.setdefault(ticker, None)
+    return IntentRouter(get_vector_store().embeddings, symbols, Config.BRIEF_WATCHLISTS)
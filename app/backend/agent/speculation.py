@@ -0,0 +1,158 @@
+# Speculative Synthesis
+# Drafts the answer while the evaluator is still deciding, and skips the evaluator when tool output is clean
+
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import orjson
+import time
+
+logger = logging.getLogger("finbreaker")
+
+NO_DATA = ("", "No data found")
+
+
+def has_data(result: Any) -> bool:
+    """Cheap sufficiency check on one tool result: not an error, not empty."""
+    if result is None or isinstance(result, Exception):
+        return False
+    if isinstance(result, str):
+        if result.strip() in NO_DATA:
+            return False
+        try:
+            result = orjson.loads(result)
+        except orjson.JSONDecodeError:
+            return True  # free text from a tool still counts as data
+    if isinstance(result, dict):
+        return "error" not in result and any(result.values())
+    return bool(result)
+
+
+class SpeculationMetrics:
+    """Latency saved by speculation and evaluator skips, and tokens spent on discarded drafts."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skips = 0
+        self.cancelled_drafts = 0
+        self.saved_seconds = 0.0
+        self.wasted_input_tokens = 0
+        self.wasted_output_tokens = 0
+        self.evaluator_latency: Optional[float] = None
+
+    def record_evaluation(self, seconds: float):
+        with self._lock:
+            self.evaluator_latency = seconds if self.evaluator_latency is None else 0.8 * self.evaluator_latency + 0.2 * seconds
+
+    def record_hit(self, evaluation_seconds: float, draft_seconds: float, wall_seconds: float):
+        # Serially this would have been evaluation + synthesis
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += max(0.0, evaluation_seconds + draft_seconds - wall_seconds)
+
+    def record_miss(self, usage=None):
+        """A REPLAN verdict threw the draft away; usage is None if it was cancelled mid-flight."""
+        with self._lock:
+            self.misses += 1
+            if usage is None:
+                self.cancelled_drafts += 1
+            else:
+                self.wasted_input_tokens += usage.input_tokens
+                self.wasted_output_tokens += usage.output_tokens
+
+    def record_skip(self):
+        with self._lock:
+            self.skips += 1
+            self.saved_seconds += self.evaluator_latency or 0.0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            speculated = self.hits + self.misses
+            return {
+                "speculative_hits": self.hits,
+                "speculative_misses": self.misses,
+                "hit_rate": round(self.hits / speculated, 3) if speculated else None,
+                "cancelled_drafts": self.cancelled_drafts,
+                "wasted_input_tokens": self.wasted_input_tokens,
+                "wasted_output_tokens": self.wasted_output_tokens,
+                "evaluator_skips": self.skips,
+                "latency_saved_ms": round(self.saved_seconds * 1000),
+                "evaluator_latency_ms": round(self.evaluator_latency * 1000) if self.evaluator_latency else None,
+            }
+
+
+async def _timed(coro) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - start
+
+
+async def evaluate_with_draft(
+    llm_service,
+    question: str,
+    context: List[str],
+    metrics: SpeculationMetrics,
+    eval_choice=None,
+    draft_choice=None,
+    observe: Optional[Callable] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+) -> Tuple[str, Optional[str]]:
+    """
+    Run the evaluator and a draft synthesis concurrently.
+
+    Args:
+        eval_choice, draft_choice (ModelChoice): model limits for each call, from the model policy
+        observe (callable): called as observe(choice, seconds, usage) for every call that completes
+        on_token (callable): receives the draft's text as it is generated, once the evaluator has
+            accepted it; earlier chunks are held back and a discarded draft is never emitted
+
+    Returns:
+        tuple: (verdict, draft answer). The draft is None on REPLAN, or if drafting failed
+            and synthesis has to run normally.
+    """
+    observe = observe or (lambda *args: None)
+    start = time.perf_counter()
+    held: Optional[List[str]] = [] if on_token else None
+
+    def draft_token(text: str):
+        if held is None:
+            on_token(text)
+        else:
+            held.append(text)
+
+    kwargs = {"on_token": draft_token} if on_token else {}
+    draft = asyncio.create_task(_timed(llm_service.synthesize(question, context, draft_choice, **kwargs)))
+    try:
+        evaluation, evaluation_seconds = await _timed(llm_service.evaluate(question, context, eval_choice))
+    except BaseException:
+        draft.cancel()
+        raise
+    metrics.record_evaluation(evaluation_seconds)
+    observe(eval_choice, evaluation_seconds, evaluation.usage)
+
+    if "CONTINUE" not in evaluation.content[0].text:
+        if draft.done() and not draft.cancelled() and draft.exception() is None:
+            result, draft_seconds = draft.result()
+            metrics.record_miss(result.usage)
+            observe(draft_choice, draft_seconds, result.usage)
+        else:
+            draft.cancel()
+            metrics.record_miss()
+        logger.info("Evaluator asked to replan; speculative draft discarded")
+        return "REPLAN", None
+
+    if on_token:
+        chunks, held = held, None
+        for text in chunks:
+            on_token(text)
+    try:
+        result, draft_seconds = await draft
+    except Exception as e:
+        logger.warning(f"Speculative draft failed, synthesizing normally: {e}")
+        return "CONTINUE", None
+    metrics.record_hit(evaluation_seconds, draft_seconds, time.perf_counter() - start)
+    observe(draft_choice, draft_seconds, result.usage)
+    return "CONTINUE", result.content[0].text
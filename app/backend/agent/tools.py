@@ -1,87 +1,112 @@
-from app.backend.services.market_data import get_market_data
-from app.backend.services.retrieval import get_vector_store
-
-market_data_service = get_market_data()
-vector_store_service = get_vector_store()
-
-def search_ticker(query: str) -> str:
-    """
-    Search for a ticker symbol for a given company name.
-    Args:
-        query: The name of the company to search for.
-    Returns:
-        The ticker symbol for the company.
-    """
-    return market_data_service.search_ticker(query)
-
-def fetch_company_news(ticker: str) -> str:
-    """
-    Fetch company news for a given ticker symbol.
-    Args:
-        ticker: The ticker symbol of the company.
-    Returns:
-        The latest news about the company.
-    """
-    return market_data_service.fetch_company_news(ticker)
-
-def fetch_earnings(ticker: str) -> str:
-    """
-    Fetch earnings data for a given ticker symbol.
-    Args:
-        ticker: The ticker symbol of the company.
-    Returns:
-        The earnings data for the company.
-    """
-    return market_data_service.fetch_earnings(ticker)
-
-def fetch_topic_news(topic: str) -> str:
-    """
-    Fetch news on a given topic.
-    Args:
-        topic: The topic to search for news on.
-    Returns:
-        The latest news on the topic.
-    """
-    return market_data_service.fetch_topic_news(topic)
-
-def fetch_time_series_market_data(ticker: str) -> str:
-    """
-    Fetch time series market data for a given ticker symbol.
-    Args:
-        ticker: The ticker symbol of the company.
-    Returns:
-        The time series market data for the company.
-    """
-    return market_data_service.fetch_time_series_market_data(ticker)
-
-def retrieve_from_vector_store(query: str) -> str:
-    """
-    Retrieve relevant documents from the vector store for a given query.
-    Args:
-        query: The query to retrieve documents for.
-    Returns:
-        A list of relevant documents.
-    """
-    return str(vector_store_service.retrieve(query))
-
-
-def get_tools():
-    """Returns a list of all available tools."""
-    return [
-        search_ticker,
-        fetch_company_news,
-        fetch_earnings,
-        fetch_topic_news,
-        fetch_time_series_market_data,
-        retrieve_from_vector_store,
-    ]
-
-# We also need a mapping from tool name to tool function to execute them.
-TOOL_MAP = {
-    "search_ticker": search_ticker,
-    "fetch_company_news": fetch_company_news,
-    "fetch_earnings": fetch_earnings,
-    "fetch_topic_news": fetch_topic_news,
-    "fetch_time_series_market_data": fetch_time_series_market_data,
-    "retrieve_from_vector_store": retrieve_from_vector_store,
+import asyncio
+from app.backend.services.market_data import get_market_data
+from app.backend.services.retrieval import get_vector_store
+from app.backend.services.news_ingestion import get_news_ingestion
+from app.backend.utils.serialization import compact_json
+from app.backend.utils.shared_state import shared_cached
+from app.backend.agent.speculation import has_data
+from utils.config import Config
+
+market_data_service = get_market_data()
+vector_store_service = get_vector_store()
+news_ingestion_service = get_news_ingestion()
+
+
+def as_context(result) -> str:
+    """Tool results reach the model as compact JSON rather than Python reprs of DataFrames."""
+    return compact_json(result) if result is not None else "No data found"
+
+@shared_cached(ttl=Config.TOOL_CACHE_TTL_SECONDS, cache_if=has_data)
+async def search_ticker(query: str) -> str:
+    """
+    Search for a ticker symbol for a given company name.
+    Args:
+        query: The name of the company to search for.
+    Returns:
+        The ticker symbol for the company.
+    """
+    return as_context(await market_data_service.search_ticker(query))
+
+@shared_cached(ttl=Config.TOOL_CACHE_TTL_SECONDS, cache_if=has_data)
+async def fetch_company_news(ticker: str) -> str:
+    """
+    Fetch company news for a given ticker symbol.
+    Args:
+        ticker: The ticker symbol of the company.
+    Returns:
+        The latest news about the company.
+    """
+    # Served from the ingested news index; only go live for tickers nobody ingests
+    results = await asyncio.to_thread(news_ingestion_service.search, f"{ticker} latest news", ticker=ticker)
+    if results:
+        return compact_json(results)
+    return as_context(await market_data_service.fetch_company_news(ticker))
+
+@shared_cached(ttl=Config.TOOL_CACHE_TTL_SECONDS, cache_if=has_data)
+async def fetch_earnings(ticker: str) -> str:
+    """
+    Fetch earnings data for a given ticker symbol.
+    Args:
+        ticker: The ticker symbol of the company.
+    Returns:
+        The earnings data for the company.
+    """
+    return as_context(await market_data_service.fetch_earnings(ticker))
+
+@shared_cached(ttl=Config.TOOL_CACHE_TTL_SECONDS, cache_if=has_data)
+async def fetch_topic_news(topic: str) -> str:
+    """
+    Fetch news on a given topic.
+    Args:
+        topic: The topic to search for news on.
+    Returns:
+        The latest news on the topic.
+    """
+    results = await asyncio.to_thread(news_ingestion_service.search, f"{topic} news", topic=topic)
+    if results:
+        return compact_json(results)
+    return as_context(await market_data_service.fetch_topic_news([topic]))
+
+@shared_cached(ttl=Config.TOOL_CACHE_TTL_SECONDS, cache_if=has_data)
+async def fetch_time_series_market_data(ticker: str) -> str:
+    """
+    Fetch time series market data for a given ticker symbol.
+    Args:
+        ticker: The ticker symbol of the company.
+    Returns:
+        The time series market data for the company.
+    """
+    return as_context(await market_data_service.fetch_time_series_market_data(ticker))
+
+async def retrieve_from_vector_store(query: str, ticker: str = "") -> str:
+    """
+    Retrieve relevant documents from the vector store for a given query.
+    Args:
+        query: The query to retrieve documents for.
+        ticker: Optional ticker symbol to restrict the documents to.
+    Returns:
+        A list of relevant documents.
+    """
+    return compact_json(await asyncio.to_thread(vector_store_service.retrieve, query, ticker=ticker or None))
+
+
+def get_tools():
+    """Returns a list of all available tools."""
+    return [
+        search_ticker,
+        fetch_company_news,
+        fetch_earnings,
+        fetch_topic_news,
+        fetch_time_series_market_data,
+        retrieve_from_vector_store,
+    ]
+
+# We also need a mapping from tool name to tool function to execute them.
+TOOL_MAP = {
+    "search_ticker": search_ticker,
+    "fetch_company_news": fetch_company_news,
+    "fetch_earnings": fetch_earnings,
+    "fetch_topic_news": fetch_topic_news,
+    "fetch_time_series_market_data": fetch_time_series_market_data,
+    "retrieve_from_vector_store": retrieve_from_vector_store,
 } 
\ No newline at end of file
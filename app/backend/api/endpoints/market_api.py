@@ -1,52 +1,113 @@
-# API Agent
-# Handles polling of real-time & historical market data
-
-from fastapi import APIRouter, Depends
-from services.market_data import MarketDataService, get_market_data
-from app.backend.api.schema import MarketDataRequest, EarningsRequest, CompanyNewsRequest, TickerSearchRequest, TopicNewsRequest
-
-router = APIRouter(prefix="/api", tags=["Market API"])
-
-@router.post("/market_data")
-def get_market_data(
-    request: MarketDataRequest,
-    market_service: MarketDataService = Depends(get_market_data)
-    ):
-    return market_service.fetch_time_series_market_data(
-        ticker=request.ticker,
-        period=request.period,
-        interval=request.interval,
-        use_alpha=request.use_alpha
-    )
-
-@router.post("/earnings")
-def get_earnings(
-    request: EarningsRequest,
-    market_service: MarketDataService = Depends(get_market_data)
-    ):
-    return market_service.fetch_earnings(request.ticker)
-
-@router.post("/company_news")
-def get_company_news(
-    request: CompanyNewsRequest,
-    market_service: MarketDataService = Depends(get_market_data)
-    ):
-    return market_service.fetch_company_news(request.ticker)
-
-@router.post("/search_ticker")
-def search_ticker(
-    request: TickerSearchRequest,
-    market_service: MarketDataService = Depends(get_market_data)
-    ):
-    return market_service.search_ticker(request.company_name)
-
-@router.post("/topic_news")
-def get_topic_news(
-    request: TopicNewsRequest,
-    market_service: MarketDataService = Depends(get_market_data)
-    ):
-    return market_service.fetch_topic_news(request.tickers)
-    
-@router.get("/")
-def root():
-    return {"status": "API Agent running"}
\ No newline at end of file
+# API Agent
+# Handles polling of real-time & historical market data
+
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from app.backend.services.market_data import MarketDataService, get_market_data
+from app.backend.api.schema import (
+    MarketDataRequest, EarningsRequest, CompanyNewsRequest, TickerSearchRequest, TopicNewsRequest, QuotesRequest,
+    QuoteSubscription, Bars, Earnings, NewsFeed, Quote, TickerMatch,
+)
+from app.backend.services.quote_stream import QuoteHub, QuoteSubscriber, get_quote_hub
+from app.backend.utils.serialization import dumps
+import asyncio
+
+router = APIRouter(prefix="/api", tags=["Market API"])
+
+
+def found(result):
+    if result is None:
+        raise HTTPException(status_code=404, detail="No data found")
+    return result
+
+@router.post("/market_data", response_model=Bars)
+async def market_data(
+    request: MarketDataRequest,
+    market_service: MarketDataService = Depends(get_market_data)
+    ):
+    return found(await market_service.fetch_time_series_market_data(
+        ticker=request.ticker,
+        period=request.period,
+        interval=request.interval,
+        use_alpha=request.use_alpha
+    ))
+
+@router.post("/quotes", response_model=List[Quote], response_model_exclude_none=True)
+async def get_quotes(
+    request: QuotesRequest,
+    market_service: MarketDataService = Depends(get_market_data)
+    ):
+    return await market_service.fetch_quotes(request.tickers)
+
+@router.post("/earnings", response_model=Earnings, response_model_exclude_none=True)
+async def get_earnings(
+    request: EarningsRequest,
+    market_service: MarketDataService = Depends(get_market_data)
+    ):
+    return found(await market_service.fetch_earnings(request.ticker))
+
+@router.post("/company_news", response_model=NewsFeed, response_model_exclude_none=True)
+async def get_company_news(
+    request: CompanyNewsRequest,
+    market_service: MarketDataService = Depends(get_market_data)
+    ):
+    return found(await market_service.fetch_company_news(request.ticker))
+
+@router.post("/search_ticker", response_model=TickerMatch, response_model_exclude_none=True)
+async def search_ticker(
+    request: TickerSearchRequest,
+    market_service: MarketDataService = Depends(get_market_data)
+    ):
+    return found(await market_service.search_ticker(request.company_name))
+
+@router.post("/topic_news", response_model=NewsFeed, response_model_exclude_none=True)
+async def get_topic_news(
+    request: TopicNewsRequest,
+    market_service: MarketDataService = Depends(get_market_data)
+    ):
+    return found(await market_service.fetch_topic_news(request.tickers))
+
+@router.websocket("/quotes/stream")
+async def stream_quotes(websocket: WebSocket, hub: QuoteHub = Depends(get_quote_hub)):
+    """
+    Live quotes. Send {"subscribe": [...]} / {"unsubscribe": [...]}; receive {"quotes": [...]}
+    where the first entry per ticker is a full quote and later ones carry only changed fields.
+    """
+    await websocket.accept()
+    subscriber = QuoteSubscriber()
+
+    async def send():
+        while True:
+            await websocket.send_text(dumps(await subscriber.next_message()).decode())
+
+    sender = asyncio.create_task(send())
+    try:
+        while True:
+            try:
+                message = QuoteSubscription.model_validate(await websocket.receive_json())
+            except (ValidationError, ValueError) as e:
+                subscriber.notify(error=str(e))
+                continue
+            hub.unsubscribe(subscriber, message.unsubscribe)
+            hub.subscribe(subscriber, message.subscribe)
+            subscriber.notify(subscribed=sorted(subscriber.tickers))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(subscriber)
+
+@router.get("/quotes/stream/stats")
+def quote_stream_stats(hub: QuoteHub = Depends(get_quote_hub)):
+    """Symbols polled, connected clients, upstream calls and coalesced updates."""
+    return hub.stats()
+
+@router.get("/providers")
+def provider_stats(market_service: MarketDataService = Depends(get_market_data)):
+    """In-flight and queued calls per upstream provider."""
+    return market_service.provider_stats()
+
+@router.get("/")
+def root():
+    return {"status": "API Agent running"}
@@ -1,98 +1,334 @@
-from fastapi import APIRouter, Request
-import requests
-from typing import List
-from crewai import Crew, Agent, Task, LLM
-from crewai.tools import tool
-import logging
-from app.backend.services.market_data import MarketDataService
-from app.backend.services.retrieval import VectorStoreService
-from app.backend.services.synthesis import LLMService
-
-router = APIRouter(prefix="/orchestrator", tags=["Orchestrator"])
-logger = logging.getLogger("finbreaker")
-
-vector_store = VectorStoreService()
-
-
-@tool("Market Data")
-def market_data_tool(ticker: str, period: str = "1d", interval: str = "1d"):
-    """Fetch real-time and historical market data for a given ticker symbol."""
-    return MarketDataService.fetch_time_series_market_data(
-        ticker=ticker,
-        period=period,
-        interval=interval,
-    )
-
-@tool("Earnings")
-def earnings_tool(ticker: str):
-    """Fetch earnings data for a given ticker symbol."""
-    return MarketDataService.fetch_earnings(ticker)
-
-@tool("Company News")
-def company_news_tool(ticker: str):
-    """Fetch company news for a given ticker symbol."""
-    return MarketDataService.fetch_company_news(ticker)
-
-@tool("Ticker Search")
-def ticker_search_tool(company_name: str):
-    """Search for the most relevant ticker symbol for a given company name."""
-    return MarketDataService.search_ticker(company_name)
-
-@tool("Topic News")
-def topic_news_tool(tickers: List[str]):
-    """Fetch market news for given topic tickers."""
-    return MarketDataService.fetch_topic_news(tickers)
-
-@tool("Index Data")
-def index_data(docs: List[str]):
-    """Indexes the market data in a vector store to be used for querying."""
-    return vector_store.index_documents(docs)
-
-@tool("Retriever")
-def retriever_tool(query: str, max_results: int = 3):
-    """Retrieve relevant indexed financial documents for a given query using the vector store."""
-    return vector_store.retrieve(query, max_results)
-
-
-orchestrator_agent = Agent(
-    role="Market Analyst Agent",
-    goal="Answer complex finance questions using all available tools.",
-    backstory="You are an expert financial analyst with access to market data, filings, analytics, and document retrieval.",
-    tools=[ticker_search_tool, market_data_tool, earnings_tool, company_news_tool, topic_news_tool, index_data, retriever_tool]
-)
-
-tasks = [
-    Task(
-        agent=orchestrator_agent,
-        description="Assist a financial analyst in understading the data related to the question.",
-        expected_output="A comprehensive, analysis of the acquired information with the sources.",
-    )
-]
-
-llm = LLM(model="gemini/gemini-2.0-flash", temperature=0.3)
-
-crew = Crew(
-    agents=[orchestrator_agent],
-    process="sequential",
-    tasks=tasks,
-    llm=llm
-)
-
-
-@router.post("/morning_brief")
-async def morning_brief(request: Request):
-    """Orchestrate the full multi-agent workflow: transcribe audio (if needed), run CrewAI agents for market data, filings, risk analysis, and retrieval, then synthesize a final answer using the language agent and return both text and TTS audio."""
-    data = await request.json()
-    question = data.get("question")
-    logger.info(f"Received question for morning brief: {question}")
-
-    results = 
-    # Synthesize a final answer using the language agent
-    context_chunks = [str(r) for r in results]
-    answer = LLMService.synthesize_with_context(question, context_chunks)
-    return {"transcript": question, "answer": answer}
-
-@router.get("/")
-def root():
-    """Health check endpoint for the orchestrator service."""
-    return {"status": "Orchestrator running"}
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from types import SimpleNamespace
+import asyncio
+import io
+import time
+import weakref
+import requests
+from typing import List, Optional, Tuple
+from crewai import Crew, Agent, Task, LLM
+from crewai.tools import tool
+import logging
+from app.backend.services.market_data import get_market_data
+from app.backend.services.retrieval import get_vector_store
+from app.backend.services.synthesis import LLMService
+from app.backend.services.brief_precompute import get_brief_scheduler
+from app.backend.services.voice import get_voice_model
+from app.backend.api.schema import AgentRunRequest
+from app.backend.services.admission import BATCH, INTERACTIVE, Overloaded, RequestContext, current_request, get_admission
+from app.backend.services.profiler import authorized, get_profiler, stage
+from app.backend.agent.agent import intent_router, model_policy, run_question, speculation, stream_question
+from app.backend.utils.serialization import compact_json, dumps
+
+router = APIRouter(prefix="/orchestrator", tags=["Orchestrator"])
+logger = logging.getLogger("finbreaker")
+
+vector_store = get_vector_store()
+market_data_service = get_market_data()
+
+
+@tool("Market Data")
+def market_data_tool(ticker: str, period: str = "1d", interval: str = "1d"):
+    """Fetch real-time and historical market data for a given ticker symbol."""
+    # CrewAI runs tools synchronously, outside the server's event loop
+    return compact_json(asyncio.run(market_data_service.fetch_time_series_market_data(
+        ticker=ticker,
+        period=period,
+        interval=interval,
+    )))
+
+@tool("Earnings")
+def earnings_tool(ticker: str):
+    """Fetch earnings data for a given ticker symbol."""
+    return compact_json(asyncio.run(market_data_service.fetch_earnings(ticker)))
+
+@tool("Company News")
+def company_news_tool(ticker: str):
+    """Fetch company news for a given ticker symbol."""
+    return compact_json(asyncio.run(market_data_service.fetch_company_news(ticker)))
+
+@tool("Ticker Search")
+def ticker_search_tool(company_name: str):
+    """Search for the most relevant ticker symbol for a given company name."""
+    return compact_json(asyncio.run(market_data_service.search_ticker(company_name)))
+
+@tool("Topic News")
+def topic_news_tool(tickers: List[str]):
+    """Fetch market news for given topic tickers."""
+    return compact_json(asyncio.run(market_data_service.fetch_topic_news(tickers)))
+
+@tool("Index Data")
+def index_data(docs: List[str]):
+    """Indexes the market data in a vector store to be used for querying."""
+    return vector_store.index_documents(docs)
+
+@tool("Retriever")
+def retriever_tool(query: str, max_results: int = 3):
+    """Retrieve relevant indexed financial documents for a given query using the vector store."""
+    return vector_store.retrieve(query, max_results)
+
+
+orchestrator_agent = Agent(
+    role="Market Analyst Agent",
+    goal="Answer complex finance questions using all available tools.",
+    backstory="You are an expert financial analyst with access to market data, filings, analytics, and document retrieval.",
+    tools=[ticker_search_tool, market_data_tool, earnings_tool, company_news_tool, topic_news_tool, index_data, retriever_tool]
+)
+
+tasks = [
+    Task(
+        agent=orchestrator_agent,
+        description="Assist a financial analyst in understading the data related to the question.",
+        expected_output="A comprehensive, analysis of the acquired information with the sources.",
+    )
+]
+
+llm = LLM(model="gemini/gemini-2.0-flash", temperature=0.3)
+
+crew = Crew(
+    agents=[orchestrator_agent],
+    process="sequential",
+    tasks=tasks,
+    llm=llm
+)
+
+
+@router.post("/morning_brief")
+async def morning_brief(request: Request):
+    """
+    Answer a market question with text and TTS audio. Serves today's precomputed brief when the question and watchlist match one, otherwise runs the agent graph live.
+
+    Optional `latency_budget_ms` and `token_budget` bound the live run; model tiers degrade to fit them.
+    Live runs share the LLM admission queue per tenant (`X-Tenant-ID` header, else client address);
+    `"priority": "batch"` queues behind interactive traffic. Returns 429 with Retry-After when overloaded.
+    An `X-Profile` header carrying ADMIN_TOKEN profiles this request; see /admin/profiler. It is ignored when no token is configured.
+    """
+    profile = request.headers.get("X-Profile")
+    with get_profiler().request(force=profile is not None and authorized(profile)) as session:
+        result = await _morning_brief(request)
+    if session is not None:
+        result["profile_id"] = session.id
+    return result
+
+
+async def _transcribe(data: dict) -> str:
+    # The frontend sends WAV bytes as an ISO-8859-1 string
+    upload = SimpleNamespace(file=io.BytesIO(data["audio"].encode("ISO-8859-1")))
+    with stage("transcribe"):
+        return (await asyncio.to_thread(get_voice_model().transcribe, upload))["transcript"]
+
+
+async def _speak(answer: str) -> Optional[bytes]:
+    with stage("tts"):
+        return (await asyncio.to_thread(get_voice_model().speak, answer))["audio"]
+
+
+def _live_run(request: Request, data: dict, start: float) -> Tuple[RequestContext, Optional[float]]:
+    """Admission context and remaining latency budget for a live agent run."""
+    latency_budget = None
+    if data.get("latency_budget_ms"):
+        # Transcription already spent part of the budget
+        latency_budget = data["latency_budget_ms"] / 1000 - (time.perf_counter() - start)
+    priority = BATCH if data.get("priority") == BATCH else INTERACTIVE
+    tenant = request.headers.get("X-Tenant-ID") or (request.client.host if request.client else "anonymous")
+    deadline = time.monotonic() + latency_budget if latency_budget else None
+    return RequestContext(tenant, priority, deadline), latency_budget
+
+
+async def _morning_brief(request: Request) -> dict:
+    start = time.perf_counter()
+    data = await request.json()
+    question = data.get("question")
+    if not question and data.get("audio"):
+        question = await _transcribe(data)
+    logger.info(f"Received question for morning brief: {question}")
+
+    brief = get_brief_scheduler().lookup(question, data.get("watchlist"))
+    models = []
+    if brief:
+        logger.info(f"Serving precomputed brief for watchlist {brief['watchlist']!r}")
+        answer, audio = brief["answer"], brief["audio"]
+    else:
+        context, latency_budget = _live_run(request, data, start)
+        try:
+            # Shed here or never: the request's LLM calls then queue without being refused
+            with get_admission().request(context):
+                run = await run_question(question, latency_budget, data.get("token_budget"))
+        except Overloaded as e:
+            logger.warning(f"Shedding morning brief for {context.tenant!r}: {e}")
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        answer, models = run["answer"], run["models"]
+        audio = await _speak(answer)
+
+    return {
+        "transcript": question,
+        "answer": answer,
+        "audio": audio.decode("ISO-8859-1") if audio else None,
+        "precomputed": brief is not None,
+        "models": models,
+        "latency_ms": round((time.perf_counter() - start) * 1000),
+    }
+
+
+def _finish_with(stream, context: RequestContext) -> weakref.finalize:
+    """`finish` an admitted request once, when its stream ends or is dropped by a client that left before it started."""
+    return weakref.finalize(stream, get_admission().finish, context)
+
+
+def _encode(event: dict, start: float, sse: bool = False) -> bytes:
+    """One stream event stamped with `t_ms` since the request arrived, as an NDJSON line or an SSE message."""
+    data = dumps({**event, "t_ms": round((time.perf_counter() - start) * 1000)})
+    if sse:
+        return b"event: " + event["event"].encode() + b"\ndata: " + data + b"\n\n"
+    return data + b"\n"
+
+
+@router.post("/morning_brief/stream")
+async def morning_brief_stream(request: Request):
+    """
+    `/morning_brief` as an NDJSON stream, one event per line, so clients can render while the agents work.
+
+    Events, each with `t_ms` since the request arrived: `transcript`; `progress` as each agent stage
+    finishes (planned and ran tools, evaluator verdict); `token` chunks of the answer as it is generated;
+    `answer` with the full text and models; `audio` once TTS is done; `done` with the total latency.
+    A typed question that would be shed gets a 429 before the stream starts; a shed voice question
+    ends the stream with an `error` event instead.
+    """
+    start = time.perf_counter()
+    data = await request.json()
+    question = data.get("question")
+    live = None
+    if question and not get_brief_scheduler().lookup(question, data.get("watchlist")):
+        context, latency_budget = _live_run(request, data, start)
+        try:
+            live = get_admission().admit(context), latency_budget
+        except Overloaded as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    profile = request.headers.get("X-Profile")
+
+    def line(event: dict) -> bytes:
+        return _encode(event, start)
+
+    async def events():
+        nonlocal question, live, finished
+        with get_profiler().request(force=profile is not None and authorized(profile)) as session:
+            if not question and data.get("audio"):
+                question = await _transcribe(data)
+            yield line({"event": "transcript", "text": question})
+
+            brief = get_brief_scheduler().lookup(question, data.get("watchlist"))
+            if brief:
+                answer = brief["answer"]
+                yield line({"event": "answer", "answer": answer, "models": [], "precomputed": True})
+                audio = brief["audio"]
+            else:
+                if live is None:
+                    context, latency_budget = _live_run(request, data, start)
+                    try:
+                        # A voice question is only known now, so it is shed with an error event instead of a 429
+                        live = get_admission().admit(context), latency_budget
+                    except Overloaded as e:
+                        logger.warning(f"Shedding streamed morning brief for {context.tenant!r}: {e}")
+                        yield line({"event": "error", "status": 429, "detail": str(e), "retry_after": e.retry_after})
+                        return
+                    finished = _finish_with(stream, live[0])
+                context, latency_budget = live
+                token = current_request.set(context)
+                try:
+                    async for event in stream_question(question, latency_budget, data.get("token_budget")):
+                        if event["event"] == "answer":
+                            answer = event["answer"]
+                            event = {**event, "precomputed": False}
+                        yield line(event)
+                except Overloaded as e:
+                    logger.warning(f"Shedding streamed morning brief for {context.tenant!r}: {e}")
+                    yield line({"event": "error", "status": 429, "detail": str(e), "retry_after": e.retry_after})
+                    return
+                finally:
+                    current_request.reset(token)
+                    finished()
+                audio = await _speak(answer)
+
+            yield line({"event": "audio", "audio": audio.decode("ISO-8859-1") if audio else None})
+            done = {"event": "done", "latency_ms": round((time.perf_counter() - start) * 1000)}
+            yield line({**done, "profile_id": session.id} if session else done)
+
+    stream = events()
+    finished = _finish_with(stream, live[0]) if live else None  # also runs if a precomputed brief answers after all
+    # Proxies must not buffer the stream
+    return StreamingResponse(stream, media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
+@router.post("/agent/stream")
+async def agent_stream(
+    body: AgentRunRequest,
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|sse)$", description="Defaults to SSE when Accept is text/event-stream"),
+):
+    """
+    Run the agent graph for a question and stream every event as it happens; no precomputed briefs, no audio.
+
+    Events: `progress` as each node finishes (router/planner plan and tool calls, toolbox outcome,
+    evaluator verdict, models used, `node_ms` spent since the previous node); `tool` as each tool
+    returns, with its arguments, result and duration; `token` chunks of the answer; `answer`;
+    `done`. Every event carries `ts` (Unix time) and `t_ms` since the request arrived. Sent as NDJSON,
+    or as Server-Sent Events named after the event type. Admission works as for `/morning_brief`.
+    """
+    start = time.perf_counter()
+    sse = format == "sse" or (format is None and "text/event-stream" in request.headers.get("accept", ""))
+    data = body.model_dump()
+    context, latency_budget = _live_run(request, data, start)
+    try:
+        context = get_admission().admit(context)
+    except Overloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    async def events():
+        token = current_request.set(context)
+        try:
+            async for event in stream_question(body.question, latency_budget, body.token_budget):
+                yield _encode(event, start, sse)
+        except Overloaded as e:
+            logger.warning(f"Shedding streamed agent run for {context.tenant!r}: {e}")
+            yield _encode({"event": "error", "status": 429, "detail": str(e), "retry_after": e.retry_after, "ts": time.time()}, start, sse)
+            return
+        finally:
+            current_request.reset(token)
+            finished()
+        yield _encode({"event": "done", "latency_ms": round((time.perf_counter() - start) * 1000), "ts": time.time()}, start, sse)
+
+    stream = events()
+    finished = _finish_with(stream, context)
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
+    )
+
+
+@router.post("/briefs/precompute")
+async def precompute_briefs():
+    """Generate today's briefs now instead of waiting for the scheduled run."""
+    return await get_brief_scheduler().precompute_all()
+
+
+@router.get("/briefs")
+def list_briefs():
+    scheduler = get_brief_scheduler()
+    return {"date": scheduler.today().isoformat(), "briefs": scheduler.store.entries(scheduler.today())}
+
+@router.get("/agent/stats")
+def agent_stats():
+    """Intent router decisions, speculative synthesis hit rate, latency saved, tokens wasted, observed model latency and LLM queueing."""
+    return {
+        "router": intent_router.stats(),
+        "speculation": speculation.stats(),
+        "models": model_policy.stats(),
+        "admission": get_admission().stats(),
+    }
+
+@router.get("/")
+def root():
+    """Health check endpoint for the orchestrator service."""
+    return {"status": "Orchestrator running"}
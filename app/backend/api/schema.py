@@ -1,20 +1,136 @@
-from pydantic import BaseModel, Field
-from typing import List
-
-class MarketDataRequest(BaseModel):
-    ticker: str
-    period: str = "1d"
-    interval: str = "1d"
-    use_alpha: bool = False
-
-class EarningsRequest(BaseModel):
-    ticker: str
-
-class CompanyNewsRequest(BaseModel):
-    ticker: str
-
-class TickerSearchRequest(BaseModel):
-    company_name: str
-
-class TopicNewsRequest(BaseModel):
-    tickers: List[str] = Field(..., description="List of topic tickers for news (e.g. ['blockchain', 'earnings'])")
\ No newline at end of file
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+
+class MarketDataRequest(BaseModel):
+    ticker: str
+    period: str = "1d"
+    interval: str = "1d"
+    use_alpha: bool = False
+
+class EarningsRequest(BaseModel):
+    ticker: str
+
+class CompanyNewsRequest(BaseModel):
+    ticker: str
+
+class TickerSearchRequest(BaseModel):
+    company_name: str
+
+class TopicNewsRequest(BaseModel):
+    tickers: List[str] = Field(..., description="List of topic tickers for news (e.g. ['blockchain', 'earnings'])")
+
+class IndexRequest(BaseModel):
+    docs: List[str]
+    metadata: Optional[Dict[str, Any]] = Field(None, description="Metadata attached to every doc (e.g. {'ticker': 'TSM', 'source': 'filing'})")
+
+class RetrievalRequest(BaseModel):
+    query: str
+    k: int = 3
+    ticker: Optional[str] = None
+    source: Optional[str] = None
+    topic: Optional[str] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    mode: Literal["hybrid", "dense", "sparse"] = "hybrid"
+
+class DeleteRequest(BaseModel):
+    ids: List[int]
+
+class QuotesRequest(BaseModel):
+    tickers: List[str] = Field(..., description="Ticker symbols to quote in one call (e.g. ['TSM', 'BABA'])")
+
+class BackfillRequest(BaseModel):
+    tickers: List[str]
+    forms: Optional[List[str]] = Field(None, description="Form types to fetch (e.g. ['10-K', '20-F']); FILING_FORMS if omitted")
+    limit: int = Field(4, description="Most recent filings per ticker")
+
+class QuoteSubscription(BaseModel):
+    """Client message on the quote stream WebSocket."""
+    subscribe: List[str] = Field(default_factory=list)
+    unsubscribe: List[str] = Field(default_factory=list)
+
+class ProfileRequest(BaseModel):
+    requests: Optional[int] = Field(None, description="Profile the next N morning briefs")
+    seconds: Optional[float] = Field(None, description="Profile everything for this long instead")
+    interval_ms: Optional[float] = Field(None, description="Sampling interval; PROFILER_INTERVAL_MS if omitted")
+
+class AgentRunRequest(BaseModel):
+    question: str
+    latency_budget_ms: Optional[float] = Field(None, description="Model tiers degrade to finish within this")
+    token_budget: Optional[int] = None
+    priority: Literal["interactive", "batch"] = "interactive"
+
+
+# Response models. Fields that a provider does not report are left out of the payload
+# (exclude_none), and time series are columnar rather than one object per bar.
+
+class TickerMatch(BaseModel):
+    symbol: str
+    name: Optional[str] = None
+    region: Optional[str] = None
+
+class Quote(BaseModel):
+    ticker: str
+    price: float
+    change: Optional[float] = None
+    change_pct: Optional[float] = None
+    volume: Optional[int] = None
+    ts: Optional[int] = Field(None, description="Time of the last trade, epoch seconds")
+
+class Bars(BaseModel):
+    """OHLCV bars as parallel arrays: bar i is (t[i], o[i], h[i], l[i], c[i], v[i])."""
+    ticker: str
+    interval: str
+    t: List[int] = Field(..., description="Bar open time, epoch seconds")
+    o: List[float]
+    h: List[float]
+    l: List[float]
+    c: List[float]
+    v: List[int]
+
+class NewsItem(BaseModel):
+    title: str
+    url: str
+    source: Optional[str] = None
+    published: Optional[int] = Field(None, description="Publication time, epoch seconds")
+    summary: Optional[str] = None
+    sentiment: Optional[float] = None
+    tickers: List[str] = []
+
+class NewsFeed(BaseModel):
+    items: List[NewsItem]
+
+class EarningsQuarter(BaseModel):
+    period: str
+    eps_actual: Optional[float] = None
+    eps_estimate: Optional[float] = None
+    surprise_pct: Optional[float] = None
+
+class Earnings(BaseModel):
+    ticker: str
+    quarters: List[EarningsQuarter]
+
+class TrendPeriod(BaseModel):
+    period: str
+    strong_buy: int = 0
+    buy: int = 0
+    hold: int = 0
+    sell: int = 0
+    strong_sell: int = 0
+
+class Trends(BaseModel):
+    ticker: str
+    periods: List[TrendPeriod]
+
+class Filing(BaseModel):
+    ticker: str
+    cik: int
+    form: str
+    accession: str
+    filing_date: str
+    report_date: Optional[str] = None
+    description: Optional[str] = None
+    index_url: str
+    document_url: str
+    text: Optional[str] = None
@@ -0,0 +1,264 @@
+# Admission Control
+# Bounds in-flight LLM calls, queues the rest fairly per tenant with interactive ahead of batch, and sheds load with Retry-After
+
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Deque, Dict, Iterator, NamedTuple, Optional
+from utils.config import Config
+import asyncio
+import logging
+import math
+import time
+
+logger = logging.getLogger("finbreaker")
+
+INTERACTIVE, BATCH = "interactive", "batch"
+PRIORITIES = (INTERACTIVE, BATCH)  # served strictly in this order
+
+
+class RequestContext(NamedTuple):
+    tenant: str
+    priority: str = INTERACTIVE
+    deadline: Optional[float] = None  # time.monotonic() by which the request must finish
+    # Passed `admit` at the door: its LLM calls are not refused for a full queue
+    admitted: bool = False
+
+
+# Set by the endpoint (or the brief scheduler) and inherited by every task the agent graph spawns
+current_request: ContextVar[Optional[RequestContext]] = ContextVar("finbreaker_request", default=None)
+
+
+class Overloaded(Exception):
+    """No LLM capacity within the caller's wait limit; the API turns this into a 429."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Caps concurrent LLM calls at `max_in_flight`.
+
+    Callers beyond the cap wait in a queue per priority class; within a class, tenants are
+    served round-robin so one tenant's burst cannot starve the others. A caller gives up
+    when its wait limit or request deadline passes, and is refused outright when the queue
+    is full or the expected wait already exceeds its limit.
+
+    Shedding is decided once per request by `admit`, which counts the request against the
+    queue until `finish`, so a burst of requests that have not reached their first LLM call
+    yet is still refused. The planner, evaluator, draft and synthesis calls of an admitted
+    request wait their turn within its wait limit and deadline, but are not turned away
+    for a full queue halfway through, after the earlier stages' work has been spent.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, max_wait: Dict[str, float]):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.queues: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = {p: 0 for p in PRIORITIES}  # admitted and not finished yet
+        self.service_time = Config.MODEL_LATENCY_PRIORS.get(Config.STAGE_MODELS.get("synthesis"), 2.0)
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.waits: Deque[float] = deque(maxlen=500)
+
+    def queued(self, priority: str) -> int:
+        return sum(len(queue) for queue in self.queues[priority].values())
+
+    def backlog(self, priorities=PRIORITIES) -> int:
+        """Callers that will have to queue: queued calls, or admitted requests beyond the slots, whichever is more."""
+        return max(sum(self.queued(p) for p in priorities), sum(self.requests[p] for p in priorities) - self.max_in_flight)
+
+    def expected_wait(self, priority: str = BATCH) -> float:
+        """Rough queueing delay for a new caller: everyone queued at the same or higher priority goes first."""
+        if max(self.in_flight + self.waiting, sum(self.requests.values())) < self.max_in_flight:
+            return 0.0
+        ahead = self.backlog(PRIORITIES[: PRIORITIES.index(priority) + 1])
+        return (ahead + 1) / self.max_in_flight * self.service_time
+
+    def retry_after(self, priority: str = INTERACTIVE) -> int:
+        return max(1, math.ceil(self.expected_wait(priority)))
+
+    def _has_room(self, priority: str) -> bool:
+        """The queue has space, or holds lower-priority waiters or requests this caller goes ahead of."""
+        lower = PRIORITIES[PRIORITIES.index(priority) + 1:]
+        return max(self.waiting, self.backlog()) < self.max_queue or any(self.queues[p] or self.requests[p] for p in lower)
+
+    def _evict(self, priority: str):
+        """Shed the most recently queued waiter below `priority` to make room."""
+        for lower in reversed(PRIORITIES[PRIORITIES.index(priority) + 1:]):
+            tenants = self.queues[lower]
+            while tenants:
+                tenant, queue = next(reversed(tenants.items()))
+                future = queue.pop()
+                if not queue:
+                    del tenants[tenant]
+                if future.cancelled():
+                    continue
+                self.waiting -= 1
+                self.rejected += 1
+                future.set_exception(Overloaded(f"Displaced by {priority} traffic", self.retry_after(lower)))
+                return
+
+    def check(self, priority: str = INTERACTIVE):
+        """Refuse a new request up front instead of letting it queue and time out."""
+        if not self._has_room(priority) or self.expected_wait(priority) > self.max_wait[priority]:
+            self.rejected += 1
+            raise Overloaded(
+                f"LLM capacity exhausted ({self.in_flight} in flight, {self.waiting} queued, "
+                f"{sum(self.requests.values())} requests running)",
+                self.retry_after(priority),
+            )
+
+    def admit(self, context: RequestContext) -> RequestContext:
+        """`check` a new request and count it as running until `finish`; its LLM calls are not refused for a full queue."""
+        self.check(context.priority)
+        self.requests[context.priority] += 1
+        return context._replace(admitted=True)
+
+    def finish(self, context: RequestContext):
+        """An admitted request is done and no longer holds a place in the queue."""
+        if context.admitted:
+            self.requests[context.priority] -= 1
+
+    @contextmanager
+    def request(self, context: RequestContext) -> Iterator[RequestContext]:
+        """`admit` a request and make it the current one until the block exits; raises `Overloaded` if it is shed."""
+        context = self.admit(context)
+        token = current_request.set(context)
+        try:
+            yield context
+        finally:
+            current_request.reset(token)
+            self.finish(context)
+
+    async def acquire(
+        self,
+        tenant: str,
+        priority: str = INTERACTIVE,
+        deadline: Optional[float] = None,
+        admitted: bool = False,
+    ) -> float:
+        """
+        Wait for an LLM slot.
+
+        Args:
+            admitted (bool): the call belongs to a request that passed `admit`; it is not
+                refused when the queue is full, but still gives up at its wait limit or deadline
+
+        Returns:
+            float: seconds spent queued
+        """
+        start = time.monotonic()
+        if self.in_flight < self.max_in_flight and not self.waiting:
+            self.in_flight += 1
+            self.admitted += 1
+            self.waits.append(0.0)
+            return 0.0
+
+        timeout = self.max_wait[priority]
+        if deadline is not None:
+            timeout = min(timeout, deadline - start)
+        if timeout <= 0 or not (admitted or self._has_room(priority)):
+            self.rejected += 1
+            raise Overloaded(f"LLM queue full ({self.waiting} waiting)", self.retry_after(priority))
+        if not admitted and self.waiting >= self.max_queue:
+            self._evict(priority)
+
+        future = asyncio.get_running_loop().create_future()
+        self.queues[priority].setdefault(tenant, deque()).append(future)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                self.release()  # granted just as we gave up; pass the slot on
+            else:
+                future.cancel()
+                self._dequeue(priority, tenant, future)
+                self.waiting -= 1
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            raise Overloaded(f"No LLM slot within {timeout:.1f}s", self.retry_after(priority)) from None
+
+        wait = time.monotonic() - start
+        self.admitted += 1
+        self.waits.append(wait)
+        return wait
+
+    def _dequeue(self, priority: str, tenant: str, future: asyncio.Future):
+        """Take a waiter that gave up out of its queue, so `queued` and `_has_room` stop counting it."""
+        queue = self.queues[priority].get(tenant)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+        except ValueError:
+            return  # already popped by _evict
+        if not queue:
+            del self.queues[priority][tenant]
+
+    def _grant_next(self) -> bool:
+        for priority in PRIORITIES:
+            tenants = self.queues[priority]
+            while tenants:
+                tenant, queue = next(iter(tenants.items()))
+                future = queue.popleft()
+                # Round-robin: a tenant with more waiting goes to the back of the line
+                if queue:
+                    tenants.move_to_end(tenant)
+                else:
+                    del tenants[tenant]
+                if future.cancelled():
+                    continue  # gave up already and was taken off the count
+                self.waiting -= 1
+                future.set_result(None)
+                return True
+        return False
+
+    def release(self, held_seconds: Optional[float] = None):
+        if held_seconds is not None:
+            self.service_time = 0.8 * self.service_time + 0.2 * held_seconds
+        # The slot moves straight to the next waiter, so in_flight only drops when nobody is queued
+        if not self._grant_next():
+            self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, context: Optional[RequestContext] = None):
+        context = context or current_request.get() or RequestContext("default")
+        await self.acquire(context.tenant, context.priority, context.deadline, context.admitted)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> Dict:
+        waits = sorted(self.waits)
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "waiting": {p: self.queued(p) for p in PRIORITIES},
+            "requests": dict(self.requests),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "service_time_ms": round(self.service_time * 1000),
+            "p95_wait_ms": round(waits[int(0.95 * (len(waits) - 1))] * 1000) if waits else None,
+        }
+
+
+@lru_cache
+def get_admission() -> AdmissionController:
+    return AdmissionController(
+        max_in_flight=Config.LLM_MAX_IN_FLIGHT,
+        max_queue=Config.LLM_MAX_QUEUE,
+        max_wait={INTERACTIVE: Config.LLM_INTERACTIVE_MAX_WAIT_SECONDS, BATCH: Config.LLM_BATCH_MAX_WAIT_SECONDS},
+    )
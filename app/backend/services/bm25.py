@@ -0,0 +1,105 @@
+# Sparse Index
+# BM25 inverted index kept alongside the FAISS store for exact-token matches
+
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import heapq
+import math
+import re
+
+# Keeps tickers (BRK.B), CUSIPs (037833100) and fiscal labels (Q3, FY25) as single tokens
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.doc_lengths: Dict[int, int] = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: int, text: str):
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self.postings[term][doc_id] = tf
+        length = sum(counts.values())
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+
+    def remove(self, doc_id: int, text: str):
+        """Drop a document's postings. The caller passes the original text so no per-doc term list is kept."""
+        if doc_id not in self.doc_lengths:
+            return
+        for term in set(tokenize(text)):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        n = len(self.doc_lengths)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        candidates: Optional[Set[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Score documents against the query with BM25.
+
+        Args:
+            query (str): free-text query
+            k (int): number of results
+            candidates (set): when given, only these doc ids are scored
+
+        Returns:
+            list: (doc_id, score) pairs, best first
+        """
+        if not self.doc_lengths:
+            return []
+        avg_length = self.total_length / len(self.doc_lengths)
+        scores: Dict[int, float] = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf(term)
+            # Walk whichever side is smaller: the posting list or the pre-filtered id set
+            if candidates is not None and len(candidates) < len(posting):
+                matches: Iterable[Tuple[int, int]] = ((d, posting[d]) for d in candidates if d in posting)
+            else:
+                matches = posting.items()
+                if candidates is not None:
+                    matches = ((d, tf) for d, tf in matches if d in candidates)
+            for doc_id, tf in matches:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Merge several ranked id lists; each list contributes 1 / (k + rank) per id."""
+    fused: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
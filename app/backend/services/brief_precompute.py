@@ -0,0 +1,251 @@
+# Brief Precompute
+# Pre-generates morning briefs for configured watchlists before market open
+
+from datetime import date, datetime, time as dt_time
+from functools import lru_cache
+from hashlib import sha1
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from utils.config import Config
+from app.backend.agent.agent import answer_question
+from app.backend.services.market_data import get_market_data
+from app.backend.services.retrieval import get_vector_store
+from app.backend.services.voice import get_voice_model
+from app.backend.services.admission import BATCH, RequestContext, current_request
+import yfinance as yf
+import asyncio
+import json
+import logging
+import re
+
+logger = logging.getLogger("finbreaker")
+
+MARKET_CLOSE = dt_time(16, 0)
+
+
+def normalize_question(question: str) -> str:
+    """Case, punctuation and whitespace differences should not miss the precomputed brief."""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
+def _latest_prices(tickers: List[str]) -> Dict[str, float]:
+    closes = yf.download(tickers, period="1d", interval="5m", progress=False)["Close"].ffill()
+    if closes.empty:
+        return {}
+    return {ticker: float(price) for ticker, price in closes.iloc[-1].dropna().items()}
+
+
+async def take_fingerprint(tickers: List[str]) -> Dict:
+    """
+    Snapshot the inputs a brief depends on: last price and ingested news count per ticker.
+
+    Args:
+        tickers (List[str]): watchlist ticker symbols
+
+    Returns:
+        dict: {"prices": {ticker: price}, "news": {ticker: count}}
+    """
+    prices = {}
+    try:
+        prices = await get_market_data().pools["yfinance"].run(_latest_prices, tickers)
+    except Exception as e:
+        logger.warning(f"Price fingerprint failed for {tickers}: {e}")
+
+    vector_store = get_vector_store()
+    news = {ticker: vector_store.count(ticker=ticker, source="news") for ticker in tickers}
+    return {"prices": prices, "news": news}
+
+
+def drift_reason(old: Dict, new: Dict) -> Optional[str]:
+    """Return why a brief is stale, or None if its inputs are still within thresholds."""
+    for ticker, price in old.get("prices", {}).items():
+        latest = new.get("prices", {}).get(ticker)
+        if price and latest is not None:
+            move = abs(latest - price) / price * 100
+            if move >= Config.BRIEF_PRICE_MOVE_PCT:
+                return f"{ticker} moved {move:.2f}%"
+    for ticker, count in new.get("news", {}).items():
+        fresh = count - old.get("news", {}).get(ticker, 0)
+        if fresh >= Config.BRIEF_NEWS_THRESHOLD:
+            return f"{fresh} new news chunks for {ticker}"
+    return None
+
+
+class BriefStore:
+    """On-disk store of generated briefs, one directory per market day."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    @staticmethod
+    def key(watchlist: str, question: str) -> str:
+        return sha1(f"{watchlist}\n{normalize_question(question)}".encode()).hexdigest()
+
+    def _paths(self, watchlist: str, question: str, day: date) -> Tuple[Path, Path]:
+        base = self.root / day.isoformat() / self.key(watchlist, question)
+        return base.with_suffix(".json"), base.with_suffix(".wav")
+
+    def get(self, watchlist: str, question: str, day: date) -> Optional[Dict]:
+        meta_path, audio_path = self._paths(watchlist, question, day)
+        try:
+            brief = json.loads(meta_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        brief["audio"] = audio_path.read_bytes() if audio_path.exists() else None
+        return brief
+
+    def put(self, watchlist: str, question: str, day: date, answer: str, audio: Optional[bytes], fingerprint: Dict):
+        meta_path, audio_path = self._paths(watchlist, question, day)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        if audio:
+            tmp_audio = audio_path.with_suffix(".wav.tmp")
+            tmp_audio.write_bytes(audio)
+            tmp_audio.replace(audio_path)
+        else:
+            audio_path.unlink(missing_ok=True)  # a regenerated brief must not keep the old audio
+        brief = {
+            "watchlist": watchlist,
+            "question": question,
+            "answer": answer,
+            "fingerprint": fingerprint,
+            "generated_at": datetime.now().astimezone().isoformat(),
+        }
+        # Write-then-rename so a reader never sees a half-written brief
+        tmp_path = meta_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(brief))
+        tmp_path.replace(meta_path)
+
+    def invalidate(self, watchlist: str, question: str, day: date):
+        for path in self._paths(watchlist, question, day):
+            path.unlink(missing_ok=True)
+
+    def entries(self, day: date) -> List[Dict]:
+        briefs = []
+        for meta_path in sorted((self.root / day.isoformat()).glob("*.json")):
+            try:
+                briefs.append(json.loads(meta_path.read_text()))
+            except ValueError:
+                continue
+        return briefs
+
+
+class BriefScheduler:
+    def __init__(self, store: BriefStore):
+        self.store = store
+        self.tz = ZoneInfo(Config.BRIEF_TIMEZONE)
+        self.run_at = dt_time.fromisoformat(Config.BRIEF_PRECOMPUTE_TIME)
+        self.generated_days = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def today(self) -> date:
+        return datetime.now(self.tz).date()
+
+    def jobs(self) -> List[Tuple[str, str]]:
+        """Every (watchlist, rendered question) pair to precompute."""
+        return [
+            (watchlist, template.format(watchlist=watchlist))
+            for watchlist in Config.BRIEF_WATCHLISTS
+            for template in Config.BRIEF_QUESTIONS
+        ]
+
+    def missing_jobs(self, day: date) -> List[Tuple[str, str]]:
+        """Jobs with no brief in the store for `day`."""
+        stored = {(brief["watchlist"], normalize_question(brief["question"])) for brief in self.store.entries(day)}
+        return [job for job in self.jobs() if (job[0], normalize_question(job[1])) not in stored]
+
+    def lookup(self, question: str, watchlist: Optional[str] = None) -> Optional[Dict]:
+        """Return today's precomputed brief for a question, if one matches and is still valid."""
+        normalized = normalize_question(question)
+        for job_watchlist, job_question in self.jobs():
+            if watchlist and watchlist != job_watchlist:
+                continue
+            if normalize_question(job_question) == normalized:
+                return self.store.get(job_watchlist, job_question, self.today())
+        return None
+
+    async def generate(self, watchlist: str, question: str, day: date) -> Dict:
+        tickers = Config.BRIEF_WATCHLISTS[watchlist]
+        # Each job runs in its own task, so this only tags this brief's LLM calls
+        current_request.set(RequestContext("brief-precompute", BATCH))
+        fingerprint = await take_fingerprint(tickers)
+        answer = await answer_question(f"{question} Watchlist tickers: {', '.join(tickers)}.")
+        audio = (await asyncio.to_thread(get_voice_model().speak, answer))["audio"]
+        self.store.put(watchlist, question, day, answer, audio, fingerprint)
+        logger.info(f"Precomputed brief for {watchlist!r}: {question!r}")
+        return {"watchlist": watchlist, "question": question}
+
+    async def _run_jobs(self, jobs: List[Tuple[str, str]], day: date) -> int:
+        semaphore = asyncio.Semaphore(Config.BRIEF_CONCURRENCY)
+
+        async def run(job):
+            async with semaphore:
+                try:
+                    await self.generate(*job, day)
+                    return True
+                except Exception as e:
+                    logger.error(f"Brief precompute failed for {job}: {e}")
+                    return False
+
+        return sum(await asyncio.gather(*(run(job) for job in jobs)))
+
+    async def precompute_all(self, only_missing: bool = False) -> Dict:
+        day = self.today()
+        jobs = self.missing_jobs(day) if only_missing else self.jobs()
+        generated = await self._run_jobs(jobs, day) if jobs else 0
+        self.generated_days.add(day)
+        return {"date": day.isoformat(), "generated": generated}
+
+    async def refresh(self) -> Dict:
+        """
+        Regenerate briefs whose quotes or news moved past the thresholds.
+
+        The stale brief keeps being served until its replacement is stored; if regeneration
+        fails, it is still stale on the next tick and is retried then.
+        """
+        day = self.today()
+        stale = []
+        for brief in self.store.entries(day):
+            tickers = Config.BRIEF_WATCHLISTS.get(brief["watchlist"])
+            if not tickers:
+                continue
+            current = await take_fingerprint(tickers)
+            reason = drift_reason(brief["fingerprint"], current)
+            if reason:
+                logger.info(f"Brief for {brief['watchlist']!r} is stale: {reason}")
+                stale.append((brief["watchlist"], brief["question"]))
+        regenerated = await self._run_jobs(stale, day) if stale else 0
+        return {"stale": len(stale), "regenerated": regenerated}
+
+    async def _loop(self):
+        while True:
+            now = datetime.now(self.tz)
+            try:
+                if now.weekday() < 5 and now.time() >= self.run_at:
+                    if now.date() not in self.generated_days:
+                        # generated_days is lost on restart; briefs already on disk for today are kept
+                        await self.precompute_all(only_missing=True)
+                    elif now.time() < MARKET_CLOSE:
+                        await self.refresh()
+            except Exception as e:
+                logger.error(f"Brief scheduler tick failed: {e}")
+            await asyncio.sleep(Config.BRIEF_REFRESH_INTERVAL_SECONDS)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+            logger.info("Brief precompute scheduler started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+@lru_cache
+def get_brief_scheduler() -> BriefScheduler:
+    return BriefScheduler(BriefStore(Config.BRIEF_CACHE_DIR))
@@ -0,0 +1,242 @@
+# Filing Parser
+# Event-driven parse of 10-K/10-Q/20-F documents into section-tagged chunks without holding the document tree
+
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+from langchain.schema import Document
+from lxml import etree
+from app.backend.services.news_ingestion import split_text
+import re
+
+READ_SIZE = 1 << 16
+
+# Elements whose text is emitted as one paragraph when they close
+BLOCK_TAGS = frozenset(("p", "div", "li", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "center", "body"))
+# Not rendered: script/style, and the inline XBRL header with its hidden facts
+SKIP_TAGS = frozenset(("script", "style", "head", "title", "ix:header"))
+HEADING_MAX_CHARS = 160
+XHTML_MARKERS = (b"<?xml", b"http://www.w3.org/1999/xhtml")
+INLINE_XBRL_NS = "http://www.xbrl.org/2013/inlineXBRL"
+
+ITEM_HEADING = re.compile(r"^item\s*(\d{1,2}[a-d]?)\b[\s.:\-–—]*(.*)$", re.IGNORECASE)
+# What may follow the item number in a heading: nothing, or a capitalized title that is not a sentence
+HEADING_TITLE = re.compile(r"^(?:[A-Z0-9(\"'“‘][^.?!]*\.?)?$")
+SECTION_TITLES = {
+    "10-K": {
+        "1": "Business", "1A": "Risk Factors", "1B": "Unresolved Staff Comments", "1C": "Cybersecurity",
+        "2": "Properties", "3": "Legal Proceedings", "5": "Market for Common Equity", "7": "MD&A",
+        "7A": "Market Risk", "8": "Financial Statements", "9A": "Controls and Procedures",
+    },
+    "10-Q": {"1": "Financial Statements", "1A": "Risk Factors", "2": "MD&A", "3": "Market Risk", "4": "Controls and Procedures"},
+    "20-F": {
+        "3": "Key Information", "4": "Information on the Company", "5": "MD&A", "8": "Financial Information",
+        "11": "Market Risk", "18": "Financial Statements",
+    },
+}
+# Sub-headings that matter more than the item they sit under (20-F puts risk factors in Item 3.D)
+SUBSECTIONS = {"risk factors": "Risk Factors"}
+
+
+def _tag(elem) -> str:
+    """Tag name without the XHTML namespace; inline XBRL keeps its `ix:` prefix as the HTML parser reports it."""
+    tag = elem.tag
+    if not isinstance(tag, str):
+        return ""  # comments, processing instructions
+    if tag[0] == "{":
+        namespace, tag = tag[1:].split("}", 1)
+        return f"ix:{tag}" if namespace == INLINE_XBRL_NS else tag
+    return tag
+
+
+def _text(elem) -> str:
+    return " ".join("".join(elem.itertext()).split())
+
+
+def _hidden(elem) -> bool:
+    return "display:none" in elem.get("style", "").replace(" ", "").lower()
+
+
+def _fold_preceding(elem):
+    """Free the siblings before `elem`, moving their text and tails into `parent.text` in document order."""
+    parent = elem.getparent()
+    while parent[0] is not elem:
+        previous = parent[0]
+        text = "".join(previous.itertext()) if isinstance(previous.tag, str) else ""
+        parent.text = (parent.text or "") + text + (previous.tail or "")
+        del parent[0]
+
+
+def _discard(elem):
+    """
+    Free a finished element and the siblings before it, so the tree only ever holds
+    the path from the root to the current element.
+
+    Inline text that the parent has not emitted yet is carried up into `parent.text`.
+    """
+    elem.clear(keep_tail=True)
+    if elem.getparent() is not None:
+        _fold_preceding(elem)
+
+
+def _leading_text(elem) -> str:
+    """
+    Take the inline text the parent holds before `elem` out of the tree, so it is emitted
+    ahead of `elem`, under the same section, rather than when the parent closes.
+    """
+    parent = elem.getparent()
+    if parent is None:
+        return ""
+    _fold_preceding(elem)
+    text, parent.text = parent.text or "", None
+    return " ".join(text.split())
+
+
+def _pull_parser(head: bytes):
+    """
+    Inline XBRL filings are well-formed XHTML and go through the XML push parser, whose input
+    buffer stays bounded. libxml2's HTML push parser keeps the whole input alive, so older
+    plain-HTML filings still cost memory in proportion to their size (but no document tree).
+    """
+    if any(marker in head for marker in XHTML_MARKERS):
+        return etree.XMLPullParser(events=("start", "end"), recover=True, huge_tree=True, resolve_entities=False)
+    return etree.HTMLPullParser(events=("start", "end"), recover=True)
+
+
+def iter_blocks(stream: BinaryIO, read_size: int = READ_SIZE) -> Iterator[Tuple[str, str]]:
+    """
+    Parse an HTML or XHTML filing incrementally.
+
+    Args:
+        stream (BinaryIO): the document, read `read_size` bytes at a time
+        read_size (int): bytes fed to the parser per step
+
+    Yields:
+        tuple: ("text", paragraph) or ("table", rows joined by newlines, cells by " | "), in document order
+    """
+    parser = None
+    table_depth = 0
+    rows: List[str] = []
+    while True:
+        data = stream.read(read_size)
+        if parser is None:
+            if not data:
+                return  # an empty document; the parsers refuse to close without a root element
+            parser = _pull_parser(data[:1024])
+        if data:
+            parser.feed(data)
+        else:
+            parser.close()
+        for event, elem in parser.read_events():
+            tag = _tag(elem)
+            if event == "start":
+                table_depth += tag == "table"
+                continue
+            if tag in SKIP_TAGS or _hidden(elem):
+                _discard(elem)
+            elif tag == "table":
+                table_depth -= 1
+                if not table_depth:
+                    leading = _leading_text(elem)
+                    if leading:
+                        yield "text", leading
+                    if rows:
+                        yield "table", "\n".join(rows)
+                        rows = []
+                _discard(elem)
+            elif tag == "tr" and table_depth:
+                cells = [text for text in (_text(cell) for cell in elem if _tag(cell) in ("td", "th")) if text]
+                if cells:
+                    rows.append(" | ".join(cells))
+                _discard(elem)
+            elif tag in BLOCK_TAGS and not table_depth:
+                leading = _leading_text(elem)
+                if leading:
+                    yield "text", leading
+                text = _text(elem)
+                if text:
+                    yield "text", text
+                _discard(elem)
+        if not data:
+            return
+
+
+def iter_text_blocks(stream: BinaryIO) -> Iterator[Tuple[str, str]]:
+    """Plain-text filings: paragraphs are separated by blank lines."""
+    paragraph: List[str] = []
+    for raw in stream:
+        line = " ".join(raw.decode(errors="replace").split())
+        if line:
+            paragraph.append(line)
+        elif paragraph:
+            yield "text", " ".join(paragraph)
+            paragraph = []
+    if paragraph:
+        yield "text", " ".join(paragraph)
+
+
+def section_heading(text: str, form: str) -> Optional[Tuple[Optional[str], str]]:
+    """
+    Recognize a section heading.
+
+    Returns:
+        tuple: (item, title) for "Item 1A. Risk Factors" style headings, (None, title) for known
+            sub-headings, or None if the block is body text
+    """
+    if len(text) > HEADING_MAX_CHARS:
+        return None
+    match = ITEM_HEADING.match(text)
+    # "Item 1A of this report describes..." is a sentence that mentions an item, not its heading
+    if match and HEADING_TITLE.match(match.group(2).strip()):
+        item = match.group(1).upper()
+        title = SECTION_TITLES.get(form.upper(), {}).get(item) or match.group(2).strip(" .") or f"Item {item}"
+        return f"Item {item}", title
+    subsection = SUBSECTIONS.get(re.sub(r"^[\d.]*[a-z]?[.)]\s*", "", text.lower()).strip(" ."))
+    if subsection:
+        return None, subsection
+    return None
+
+
+def chunk_blocks(
+    blocks: Iterable[Tuple[str, str]],
+    metadata: Dict,
+    chunk_size: int,
+    overlap: int,
+) -> Iterator[Document]:
+    """
+    Group paragraphs into chunks that never straddle a section boundary; each table is its own chunk.
+
+    Every chunk carries `section` (e.g. "Item 7"), `section_title` (e.g. "MD&A") and `kind` ("text" or "table").
+    """
+    form = metadata.get("form", "")
+    section: Dict[str, Optional[str]] = {"section": "Cover", "section_title": "Cover"}
+    paragraphs: List[str] = []
+    size = 0
+    index = 0
+
+    def documents(text: str, kind: str) -> Iterator[Document]:
+        nonlocal index
+        for chunk in split_text(text, chunk_size, overlap):
+            yield Document(page_content=chunk, metadata={**metadata, **section, "kind": kind, "chunk": index})
+            index += 1
+
+    for kind, text in blocks:
+        heading = section_heading(text, form) if kind == "text" else None
+        # Flush at section changes, before tables, and before a paragraph would overflow the chunk
+        if paragraphs and (heading or kind == "table" or size + len(text) > chunk_size):
+            yield from documents("\n".join(paragraphs), "text")
+            paragraphs, size = [], 0
+        if kind == "table":
+            yield from documents(text, "table")
+            continue
+        if heading:
+            item, title = heading
+            section = {"section": item or section["section"], "section_title": title}
+        paragraphs.append(text)
+        size += len(text) + 1
+    if paragraphs:
+        yield from documents("\n".join(paragraphs), "text")
+
+
+def parse_filing(stream: BinaryIO, metadata: Dict, chunk_size: int, overlap: int, plain_text: bool = False) -> Iterator[Document]:
+    """Chunks of a filing as a lazy generator: parsing advances only as the consumer pulls chunks."""
+    blocks = iter_text_blocks(stream) if plain_text else iter_blocks(stream)
+    return chunk_blocks(blocks, metadata, chunk_size, overlap)
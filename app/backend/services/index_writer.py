@@ -0,0 +1,274 @@
+# Index Writer
+# Single process that owns the embedding model and all vector index writes in multi-worker mode.
+# Run with: python -m app.backend.services.index_writer
+
+from collections import defaultdict
+from multiprocessing.connection import Client, Listener
+from threading import Lock, RLock, Thread, local
+from typing import Any, Dict, List, Optional
+from langchain.schema import Document
+from utils.config import Config
+from app.backend.services.retrieval import FILTER_FIELDS, VectorStoreService
+from app.backend.services.bm25 import BM25Index
+from app.backend.utils.shared_state import secret_key, shared_path
+import asyncio
+import faiss
+import logging
+import os
+import pickle
+import time
+
+logger = logging.getLogger("finbreaker")
+
+SNAPSHOT_DIR = "index"
+SNAPSHOT_KEEP = 3
+# VectorStoreService attributes that make up a snapshot, besides the FAISS index itself
+SNAPSHOT_STATE = ("docs", "sparse", "postings", "timeline", "tombstones", "_next_id", "last_maintenance")
+
+
+def _snapshot_paths(version: int):
+    return (
+        shared_path(SNAPSHOT_DIR, f"index-{version}.faiss"),
+        shared_path(SNAPSHOT_DIR, f"state-{version}.pkl"),
+    )
+
+
+def current_snapshot_version() -> Optional[int]:
+    try:
+        return int(shared_path(SNAPSHOT_DIR, "CURRENT").read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def publish_snapshot(store: VectorStoreService, version: int):
+    """Write index + state under a new version, then flip CURRENT atomically."""
+    index_path, state_path = _snapshot_paths(version)
+    with store._lock:
+        faiss.write_index(store.index, str(index_path))
+        with open(state_path, "wb") as f:
+            pickle.dump({name: getattr(store, name) for name in SNAPSHOT_STATE}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    current = shared_path(SNAPSHOT_DIR, "CURRENT")
+    tmp = current.with_suffix(".tmp")
+    tmp.write_text(str(version))
+    tmp.replace(current)
+
+    # Readers may still have an older snapshot mapped; unlinking keeps their mapping valid
+    for old in range(version - SNAPSHOT_KEEP, 0, -1):
+        paths = _snapshot_paths(old)
+        if not paths[0].exists():
+            break
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+
+def writer_authkey() -> bytes:
+    """INDEX_WRITER_AUTHKEY if set, else a random key kept in SHARED_STATE_DIR for the writer and workers to share."""
+    if Config.INDEX_WRITER_AUTHKEY:
+        return Config.INDEX_WRITER_AUTHKEY.encode()
+    return secret_key("index-writer")
+
+
+def load_snapshot(store: VectorStoreService, version: int, mmap: bool = False):
+    """Swap a published snapshot into `store`. Readers map the vectors instead of copying them."""
+    index_path, state_path = _snapshot_paths(version)
+    flags = (getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY) if mmap else 0
+    index = faiss.read_index(str(index_path), flags)
+    with open(state_path, "rb") as f:
+        state = pickle.load(f)
+    with store._lock:
+        store.index = index
+        for name, value in state.items():
+            setattr(store, name, value)
+
+
+class IndexWriter:
+    """Serves embedding and write requests from workers over a local authenticated socket."""
+
+    # Operations workers may forward; everything else stays private to the writer
+    OPERATIONS = ("embed_query", "embed_documents", "index_chunks", "delete", "run_maintenance", "stats")
+
+    def __init__(self, store: VectorStoreService):
+        self.store = store
+        self.version = current_snapshot_version() or 0
+        if self.version:
+            # Pick up where the last writer left off
+            load_snapshot(store, self.version)
+            logger.info(f"Index writer restored snapshot v{self.version} ({store.index.ntotal} vectors)")
+        # Ingestion and maintenance change the store directly, not through `handle`
+        self.published_mutations = store.mutations
+
+    def handle(self, op: str, args: tuple, kwargs: dict) -> Any:
+        if op == "embed_query":
+            return self.store.embeddings.embed_query(*args, **kwargs)
+        if op == "embed_documents":
+            return self.store.embeddings.embed_documents(*args, **kwargs)
+        return getattr(self.store, op)(*args, **kwargs)
+
+    def _serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    op, args, kwargs = conn.recv()
+                except EOFError:
+                    return
+                try:
+                    if op not in self.OPERATIONS:
+                        raise ValueError(f"Unsupported index writer operation: {op}")
+                    conn.send(("ok", self.handle(op, args, kwargs)))
+                except Exception as e:
+                    logger.error(f"Index writer {op} failed: {e}")
+                    conn.send(("error", str(e)))
+
+    def serve(self):
+        address = Config.INDEX_WRITER_ADDRESS
+        if os.path.exists(address):
+            os.unlink(address)
+        with Listener(address, family="AF_UNIX", authkey=writer_authkey()) as listener:
+            logger.info(f"Index writer listening on {address}")
+            while True:
+                conn = listener.accept()
+                Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def publish_if_changed(self) -> bool:
+        """Publish a snapshot if the store changed since the last one."""
+        mutations = self.store.mutations
+        if mutations == self.published_mutations:
+            return False
+        self.version += 1
+        publish_snapshot(self.store, self.version)
+        # Changes that land while the snapshot is written go out with the next one
+        self.published_mutations = mutations
+        logger.info(f"Published index snapshot v{self.version} ({self.store.index.ntotal} vectors)")
+        return True
+
+    async def publish_loop(self):
+        while True:
+            await asyncio.to_thread(self.publish_if_changed)
+            await asyncio.sleep(Config.SNAPSHOT_INTERVAL_SECONDS)
+
+
+class WriterClient:
+    """Per-thread persistent connection to the index writer."""
+
+    def __init__(self):
+        self._local = local()
+
+    def call(self, op: str, *args, **kwargs) -> Any:
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = self._local.conn = Client(
+                    Config.INDEX_WRITER_ADDRESS, family="AF_UNIX", authkey=writer_authkey()
+                )
+            try:
+                conn.send((op, args, kwargs))
+                status, result = conn.recv()
+                break
+            except (EOFError, OSError):
+                # Writer restarted; reconnect once
+                self._local.conn = None
+                if attempt:
+                    raise
+        if status == "error":
+            raise RuntimeError(result)
+        return result
+
+
+class RemoteEmbeddings:
+    """Embeddings facade for readers: one copy of the model weights lives in the writer process."""
+
+    def __init__(self, client: WriterClient):
+        self.client = client
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.client.call("embed_query", text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.client.call("embed_documents", texts)
+
+
+class SharedVectorStore(VectorStoreService):
+    """
+    Read replica used by uvicorn workers.
+
+    Searches run against the latest published snapshot, with the FAISS vectors memory-mapped
+    so every worker shares the same page cache. Writes are forwarded to the index writer.
+    """
+
+    def __init__(self):
+        self.client = WriterClient()
+        self.embeddings = RemoteEmbeddings(self.client)
+        self._lock = RLock()
+        self._reload_lock = Lock()
+        self.version = None
+        self._checked_at = 0.0
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(Config.EMBEDDING_DIM))
+        self.docs = {}
+        self.sparse = BM25Index()
+        self.postings = {field: defaultdict(set) for field in FILTER_FIELDS}
+        self.timeline = []
+        self.tombstones = set()
+        self._next_id = 0
+        self.last_maintenance = {}
+        self._maybe_reload(force=True)
+
+    def _maybe_reload(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < Config.SNAPSHOT_POLL_SECONDS:
+            return
+        self._checked_at = now
+        version = current_snapshot_version()
+        if version is None or version == self.version:
+            return
+        with self._reload_lock:
+            if version == self.version:
+                return
+            load_snapshot(self, version, mmap=True)
+            self.version = version
+            logger.info(f"Loaded index snapshot v{version} ({self.index.ntotal} vectors)")
+
+    def retrieve(self, *args, **kwargs):
+        self._maybe_reload()
+        return super().retrieve(*args, **kwargs)
+
+    def count(self, **filters) -> int:
+        self._maybe_reload()
+        return super().count(**filters)
+
+    def index_chunks(self, chunks: List[Document]) -> List[int]:
+        return self.client.call("index_chunks", chunks)
+
+    def delete(self, ids) -> int:
+        return self.client.call("delete", list(ids))
+
+    def run_maintenance(self) -> Dict:
+        return self.client.call("run_maintenance")
+
+    def stats(self) -> Dict:
+        return {**self.client.call("stats"), "reader_snapshot_version": self.version}
+
+    def start_maintenance(self):
+        pass  # maintenance runs in the writer process
+
+    async def stop_maintenance(self):
+        pass
+
+
+async def run_writer():
+    from app.backend.services.news_ingestion import NewsIngestionService
+
+    store = VectorStoreService()
+    writer = IndexWriter(store)
+    Thread(target=writer.serve, daemon=True).start()
+    store.start_maintenance()
+    if Config.NEWS_INGEST_ENABLED:
+        NewsIngestionService(store).start()
+    await writer.publish_loop()
+
+
+if __name__ == "__main__":
+    from utils.logging_config import setup_logging
+
+    setup_logging()
+    Config.ROLE = "index-writer"
+    asyncio.run(run_writer())
@@ -1,237 +1,552 @@
-# Market Tools
-# Handles polling of real-time & historical market data
-
-from typing import Optional, Dict, List
-from functools import lru_cache
-from utils.config import Config
-import yfinance as yf
-import requests
-import logging
-
-ALPHAVANTAGE_API_KEY = Config.ALPHAVANTAGE_API_KEY
-ALPHAVANTAGE_URL = "https://www.alphavantage.co/query"
-logger = logging.getLogger("finbreaker")
-
-
-class MarketDataService:
-
-    def search_ticker(company_name: str) -> Dict[str]:
-        """
-        Search for the most relevant ticker symbol for a given company name.
-        
-        Args:
-            company_name (str): Name of the company to search for.
-            api_key (str): Your Alpha Vantage API key.
-        
-        Returns:
-            dict: The most relevant result (symbol, name, region), or None if not found.
-        """
-        params = {
-            "function": "SYMBOL_SEARCH",
-            "keywords": company_name,
-            "apikey": ALPHAVANTAGE_API_KEY
-        }
-
-        try:
-            response = requests.get(ALPHAVANTAGE_URL, params=params)
-            response.raise_for_status()
-            data = response.json()
-
-            best_matches = data.get("bestMatches", [])
-            if not best_matches:
-                print(f"No results found for '{company_name}'.")
-                return None
-
-            # Return the most relevant match (first one)
-            best = best_matches[0]
-            return {
-                "symbol": best["1. symbol"],
-                "name": best["2. name"],
-                "region": best["4. region"]
-            }
-
-        except requests.RequestException as e:
-            print(f"Request error: {e}")
-            return None
-
-
-    def fetch_time_series_market_data(ticker: str, period: str = "1d", interval: str = "1d") -> Dict[str]:
-        """
-        Fetch real-time and historical market data for a given ticker symbol
-        
-        Args:
-            ticker (str): ticker symbol for the company
-            period (str): time period
-            interval (str): time interval
-
-        Returns:
-            dict : ticker's time series market data
-        """
-        logger.info(f"Fetching market data for {ticker} (period={period}, interval={interval}")
-
-        params = {
-            "function": "TIME_SERIES_DAILY",
-            "symbol": ticker,
-            "apikey": ALPHAVANTAGE_API_KEY
-        }
-
-        try:
-            response = requests.get(ALPHAVANTAGE_URL, params=params)
-            response.raise_for_status()
-            data = response.json()
-            logger.info(f"AlphaVantage data fetched for {ticker}")
-            return data
-
-        except requests.RequestException as e:
-            logger.info("AlphaVantage failed, now trying yFinance")
-
-            data = yf.Ticker(ticker).history(period=period, interval=interval)
-            if not data.empty:
-                logger.info(f"yfinance data fetched for {ticker}")
-                return data.tail(1).to_dict()
-            else:
-                logger.warning(f"No data found for {ticker}")
-                return {"error": "No data found"}
-
-            
-    def fetch_earnings(ticker: str) -> Dict:
-        """
-        Fetch earnings data for a given ticker symbol.
-        
-        Args:
-            ticker (str): ticker symbol for the company
-
-        Returns:
-            dict : ticker's earnings data
-        """
-        logger.info(f"Fetching earnings for {ticker}")
-        stock = yf.Ticker(ticker)
-        earnings = stock.earnings_dates
-        if earnings is not None:
-            logger.info(f"Earnings data found for {ticker}")
-            return earnings.head(1).to_dict()
-        logger.warning(f"No earnings data found for {ticker}")
-        return {"error": "No earnings data found"}
-
-
-    def fetch_company_news(ticker: str) -> Dict:
-        """
-        Fetch market news for a given ticker symbol (eg. GOOGL, AAPL etc)
-        
-        Args:
-            ticker (str): topic ticker that news data is required for
-
-        Returns:
-            dict: news data from the tickers 
-        """
-        logger.info(f"Fetching news data for symbol: {ticker})")
-        params = {
-            "function": "NEWS_SENTIMENT",
-            "tickers": ticker,
-            "apikey": ALPHAVANTAGE_API_KEY
-        }
-
-        try:
-            response = requests.get(ALPHAVANTAGE_URL, params=params)
-            response.raise_for_status()
-            data = response.json()
-            logger.info(f"News data fetched for {ticker}")
-            return data
-
-        except requests.RequestException as e:
-            return {"error": "No data found"}
-
-
-    def fetch_topic_news(tickers: List[str]) -> Dict:
-        """
-        Fetch market news for given topic tickers.\n
-        Supported topics (in format "topic name: ticker_name"):
-
-        Blockchain: blockchain,
-        Earnings: earnings,
-        IPO: ipo,
-        Mergers & Acquisitions: mergers_and_acquisitions,
-        Financial Markets: financial_markets,
-        Economy - Fiscal Policy (e.g., tax reform, government spending): economy_fiscal,
-        Economy - Monetary Policy (e.g., interest rates, inflation): economy_monetary,
-        Economy - Macro/Overall: economy_macro,
-        Energy & Transportation: energy_transportation,
-        Finance: finance,
-        Life Sciences: life_sciences,
-        Manufacturing: manufacturing,
-        Real Estate & Construction: real_estate,
-        Retail & Wholesale: retail_wholesale,
-        Technology: technology
-
-        Args:
-            tickers (List[str]): list of topic tickers that news data is required for
-        
-        Returns:
-            dict: news data from the tickers 
-
-        """
-        logger.info(f"Fetching news data for topic: {tickers})")
-
-        ticker_names = [
-            "blockchain",
-            "earnings",
-            "ipo",
-            "mergers_and_acquisitions",
-            "financial_markets",
-            "economy_fiscal",
-            "economy_monetary",
-            "economy_macro",
-            "energy_transportation",
-            "finance",
-            "life_sciences",
-            "manufacturing",
-            "real_estate",
-            "retail_wholesale",
-            "technology"
-        ]
-        tickers = [ticker for ticker in tickers if ticker in ticker_names] # Keep only valid symbols
-        ticker_str = ','.join(tickers)
-
-        params = {
-            "function": "NEWS_SENTIMENT",
-            "tickers": ticker_str,
-            "apikey": ALPHAVANTAGE_API_KEY
-        }
-
-        try:
-            response = requests.get(ALPHAVANTAGE_URL, params=params)
-            response.raise_for_status()
-            data = response.json()
-            logger.info(f"News data fetched for {tickers}")
-            return data
-
-        except requests.RequestException as e:
-            return {"error": "No data found"}
-
-
-    def fetch_stock_trends(ticker: str) -> Dict:
-        """
-        Fetch recommendation trends for a given ticker symbol (eg. GOOGL, AAPL etc)
-        
-        Args:
-            ticker (str): topic ticker that trends data is required for
-
-        Returns:
-            dict: trends data from the tickers 
-        """
-        logger.info(f"Fetching stock trends data for {ticker})")
-
-        try:
-            response = requests.get(f"https://finnhub.io/api/v1/stock/recommendation?symbol={ticker}&token={Config.FINNHUB_API_KEY}")
-            response.raise_for_status()
-            data = response.json()
-            logger.info(f"News data fetched for {ticker}")
-            return data
-
-        except requests.RequestException as e:
-            return {"error": "No data found"}
-    
-
-@lru_cache
-def get_market_data() -> MarketDataService:
-    return MarketDataService()
\ No newline at end of file
+# Market Tools
+# Handles polling of real-time & historical market data
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Optional, Dict, List
+from functools import lru_cache
+from utils.config import Config
+from app.backend.api.schema import Bars, Earnings, EarningsQuarter, NewsFeed, NewsItem, Quote, TickerMatch, TrendPeriod, Trends
+from app.backend.services.providers import Provider, ProviderError, ProviderPool, ProviderRouter
+import yfinance as yf
+import asyncio
+import logging
+import math
+
+ALPHAVANTAGE_API_KEY = Config.ALPHAVANTAGE_API_KEY
+ALPHAVANTAGE_URL = "https://www.alphavantage.co/query"
+FINNHUB_URL = "https://finnhub.io/api/v1"
+AV_TIME_FORMAT = "%Y%m%dT%H%M%S"
+logger = logging.getLogger("finbreaker")
+
+# AlphaVantage news topics, keyed by the label used in NEWS_SENTIMENT feed items
+NEWS_TOPICS = {
+    "Blockchain": "blockchain",
+    "Earnings": "earnings",
+    "IPO": "ipo",
+    "Mergers & Acquisitions": "mergers_and_acquisitions",
+    "Financial Markets": "financial_markets",
+    "Economy - Fiscal": "economy_fiscal",
+    "Economy - Monetary": "economy_monetary",
+    "Economy - Macro": "economy_macro",
+    "Energy & Transportation": "energy_transportation",
+    "Finance": "finance",
+    "Life Sciences": "life_sciences",
+    "Manufacturing": "manufacturing",
+    "Real Estate & Construction": "real_estate",
+    "Retail & Wholesale": "retail_wholesale",
+    "Technology": "technology",
+}
+
+
+# Calendar days covered by each yfinance-style period, used to trim full-history responses
+PERIOD_DAYS = {"1d": 1, "5d": 5, "1mo": 31, "3mo": 92, "6mo": 183, "1y": 366, "2y": 731, "5y": 1827}
+
+# Provider preference per capability; open circuits are skipped and slow primaries are hedged
+CAPABILITY_PREFERENCES = {
+    "search_ticker": ["alphavantage", "finnhub", "yfinance"],
+    "quote": ["finnhub", "alphavantage", "yfinance"],
+    "time_series": ["alphavantage", "yfinance"],
+    "earnings": ["yfinance", "finnhub", "alphavantage"],
+    "company_news": ["alphavantage", "finnhub", "yfinance"],
+    "topic_news": ["alphavantage"],
+    "trends": ["finnhub", "yfinance"],
+}
+
+
+def _num(value: Any) -> Optional[float]:
+    """Providers report numbers as strings, NaN or "None"; normalise to float or None."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def _epoch(moment: datetime) -> int:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def _alpha_time(value: Optional[str]) -> Optional[int]:
+    try:
+        return _epoch(datetime.strptime(value, AV_TIME_FORMAT))
+    except (TypeError, ValueError):
+        return None
+
+
+def bars_from_alpha(ticker: str, period: str, payload: Dict) -> Bars:
+    """Convert an AlphaVantage TIME_SERIES_* payload into columnar bars, oldest first."""
+    series = next((value for key, value in payload.items() if key.startswith("Time Series")), None)
+    if not series:
+        raise ProviderError(f"No time series for {ticker}")
+    days = sorted(series)  # ISO dates sort chronologically
+    if period in PERIOD_DAYS:
+        cutoff = date.fromisoformat(days[-1][:10]) - timedelta(days=PERIOD_DAYS[period])
+        days = [day for day in days if date.fromisoformat(day[:10]) > cutoff]
+    rows = [series[day] for day in days]
+    return Bars(
+        ticker=ticker,
+        interval="1d",
+        t=[_epoch(datetime.fromisoformat(day)) for day in days],
+        o=[float(row["1. open"]) for row in rows],
+        h=[float(row["2. high"]) for row in rows],
+        l=[float(row["3. low"]) for row in rows],
+        c=[float(row["4. close"]) for row in rows],
+        v=[int(row["5. volume"]) for row in rows],
+    )
+
+
+def bars_from_frame(ticker: str, interval: str, frame) -> Bars:
+    """Convert a yfinance history DataFrame into columnar bars."""
+    return Bars(
+        ticker=ticker,
+        interval=interval,
+        t=[_epoch(moment.to_pydatetime()) for moment in frame.index],
+        o=frame["Open"].round(4).tolist(),
+        h=frame["High"].round(4).tolist(),
+        l=frame["Low"].round(4).tolist(),
+        c=frame["Close"].round(4).tolist(),
+        v=frame["Volume"].fillna(0).astype("int64").tolist(),
+    )
+
+
+def news_from_alpha(payload: Dict) -> NewsFeed:
+    if "feed" not in payload:
+        raise ProviderError("No news feed in response")
+    return NewsFeed(items=[
+        NewsItem(
+            title=item.get("title", ""),
+            url=item["url"],
+            source=item.get("source"),
+            published=_alpha_time(item.get("time_published")),
+            summary=item.get("summary") or None,
+            sentiment=_num(item.get("overall_sentiment_score")),
+            tickers=[t["ticker"] for t in item.get("ticker_sentiment", []) if t.get("ticker")],
+        )
+        for item in payload["feed"]
+        if item.get("url")
+    ])
+
+
+def news_from_finnhub(items: List[Dict]) -> NewsFeed:
+    return NewsFeed(items=[
+        NewsItem(
+            title=item.get("headline", ""),
+            url=item["url"],
+            source=item.get("source"),
+            published=item.get("datetime") or None,
+            summary=item.get("summary") or None,
+            tickers=[t for t in item.get("related", "").split(",") if t],
+        )
+        for item in items
+        if item.get("url")
+    ])
+
+
+def news_from_yfinance(items: List[Dict]) -> NewsFeed:
+    news = []
+    for item in items:
+        # yfinance >= 0.2.50 nests the article under "content"
+        content = item.get("content")
+        if content:
+            url = (content.get("canonicalUrl") or content.get("clickThroughUrl") or {}).get("url")
+            published = content.get("pubDate")
+            news.append(dict(
+                title=content.get("title", ""),
+                url=url,
+                source=(content.get("provider") or {}).get("displayName"),
+                published=_epoch(datetime.fromisoformat(published.replace("Z", "+00:00"))) if published else None,
+                summary=content.get("summary") or None,
+            ))
+        else:
+            news.append(dict(
+                title=item.get("title", ""),
+                url=item.get("link"),
+                source=item.get("publisher"),
+                published=item.get("providerPublishTime"),
+                tickers=item.get("relatedTickers", []),
+            ))
+    return NewsFeed(items=[NewsItem(**item) for item in news if item["url"]])
+
+
+def earnings_from_rows(ticker: str, rows: List[Dict], period: str, actual: str, estimate: str, surprise: str) -> Earnings:
+    return Earnings(ticker=ticker, quarters=[
+        EarningsQuarter(
+            period=str(row[period])[:10],
+            eps_actual=_num(row.get(actual)),
+            eps_estimate=_num(row.get(estimate)),
+            surprise_pct=_num(row.get(surprise)),
+        )
+        for row in rows[:4]
+    ])
+
+
+def trends_from_rows(ticker: str, rows: List[Dict]) -> Trends:
+    return Trends(ticker=ticker, periods=[
+        TrendPeriod(
+            period=str(row["period"]),
+            strong_buy=int(row.get("strongBuy", 0)),
+            buy=int(row.get("buy", 0)),
+            hold=int(row.get("hold", 0)),
+            sell=int(row.get("sell", 0)),
+            strong_sell=int(row.get("strongSell", 0)),
+        )
+        for row in rows
+    ])
+
+
+class AlphaVantageProvider(Provider):
+    name = "alphavantage"
+    capabilities = ("search_ticker", "quote", "time_series", "earnings", "company_news", "topic_news")
+
+    async def _query(self, **params) -> Dict:
+        data = await self.pool.get_json(ALPHAVANTAGE_URL, {**params, "apikey": ALPHAVANTAGE_API_KEY})
+        # Quota and key problems come back as 200s with a message instead of data
+        for key in ("Error Message", "Note", "Information"):
+            if key in data:
+                raise ProviderError(data[key])
+        return data
+
+    async def search_ticker(self, company_name: str) -> Optional[TickerMatch]:
+        data = await self._query(function="SYMBOL_SEARCH", keywords=company_name)
+        best_matches = data.get("bestMatches", [])
+        if not best_matches:
+            return None
+        best = best_matches[0]
+        return TickerMatch(symbol=best["1. symbol"], name=best["2. name"], region=best["4. region"])
+
+    async def quote(self, ticker: str) -> Quote:
+        quote = (await self._query(function="GLOBAL_QUOTE", symbol=ticker)).get("Global Quote")
+        if not quote:
+            raise ProviderError(f"No quote for {ticker}")
+        return Quote(
+            ticker=ticker,
+            price=float(quote["05. price"]),
+            change=_num(quote.get("09. change")),
+            change_pct=_num(quote.get("10. change percent", "").rstrip("%")),
+            volume=int(quote["06. volume"]) if quote.get("06. volume") else None,
+            ts=_epoch(datetime.fromisoformat(quote["07. latest trading day"])) if quote.get("07. latest trading day") else None,
+        )
+
+    async def time_series(self, ticker: str, period: str, interval: str) -> Bars:
+        return bars_from_alpha(ticker, period, await self._query(function="TIME_SERIES_DAILY", symbol=ticker))
+
+    async def earnings(self, ticker: str) -> Earnings:
+        data = await self._query(function="EARNINGS", symbol=ticker)
+        return earnings_from_rows(
+            ticker, data.get("quarterlyEarnings", []),
+            "fiscalDateEnding", "reportedEPS", "estimatedEPS", "surprisePercentage",
+        )
+
+    async def company_news(self, ticker: str) -> NewsFeed:
+        return news_from_alpha(await self._query(function="NEWS_SENTIMENT", tickers=ticker))
+
+    async def topic_news(self, topics: List[str]) -> NewsFeed:
+        return news_from_alpha(await self._query(function="NEWS_SENTIMENT", topics=",".join(topics)))
+
+
+class YFinanceProvider(Provider):
+    name = "yfinance"
+    capabilities = ("search_ticker", "quote", "time_series", "earnings", "company_news", "trends")
+
+    @staticmethod
+    def _quote(ticker: str) -> Quote:
+        info = yf.Ticker(ticker).fast_info
+        price, previous = _num(info.last_price), _num(info.previous_close)
+        if price is None:
+            raise ProviderError(f"No quote for {ticker}")
+        change = price - previous if previous else None
+        return Quote(
+            ticker=ticker,
+            price=price,
+            change=change,
+            change_pct=change / previous * 100 if change is not None else None,
+            volume=int(info.last_volume) if _num(info.last_volume) is not None else None,
+        )
+
+    @staticmethod
+    def _history(ticker: str, period: str, interval: str) -> Bars:
+        data = yf.Ticker(ticker).history(period=period, interval=interval)
+        if data.empty:
+            raise ProviderError(f"No data found for {ticker}")
+        return bars_from_frame(ticker, interval, data)
+
+    @staticmethod
+    def _earnings(ticker: str) -> Earnings:
+        earnings = yf.Ticker(ticker).earnings_dates
+        if earnings is None or earnings.empty:
+            raise ProviderError(f"No earnings data found for {ticker}")
+        rows = [{"date": moment.date(), **row} for moment, row in zip(earnings.index, earnings.to_dict("records"))]
+        return earnings_from_rows(ticker, rows, "date", "Reported EPS", "EPS Estimate", "Surprise(%)")
+
+    @staticmethod
+    def _news(ticker: str) -> NewsFeed:
+        return news_from_yfinance(yf.Ticker(ticker).news or [])
+
+    @staticmethod
+    def _recommendations(ticker: str) -> Trends:
+        trends = yf.Ticker(ticker).recommendations
+        if trends is None or trends.empty:
+            raise ProviderError(f"No recommendation trends for {ticker}")
+        return trends_from_rows(ticker, trends.to_dict("records"))
+
+    @staticmethod
+    def _search(company_name: str) -> Optional[TickerMatch]:
+        quotes = yf.Search(company_name, max_results=1).quotes
+        if not quotes:
+            return None
+        best = quotes[0]
+        return TickerMatch(symbol=best["symbol"], name=best.get("shortname") or best.get("longname"), region=best.get("exchange"))
+
+    async def search_ticker(self, company_name: str) -> Optional[TickerMatch]:
+        return await self.pool.run(self._search, company_name)
+
+    async def quote(self, ticker: str) -> Quote:
+        return await self.pool.run(self._quote, ticker)
+
+    async def time_series(self, ticker: str, period: str, interval: str) -> Bars:
+        return await self.pool.run(self._history, ticker, period, interval)
+
+    async def earnings(self, ticker: str) -> Earnings:
+        return await self.pool.run(self._earnings, ticker)
+
+    async def company_news(self, ticker: str) -> NewsFeed:
+        return await self.pool.run(self._news, ticker)
+
+    async def trends(self, ticker: str) -> Trends:
+        return await self.pool.run(self._recommendations, ticker)
+
+
+class FinnhubProvider(Provider):
+    name = "finnhub"
+    capabilities = ("search_ticker", "quote", "earnings", "company_news", "trends")
+
+    async def _get(self, path: str, **params):
+        data = await self.pool.get_json(f"{FINNHUB_URL}{path}", {**params, "token": Config.FINNHUB_API_KEY})
+        if isinstance(data, dict) and "error" in data:
+            raise ProviderError(data["error"])
+        return data
+
+    async def search_ticker(self, company_name: str) -> Optional[TickerMatch]:
+        data = await self._get("/search", q=company_name)
+        results = data.get("result", [])
+        if not results:
+            return None
+        return TickerMatch(symbol=results[0]["symbol"], name=results[0]["description"])
+
+    async def quote(self, ticker: str) -> Quote:
+        data = await self._get("/quote", symbol=ticker)
+        if not data.get("t"):
+            # Unknown symbols come back as an all-zero quote
+            raise ProviderError(f"No quote for {ticker}")
+        return Quote(ticker=ticker, price=data["c"], change=_num(data.get("d")), change_pct=_num(data.get("dp")), ts=data["t"])
+
+    async def earnings(self, ticker: str) -> Earnings:
+        rows = await self._get("/stock/earnings", symbol=ticker)
+        return earnings_from_rows(ticker, rows, "period", "actual", "estimate", "surprisePercent")
+
+    async def company_news(self, ticker: str) -> NewsFeed:
+        today = date.today()
+        items = await self._get("/company-news", symbol=ticker, **{"from": (today - timedelta(days=7)).isoformat(), "to": today.isoformat()})
+        return news_from_finnhub(items)
+
+    async def trends(self, ticker: str) -> Trends:
+        return trends_from_rows(ticker, await self._get("/stock/recommendation", symbol=ticker))
+
+
+class MarketDataService:
+    def __init__(self):
+        self.pools = {
+            "alphavantage": ProviderPool("alphavantage", Config.ALPHAVANTAGE_MAX_CONCURRENCY),
+            "finnhub": ProviderPool("finnhub", Config.FINNHUB_MAX_CONCURRENCY),
+            "yfinance": ProviderPool("yfinance", Config.YFINANCE_MAX_CONCURRENCY, threads=Config.YFINANCE_THREADS),
+        }
+        self.router = ProviderRouter(
+            [
+                AlphaVantageProvider(self.pools["alphavantage"]),
+                YFinanceProvider(self.pools["yfinance"]),
+                FinnhubProvider(self.pools["finnhub"]),
+            ],
+            CAPABILITY_PREFERENCES,
+        )
+
+    async def search_ticker(self, company_name: str) -> Optional[TickerMatch]:
+        """
+        Search for the most relevant ticker symbol for a given company name.
+        
+        Args:
+            company_name (str): Name of the company to search for.
+        
+        Returns:
+            TickerMatch: The most relevant result, or None if not found.
+        """
+        try:
+            _, match = await self.router.call("search_ticker", company_name)
+        except ProviderError as e:
+            logger.warning(f"Ticker search failed for '{company_name}': {e}")
+            return None
+        if match is None:
+            logger.info(f"No results found for '{company_name}'.")
+        return match
+
+
+    async def fetch_quote(self, ticker: str) -> Optional[Quote]:
+        """
+        Fetch the latest quote for a given ticker symbol.
+
+        Args:
+            ticker (str): ticker symbol for the company
+
+        Returns:
+            Quote: last price and change, or None if no provider has it
+        """
+        try:
+            _, quote = await self.router.call("quote", ticker)
+        except ProviderError as e:
+            logger.warning(f"No quote found for {ticker}: {e}")
+            return None
+        return quote
+
+
+    async def fetch_quotes(self, tickers: List[str]) -> List[Quote]:
+        """Quote several tickers concurrently; tickers no provider can quote are left out."""
+        quotes = await asyncio.gather(*(self.fetch_quote(ticker) for ticker in tickers))
+        return [quote for quote in quotes if quote is not None]
+
+
+    async def fetch_time_series_market_data(self, ticker: str, period: str = "1d", interval: str = "1d", use_alpha: bool = True) -> Optional[Bars]:
+        """
+        Fetch real-time and historical market data for a given ticker symbol
+        
+        Args:
+            ticker (str): ticker symbol for the company
+            period (str): time period
+            interval (str): time interval
+            use_alpha (bool): allow AlphaVantage as a source
+
+        Returns:
+            Bars : ticker's OHLCV bars in columnar form, or None if no data was found
+        """
+        logger.info(f"Fetching market data for {ticker} (period={period}, interval={interval})")
+        try:
+            provider, data = await self.router.call(
+                "time_series", ticker, period, interval, exclude=() if use_alpha else ("alphavantage",)
+            )
+        except ProviderError as e:
+            logger.warning(f"No data found for {ticker}: {e}")
+            return None
+        logger.info(f"{provider} data fetched for {ticker}")
+        return data
+
+            
+    async def fetch_earnings(self, ticker: str) -> Optional[Earnings]:
+        """
+        Fetch earnings data for a given ticker symbol.
+        
+        Args:
+            ticker (str): ticker symbol for the company
+
+        Returns:
+            Earnings : ticker's latest quarters, or None if no data was found
+        """
+        logger.info(f"Fetching earnings for {ticker}")
+        try:
+            provider, earnings = await self.router.call("earnings", ticker)
+        except ProviderError as e:
+            logger.warning(f"No earnings data found for {ticker}: {e}")
+            return None
+        logger.info(f"Earnings data found for {ticker} via {provider}")
+        return earnings
+
+
+    async def fetch_company_news(self, ticker: str) -> Optional[NewsFeed]:
+        """
+        Fetch market news for a given ticker symbol (eg. GOOGL, AAPL etc)
+        
+        Args:
+            ticker (str): topic ticker that news data is required for
+
+        Returns:
+            NewsFeed: news data from the tickers 
+        """
+        logger.info(f"Fetching news data for symbol: {ticker}")
+        try:
+            provider, data = await self.router.call("company_news", ticker)
+        except ProviderError:
+            return None
+        logger.info(f"News data fetched for {ticker} via {provider}")
+        return data
+
+
+    async def fetch_topic_news(self, tickers: List[str]) -> Optional[NewsFeed]:
+        """
+        Fetch market news for given topic tickers.\n
+        Supported topics (in format "topic name: ticker_name"):
+
+        Blockchain: blockchain,
+        Earnings: earnings,
+        IPO: ipo,
+        Mergers & Acquisitions: mergers_and_acquisitions,
+        Financial Markets: financial_markets,
+        Economy - Fiscal Policy (e.g., tax reform, government spending): economy_fiscal,
+        Economy - Monetary Policy (e.g., interest rates, inflation): economy_monetary,
+        Economy - Macro/Overall: economy_macro,
+        Energy & Transportation: energy_transportation,
+        Finance: finance,
+        Life Sciences: life_sciences,
+        Manufacturing: manufacturing,
+        Real Estate & Construction: real_estate,
+        Retail & Wholesale: retail_wholesale,
+        Technology: technology
+
+        Args:
+            tickers (List[str]): list of topic tickers that news data is required for
+        
+        Returns:
+            NewsFeed: news data from the tickers 
+
+        """
+        logger.info(f"Fetching news data for topic: {tickers}")
+
+        ticker_names = NEWS_TOPICS.values()
+        tickers = [ticker for ticker in tickers if ticker in ticker_names] # Keep only valid symbols
+
+        try:
+            _, data = await self.router.call("topic_news", tickers)
+        except ProviderError:
+            return None
+        logger.info(f"News data fetched for {tickers}")
+        return data
+
+
+    async def fetch_stock_trends(self, ticker: str) -> Optional[Trends]:
+        """
+        Fetch recommendation trends for a given ticker symbol (eg. GOOGL, AAPL etc)
+        
+        Args:
+            ticker (str): topic ticker that trends data is required for
+
+        Returns:
+            Trends: analyst recommendation counts per period
+        """
+        logger.info(f"Fetching stock trends data for {ticker}")
+        try:
+            provider, data = await self.router.call("trends", ticker)
+        except ProviderError:
+            return None
+        logger.info(f"Trends data fetched for {ticker} via {provider}")
+        return data
+
+    def provider_stats(self) -> Dict:
+        return self.router.stats()
+
+    async def aclose(self):
+        for pool in self.pools.values():
+            await pool.aclose()
+            pool.shutdown()
+    
+
+@lru_cache
+def get_market_data() -> MarketDataService:
+    return MarketDataService()
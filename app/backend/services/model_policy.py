@@ -0,0 +1,184 @@
+# Model Policy
+# Picks the model tier, thinking budget and max_tokens for each agent stage from the request's remaining budget
+
+from functools import lru_cache
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+from pydantic import BaseModel
+from utils.config import Config
+import logging
+import time
+
+logger = logging.getLogger("finbreaker")
+
+# Work that still has to fit in the deadline after each stage
+STAGES_AFTER = {
+    "planner": ("toolbox", "evaluator", "synthesis"),
+    "evaluator": ("synthesis",),
+    "synthesis": (),
+}
+TOOLBOX_PRIOR_SECONDS = 2.0
+DEFAULT_TOKENS_PER_SECOND = 80.0
+
+
+def supports_thinking(model: str) -> bool:
+    return model.startswith("gemini-2.5-")
+
+
+def min_thinking(model: str) -> int:
+    return 128 if "-pro" in model else 0  # 2.5 Pro cannot switch thinking off
+
+
+class ModelChoice(BaseModel):
+    stage: str
+    model: str
+    thinking_budget: Optional[int] = None
+    max_tokens: int
+    estimated_ms: int
+    degraded: bool = False
+
+
+class LatencyTracker:
+    """Running averages of call latency per (model, stage) and output throughput per model."""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.latency: Dict[Tuple[str, str], float] = {}
+        self.throughput: Dict[str, float] = {}
+        self._lock = Lock()
+
+    def _update(self, table: Dict, key, value: float):
+        with self._lock:
+            previous = table.get(key)
+            table[key] = value if previous is None else (1 - self.alpha) * previous + self.alpha * value
+
+    def observe(self, model: str, stage: str, seconds: float, output_tokens: int = 0):
+        self._update(self.latency, (model, stage), seconds)
+        if output_tokens and seconds > 0:
+            self._update(self.throughput, model, output_tokens / seconds)
+
+    def latency_for(self, model: str, stage: str) -> float:
+        observed = self.latency.get((model, stage))
+        if observed is not None:
+            return observed
+        return Config.MODEL_LATENCY_PRIORS.get(model, TOOLBOX_PRIOR_SECONDS if model == "tools" else 5.0)
+
+    def tokens_per_second(self, model: str) -> float:
+        return self.throughput.get(model, DEFAULT_TOKENS_PER_SECOND)
+
+
+class ModelPolicy:
+    """
+    Per-stage model selection under a request deadline and token budget.
+
+    Each stage starts at its configured model and steps down `MODEL_TIERS` until the
+    estimated latency, plus a reserve for the stages still to run, fits the time left.
+    Thinking and output tokens shrink with the remaining slack.
+    """
+
+    def __init__(self, tiers: Optional[List[str]] = None, stage_models: Optional[Dict[str, str]] = None):
+        self.tiers = tiers or Config.MODEL_TIERS
+        self.stage_models = stage_models or Config.STAGE_MODELS
+        self.tracker = LatencyTracker()
+
+    @staticmethod
+    def new_budget(latency_seconds: Optional[float] = None, tokens: Optional[int] = None) -> Dict:
+        now = time.time()  # wall clock, so the deadline survives a checkpoint round trip
+        return {
+            "started": now,
+            "deadline": now + (latency_seconds or Config.REQUEST_LATENCY_BUDGET_SECONDS),
+            "tokens": tokens or Config.REQUEST_TOKEN_BUDGET,
+        }
+
+    @staticmethod
+    def remaining(budget: Dict, log: List[Dict]) -> Tuple[float, int]:
+        used = sum(entry.get("input_tokens", 0) + entry.get("output_tokens", 0) for entry in log)
+        return budget["deadline"] - time.time(), budget["tokens"] - used
+
+    def estimate(self, model: str, stage: str, thinking: int = 0) -> float:
+        return self.tracker.latency_for(model, stage) + thinking / self.tracker.tokens_per_second(model)
+
+    def reserve(self, stages: Iterable[str]) -> float:
+        """Fastest plausible time for the stages after this one."""
+        total = 0.0
+        for stage in stages:
+            if stage == "toolbox":
+                total += self.tracker.latency_for("tools", stage)
+            else:
+                total += min(self.estimate(model, stage, min_thinking(model)) for model in self.ladder(stage))
+        return total
+
+    def ladder(self, stage: str) -> List[str]:
+        preferred = self.stage_models.get(stage, self.tiers[0])
+        start = self.tiers.index(preferred) if preferred in self.tiers else 0
+        return self.tiers[start:] or self.tiers[-1:]
+
+    def _thinking(self, stage: str, model: str, allowed: float, tokens_left: int) -> Optional[int]:
+        if not supports_thinking(model):
+            return None
+        slack = max(0.0, allowed - self.tracker.latency_for(model, stage))
+        # Spend at most half the slack thinking, and at most a quarter of the remaining tokens
+        affordable = min(int(slack * self.tracker.tokens_per_second(model) / 2), tokens_left // 4)
+        return max(min_thinking(model), min(Config.STAGE_THINKING_TOKENS.get(stage, 0), affordable))
+
+    def _max_tokens(self, stage: str, model: str, thinking: int, allowed: float, tokens_left: int) -> int:
+        cap = Config.STAGE_MAX_OUTPUT_TOKENS.get(stage, 1024)
+        slack = max(0.0, allowed - self.estimate(model, stage, thinking))
+        by_time = int(slack * self.tracker.tokens_per_second(model)) + cap // 4
+        floor = min(cap, 64)
+        return max(floor, min(cap, tokens_left - thinking, by_time)) + thinking
+
+    def choose(self, stage: str, budget: Dict, log: List[Dict], after: Optional[Iterable[str]] = None) -> ModelChoice:
+        """
+        Args:
+            stage (str): planner, evaluator or synthesis
+            budget (dict): the request budget from `new_budget`
+            log (list): stage records so far, for tokens already spent
+            after (iterable): stages still to run afterwards; defaults to the usual graph order
+
+        Returns:
+            ModelChoice: model, thinking budget and max_tokens for this call
+        """
+        seconds_left, tokens_left = self.remaining(budget, log)
+        allowed = seconds_left - self.reserve(STAGES_AFTER[stage] if after is None else after)
+        ladder = self.ladder(stage)
+        for i, model in enumerate(ladder):
+            thinking = self._thinking(stage, model, allowed, tokens_left)
+            estimate = self.estimate(model, stage, thinking or 0)
+            if estimate <= allowed or i == len(ladder) - 1:
+                choice = ModelChoice(
+                    stage=stage,
+                    model=model,
+                    thinking_budget=thinking,
+                    max_tokens=self._max_tokens(stage, model, thinking or 0, allowed, tokens_left),
+                    estimated_ms=round(estimate * 1000),
+                    degraded=i > 0,
+                )
+                if choice.degraded:
+                    logger.info(f"{stage}: degraded to {model} ({allowed:.1f}s allowed, {seconds_left:.1f}s left)")
+                return choice
+
+    def observe(self, choice: ModelChoice, seconds: float, usage=None) -> Dict:
+        """Feed the realized latency back into the tracker and return the stage record for the request."""
+        output_tokens = usage.output_tokens if usage else 0
+        self.tracker.observe(choice.model, choice.stage, seconds, output_tokens)
+        return {
+            **choice.model_dump(),
+            "latency_ms": round(seconds * 1000),
+            "input_tokens": usage.input_tokens if usage else 0,
+            "output_tokens": output_tokens,
+        }
+
+    def observe_tools(self, seconds: float):
+        self.tracker.observe("tools", "toolbox", seconds)
+
+    def stats(self) -> Dict:
+        return {
+            "latency_ms": {f"{stage}/{model}": round(seconds * 1000) for (model, stage), seconds in self.tracker.latency.items()},
+            "tokens_per_second": {model: round(tps, 1) for model, tps in self.tracker.throughput.items()},
+        }
+
+
+@lru_cache
+def get_model_policy() -> ModelPolicy:
+    return ModelPolicy()
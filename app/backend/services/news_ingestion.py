@@ -0,0 +1,323 @@
+# News Ingestion
+# Streams NEWS_SENTIMENT articles into the vector store in the background
+
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+from fastapi import APIRouter
+from langchain.schema import Document
+from utils.config import Config
+from app.backend.services.market_data import ALPHAVANTAGE_URL, AV_TIME_FORMAT, NEWS_TOPICS
+from app.backend.services.retrieval import VectorStoreService, get_vector_store
+import asyncio
+import requests
+import logging
+
+router = APIRouter(prefix="/ingestion", tags=["News Ingestion"])
+logger = logging.getLogger("finbreaker")
+
+
+class SeenUrls:
+    """Bounded LRU set of article URLs, so dedupe memory stays flat across polls."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._urls = OrderedDict()
+
+    def add(self, url: str) -> bool:
+        """Returns True if the URL was not seen before."""
+        if url in self._urls:
+            self._urls.move_to_end(url)
+            return False
+        self._urls[url] = None
+        if len(self._urls) > self.max_size:
+            self._urls.popitem(last=False)
+        return True
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._urls
+
+    def __len__(self):
+        return len(self._urls)
+
+
+class DailyCallBudget:
+    """Caps provider calls per UTC day; the count resets at midnight."""
+
+    def __init__(self, max_calls: int):
+        self.max_calls = max_calls
+        self.day = None
+        self.used = 0
+
+    def take(self) -> bool:
+        """Returns True if a call may be made, and counts it."""
+        today = datetime.now(timezone.utc).date()
+        if today != self.day:
+            self.day, self.used = today, 0
+        if self.used >= self.max_calls:
+            return False
+        self.used += 1
+        return True
+
+
+def parse_published(value: str) -> float:
+    """Convert an AlphaVantage `time_published` string to a UTC epoch timestamp."""
+    try:
+        return datetime.strptime(value, AV_TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return datetime.now(timezone.utc).timestamp()
+
+
+def query_key(query: Dict[str, str]) -> str:
+    """Stable name for one feed query, eg. "tickers=TSM"."""
+    return "&".join(f"{name}={value}" for name, value in query.items())
+
+
+def poll_news_feed(
+    topics: List[str],
+    tickers: List[str],
+    cursors: Optional[Dict[str, datetime]] = None,
+    limit: int = 200,
+    budget: Optional[DailyCallBudget] = None,
+    polled: Optional[List[str]] = None,
+) -> Iterator[Dict]:
+    """
+    Poll NEWS_SENTIMENT once per configured topic and ticker, yielding raw articles.
+
+    Args:
+        topics (List[str]): AlphaVantage news topics (eg. earnings, technology)
+        tickers (List[str]): watchlist ticker symbols
+        cursors (dict): per `query_key`, only ask for articles published after this time;
+            queries never polled, then the longest unpolled, go first
+        limit (int): max articles per query
+        budget (DailyCallBudget): stop polling once today's calls are spent
+        polled (list): receives the key of every query whose feed came back
+
+    Yields:
+        dict: one raw feed article
+    """
+    cursors = cursors or {}
+    queries = [{"topics": topic} for topic in topics] + [{"tickers": ticker} for ticker in tickers]
+    # A spent budget skips the tail, so the tail has to move to the front on the next poll
+    oldest = datetime.min.replace(tzinfo=timezone.utc)
+    queries.sort(key=lambda query: cursors.get(query_key(query)) or oldest)
+    for query in queries:
+        if budget is not None and not budget.take():
+            logger.warning(f"Daily news call budget of {budget.max_calls} spent, skipping the remaining queries")
+            return
+        params = {
+            "function": "NEWS_SENTIMENT",
+            "sort": "LATEST",
+            "limit": limit,
+            "apikey": Config.ALPHAVANTAGE_API_KEY,
+            **query,
+        }
+        time_from = cursors.get(query_key(query))
+        if time_from:
+            params["time_from"] = time_from.strftime("%Y%m%dT%H%M")
+
+        try:
+            response = requests.get(ALPHAVANTAGE_URL, params=params, timeout=30)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"News poll failed for {query}: {e}")
+            continue
+
+        feed = data.get("feed")
+        if feed is None:
+            # AlphaVantage reports quota and key errors with a 200 and a message body
+            logger.warning(f"News poll for {query} returned no feed: {data}")
+            continue
+        logger.info(f"News poll for {query} returned {len(feed)} articles")
+        if polled is not None:
+            polled.append(query_key(query))
+        yield from feed
+
+
+def dedupe_articles(articles: Iterable[Dict], seen: SeenUrls) -> Iterator[Dict]:
+    """
+    Drop articles whose URL was already ingested, or already yielded in this pass.
+
+    URLs are not added to `seen` here; the caller marks them once their chunks are indexed,
+    so a failed embedding batch is retried on the next poll.
+    """
+    yielded = set()
+    for article in articles:
+        url = article.get("url")
+        if url and url not in seen and url not in yielded:
+            yielded.add(url)
+            yield article
+
+
+def split_text(text: str, chunk_size: int, overlap: int) -> Iterator[str]:
+    """Split text into overlapping character windows, breaking on whitespace where possible."""
+    text = text.strip()
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            boundary = text.rfind(" ", start + overlap + 1, end)
+            if boundary != -1:
+                end = boundary
+        yield text[start:end].strip()
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+
+
+def article_metadata(article: Dict) -> Dict:
+    """Metadata attached to every chunk of an article."""
+    return {
+        "source": "news",
+        "url": article.get("url"),
+        "title": article.get("title"),
+        "publisher": article.get("source"),
+        "timestamp": parse_published(article.get("time_published")),
+        "tickers": [t["ticker"] for t in article.get("ticker_sentiment", []) if t.get("ticker")],
+        "topics": [NEWS_TOPICS.get(t["topic"], t["topic"].lower()) for t in article.get("topics", []) if t.get("topic")],
+        "sentiment_score": article.get("overall_sentiment_score"),
+        "sentiment_label": article.get("overall_sentiment_label"),
+    }
+
+
+def chunk_articles(articles: Iterable[Dict], chunk_size: int, overlap: int) -> Iterator[Document]:
+    """Turn each article's title, summary and body (when the feed carries one) into chunks."""
+    for article in articles:
+        metadata = article_metadata(article)
+        parts = [article.get("title"), article.get("summary"), article.get("body") or article.get("content")]
+        text = "\n\n".join(part for part in parts if part)
+        for i, chunk in enumerate(split_text(text, chunk_size, overlap)):
+            yield Document(page_content=chunk, metadata={**metadata, "chunk": i})
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class NewsIngestionService:
+    def __init__(self, vector_store: VectorStoreService):
+        self.vector_store = vector_store
+        self.seen = SeenUrls(Config.NEWS_SEEN_URLS_MAX)
+        self.budget = DailyCallBudget(Config.NEWS_INGEST_MAX_CALLS_PER_DAY)
+        self.last_polled: Optional[datetime] = None
+        # Per query: its articles up to this time are indexed. Failed or skipped queries keep theirs.
+        self.cursors: Dict[str, datetime] = {}
+        self.last_stats: Dict = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def run_once(
+        self,
+        topics: Optional[List[str]] = None,
+        tickers: Optional[List[str]] = None,
+    ) -> Dict:
+        """
+        Run one poll -> dedupe -> chunk -> embed -> append pass.
+
+        Every stage is a generator, so at most one embedding batch is held in memory.
+
+        Returns:
+            dict: counts of new articles, indexed chunks and queries polled
+        """
+        topics = topics if topics is not None else Config.NEWS_INGEST_TOPICS
+        tickers = tickers if tickers is not None else Config.WATCHLIST_TICKERS
+        started = datetime.now(timezone.utc)
+
+        stats = {"articles": 0, "chunks": 0}
+
+        def counted(articles):
+            for article in articles:
+                stats["articles"] += 1
+                yield article
+
+        polled: List[str] = []
+        feed = poll_news_feed(topics, tickers, self.cursors, budget=self.budget, polled=polled)
+        articles = counted(dedupe_articles(feed, self.seen))
+        chunks = chunk_articles(articles, Config.NEWS_CHUNK_SIZE, Config.NEWS_CHUNK_OVERLAP)
+        for batch in batched(chunks, Config.NEWS_INGEST_BATCH_SIZE):
+            stats["chunks"] += len(self.vector_store.index_chunks(batch))
+            for chunk in batch:
+                self.seen.add(chunk.metadata["url"])
+
+        for key in polled:
+            self.cursors[key] = started
+        self.last_polled = started
+        self.last_stats = {**stats, "polled": len(polled), "finished_at": datetime.now(timezone.utc).isoformat()}
+        logger.info(f"News ingestion indexed {stats['chunks']} chunks from {stats['articles']} new articles")
+        return self.last_stats
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error(f"News ingestion run failed: {e}")
+            await asyncio.sleep(Config.NEWS_INGEST_INTERVAL_SECONDS)
+
+    def start(self):
+        """Start the periodic ingestion loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+            logger.info("News ingestion scheduler started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def search(
+        self,
+        query: str,
+        ticker: Optional[str] = None,
+        topic: Optional[str] = None,
+        k: int = 5,
+    ) -> List[Dict]:
+        """Retrieve ingested news chunks, optionally restricted to a ticker or topic."""
+        results = self.vector_store.retrieve(query, k=k, ticker=ticker, source="news", topic=topic.lower() if topic else None)
+        return [
+            {
+                "title": r["metadata"].get("title"),
+                "url": r["metadata"].get("url"),
+                "published": datetime.fromtimestamp(r["metadata"]["timestamp"], timezone.utc).isoformat(),
+                "sentiment": r["metadata"].get("sentiment_label"),
+                "content": r["content"],
+            }
+            for r in results["results"]
+        ]
+
+
+@lru_cache
+def get_news_ingestion() -> NewsIngestionService:
+    return NewsIngestionService(get_vector_store())
+
+
+@router.post("/news/run")
+async def run_news_ingestion():
+    """Trigger an ingestion pass immediately instead of waiting for the scheduler."""
+    return await asyncio.to_thread(get_news_ingestion().run_once)
+
+
+@router.get("/news/status")
+def news_ingestion_status():
+    service = get_news_ingestion()
+    return {
+        "running": service._task is not None and not service._task.done(),
+        "last_polled": service.last_polled.isoformat() if service.last_polled else None,
+        "seen_urls": len(service.seen),
+        "calls_today": service.budget.used,
+        "cursors": {key: cursor.isoformat() for key, cursor in service.cursors.items()},
+        "last_run": service.last_stats,
+    }
+
+
+@router.get("/")
+def root():
+    return {"status": "News Ingestion running"}
@@ -0,0 +1,389 @@
+# Profiler
+# On-demand sampling profiler: wall and CPU stacks of profiled requests across the event loop and worker threads
+
+from collections import defaultdict
+from concurrent.futures import thread as futures_thread
+from contextlib import contextmanager
+from contextvars import Context, ContextVar
+from functools import lru_cache, wraps
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import Response
+from utils.config import Config
+from app.backend.api.schema import ProfileRequest
+from app.backend.utils.serialization import dumps
+from app.backend.utils.shared_state import shared_path
+import asyncio
+import json
+import logging
+import secrets
+import sys
+import threading
+import time
+import uuid
+
+router = APIRouter(prefix="/admin/profiler", tags=["Profiler"])
+logger = logging.getLogger("finbreaker")
+
+# Set by the agent nodes and the brief endpoint; copied into tasks and to_thread calls with the context
+current_stage: ContextVar[Optional[str]] = ContextVar("profile_stage", default=None)
+_current_session: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+
+IDLE = "(event loop idle)"
+BACKGROUND = "(background)"
+# Frames that run a callback inside a captured Context: event loop handles and executor work items
+_HANDLE_RUN = asyncio.events.Handle._run.__code__
+_WORK_ITEM_RUN = futures_thread._WorkItem.run.__code__
+
+
+@contextmanager
+def stage(name: str):
+    token = current_stage.set(name)
+    try:
+        yield
+    finally:
+        current_stage.reset(token)
+
+
+def staged(name: str, func):
+    """Wrap an async agent node so samples taken while it runs are attributed to `name`."""
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        with stage(name):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+def _running_context(frame) -> Optional[Context]:
+    """Innermost Context a thread is running code in, found on its stack."""
+    while frame is not None:
+        code = frame.f_code
+        if code is _HANDLE_RUN:
+            return frame.f_locals["self"]._context
+        if code is _WORK_ITEM_RUN:
+            # asyncio.to_thread submits partial(context.run, func, ...)
+            fn = frame.f_locals["self"].fn
+            owner = getattr(getattr(fn, "func", None), "__self__", None)
+            if isinstance(owner, Context):
+                return owner
+        frame = frame.f_back
+    return None
+
+
+def _thread_cpu(ident: int) -> Optional[float]:
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (OSError, AttributeError):
+        return None
+
+
+class ProfileSession:
+    """
+    Samples collected for one profiling window.
+
+    `requests` sessions record only the threads running a claimed request's context (plus the
+    event loop while it waits on I/O for them); `seconds` sessions record every busy thread.
+    """
+
+    def __init__(self, requests: Optional[int], seconds: Optional[float], interval: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.interval = interval
+        self.remaining = requests
+        self.started = time.time()
+        self.deadline = time.monotonic() + min(seconds or Config.PROFILER_MAX_SECONDS, Config.PROFILER_MAX_SECONDS)
+        self.window = requests is None
+        self.profiled = 0
+        self.in_flight = 0
+        self.loop_threads = set()
+        self.done = threading.Event()
+        self.frames: List[Tuple[str, str, int]] = []
+        self._frame_ids: Dict = {}
+        # (stage, thread, frame ids root -> leaf) -> [wall seconds, cpu seconds]
+        self.samples: Dict[Tuple, List[float]] = defaultdict(lambda: [0.0, 0.0])
+        self.ticks = 0
+
+    def claim(self) -> bool:
+        if self.window:
+            return True
+        if not self.remaining:
+            return False
+        self.remaining -= 1
+        return True
+
+    def stack(self, frame) -> Tuple[int, ...]:
+        ids = []
+        while frame is not None:
+            code = frame.f_code
+            frame_id = self._frame_ids.get(code)
+            if frame_id is None:
+                frame_id = self._frame_ids[code] = len(self.frames)
+                self.frames.append((code.co_qualname, code.co_filename, code.co_firstlineno))
+            ids.append(frame_id)
+            frame = frame.f_back
+        return tuple(reversed(ids))
+
+    def record(self, stage_name: str, thread_name: str, frame, wall: float, cpu: float):
+        totals = self.samples[(stage_name, thread_name, self.stack(frame))]
+        totals[0] += wall
+        totals[1] += cpu
+
+    def summary(self) -> Dict:
+        by_stage = defaultdict(lambda: {"wall_s": 0.0, "cpu_s": 0.0})
+        for (stage_name, _, _), (wall, cpu) in list(self.samples.items()):
+            by_stage[stage_name]["wall_s"] += wall
+            by_stage[stage_name]["cpu_s"] += cpu
+        return {
+            "id": self.id,
+            "started": self.started,
+            "mode": "seconds" if self.window else "requests",
+            "requests": self.profiled,
+            "ticks": self.ticks,
+            "interval_ms": self.interval * 1000,
+            "stages": {name: {k: round(v, 3) for k, v in totals.items()} for name, totals in by_stage.items()},
+            "active": not self.done.is_set(),
+        }
+
+    def export(self) -> Dict:
+        return {
+            "summary": self.summary(),
+            "frames": self.frames,
+            "samples": [[stage_name, thread_name, list(ids), wall, cpu] for (stage_name, thread_name, ids), (wall, cpu) in list(self.samples.items())],
+        }
+
+
+class Profiler:
+    """
+    Opt-in sampler. Nothing runs until a session is armed; then one daemon thread wakes every
+    interval, walks `sys._current_frames()` and charges each stack with the wall time since the
+    last tick and the CPU time its thread burned (per-thread CPU clocks), under the agent stage
+    found in the context the thread is running.
+    """
+
+    def __init__(self):
+        self.active: Optional[ProfileSession] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self, requests: Optional[int] = None, seconds: Optional[float] = None, interval_ms: Optional[float] = None) -> ProfileSession:
+        with self._lock:
+            if self.active is not None:
+                raise RuntimeError(f"Profile {self.active.id} is already running")
+            session = self.active = ProfileSession(requests, seconds, (interval_ms or Config.PROFILER_INTERVAL_MS) / 1000)
+        try:
+            asyncio.get_running_loop()
+            session.loop_threads.add(threading.get_ident())
+        except RuntimeError:
+            pass  # armed outside the event loop; its idle time is picked up once a request claims the session
+        self._thread = threading.Thread(target=self._run, args=(session,), name="profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"Profiling started: {session.id} ({'window' if session.window else f'{requests} requests'})")
+        return session
+
+    def stop(self) -> Optional[ProfileSession]:
+        session, thread = self.active, self._thread
+        if session is None:
+            return None
+        session.done.set()
+        thread.join()
+        return session
+
+    @contextmanager
+    def request(self, force: bool = False) -> Iterator[Optional[ProfileSession]]:
+        """
+        Profile the enclosed request if a session wants it, or start a one-request session when
+        `force` (the X-Profile header) is set. A no-op when profiling is off.
+        """
+        session = self.active
+        if session is None and force:
+            try:
+                session = self.start(requests=1)
+            except RuntimeError:
+                session = self.active
+        if session is None or session.done.is_set() or not session.claim():
+            yield None
+            return
+        session.loop_threads.add(threading.get_ident())
+        session.profiled += 1
+        session.in_flight += 1
+        token = _current_session.set(session)
+        try:
+            yield session
+        finally:
+            _current_session.reset(token)
+            session.in_flight -= 1
+            if not session.window and not session.remaining and not session.in_flight:
+                session.done.set()
+
+    def _run(self, session: ProfileSession):
+        me = threading.get_ident()
+        cpu_seen: Dict[int, float] = {}
+        last = time.monotonic()
+        try:
+            while not session.done.wait(session.interval):
+                now = time.monotonic()
+                if now > session.deadline:
+                    break
+                self._sample(session, me, cpu_seen, now - last)
+                last = now
+        except Exception as e:
+            logger.error(f"Profiler stopped on error: {e}")
+        finally:
+            session.done.set()
+            self._save(session)
+            with self._lock:
+                if self.active is session:
+                    self.active = None
+
+    def _sample(self, session: ProfileSession, me: int, cpu_seen: Dict[int, float], wall: float):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        session.ticks += 1
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            now = _thread_cpu(ident)
+            cpu = now - cpu_seen[ident] if now is not None and ident in cpu_seen else 0.0
+            if now is not None:
+                cpu_seen[ident] = now
+            context = _running_context(frame)
+            if context is not None and (session.window or context.get(_current_session) is session):
+                stage_name = context.get(current_stage) or "request"
+            elif context is None and ident in session.loop_threads and (session.window or session.in_flight):
+                stage_name = IDLE  # the loop is parked in select(): waiting on I/O
+            elif session.window and cpu > 0:
+                stage_name = BACKGROUND
+            else:
+                continue
+            session.record(stage_name, names.get(ident, str(ident)), frame, wall, cpu)
+
+    def _save(self, session: ProfileSession):
+        path = shared_path("profiles", f"{session.id}.json")
+        path.write_bytes(dumps(session.export()))
+        for old in sorted(path.parent.glob("*.json"), key=lambda p: p.stat().st_mtime)[:-Config.PROFILER_KEEP]:
+            old.unlink(missing_ok=True)
+        logger.info(f"Profile {session.id} saved: {session.ticks} ticks over {session.profiled} requests")
+
+    def saved(self) -> List[Dict]:
+        profiles = [json.loads(path.read_bytes())["summary"] for path in Path(Config.SHARED_STATE_DIR, "profiles").glob("*.json")]
+        return sorted(profiles, key=lambda p: p["started"], reverse=True)
+
+
+def load_profile(profile_id: str) -> Optional[Dict]:
+    path = shared_path("profiles", f"{profile_id}.json")
+    return json.loads(path.read_bytes()) if path.exists() else None
+
+
+def _stacks(profile: Dict, mode: str) -> Iterator[Tuple[List[str], List[int], float]]:
+    for stage_name, thread_name, ids, wall, cpu in profile["samples"]:
+        weight = wall if mode == "wall" else cpu
+        if weight > 0:
+            yield [stage_name, thread_name], ids, weight
+
+
+def to_collapsed(profile: Dict, mode: str) -> str:
+    """Brendan Gregg's folded format (flamegraph.pl, speedscope, inferno); weights in microseconds."""
+    names = [f"{name} ({file.rsplit('/', 1)[-1]}:{line})" for name, file, line in profile["frames"]]
+    lines = [
+        ";".join(prefix + [names[i] for i in ids]) + f" {round(weight * 1e6)}"
+        for prefix, ids, weight in _stacks(profile, mode)
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(profile: Dict) -> Dict:
+    """speedscope.app file with a wall-time and a CPU-time profile; stage and thread are the two root frames."""
+    frames = [{"name": name, "file": file, "line": line} for name, file, line in profile["frames"]]
+    synthetic: Dict[str, int] = {}
+
+    def root(name: str) -> int:
+        if name not in synthetic:
+            synthetic[name] = len(frames)
+            frames.append({"name": name})
+        return synthetic[name]
+
+    profiles = []
+    for mode in ("wall", "cpu"):
+        samples, weights = [], []
+        for prefix, ids, weight in _stacks(profile, mode):
+            samples.append([root(name) for name in prefix] + ids)
+            weights.append(weight)
+        profiles.append({
+            "type": "sampled",
+            "name": f"{mode} time",
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        })
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": f"finbreaker profile {profile['summary']['id']}",
+        "exporter": "finbreaker",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": profiles,
+    }
+
+
+@lru_cache
+def get_profiler() -> Profiler:
+    return Profiler()
+
+
+def authorized(token: Optional[str]) -> bool:
+    """Deny by default: without ADMIN_TOKEN configured, no token is accepted."""
+    if not Config.ADMIN_TOKEN or token is None:
+        return False
+    return secrets.compare_digest(token.encode(), Config.ADMIN_TOKEN.encode())
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not Config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiler is disabled; set ADMIN_TOKEN to enable it")
+    if not authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@router.post("/start", dependencies=[Depends(require_admin)])
+async def start_profile(request: ProfileRequest):
+    """Arm the profiler for the next N morning briefs, or for a time window on this worker."""
+    if not request.requests and not request.seconds:
+        raise HTTPException(status_code=400, detail="Set requests or seconds")
+    try:
+        session = get_profiler().start(request.requests, request.seconds, request.interval_ms)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return session.summary()
+
+
+@router.post("/stop", dependencies=[Depends(require_admin)])
+async def stop_profile():
+    session = await asyncio.to_thread(get_profiler().stop)
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profile running")
+    return session.summary()
+
+
+@router.get("", dependencies=[Depends(require_admin)])
+def list_profiles():
+    """The running profile and saved ones, newest first, with wall and CPU seconds per agent stage."""
+    profiler = get_profiler()
+    return {"active": profiler.active.summary() if profiler.active else None, "profiles": profiler.saved()}
+
+
+@router.get("/{profile_id}", dependencies=[Depends(require_admin)])
+def download_profile(
+    profile_id: str,
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed)$"),
+    mode: str = Query("wall", pattern="^(wall|cpu)$", description="Collapsed stacks only; speedscope files carry both"),
+):
+    """Download a saved profile: open speedscope files at speedscope.app, or feed collapsed stacks to flamegraph.pl."""
+    profile = load_profile(profile_id) if profile_id.isalnum() else None
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        body, media_type, filename = to_collapsed(profile, mode), "text/plain", f"{profile_id}-{mode}.folded"
+    else:
+        body, media_type, filename = dumps(to_speedscope(profile)), "application/json", f"{profile_id}.speedscope.json"
+    return Response(body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
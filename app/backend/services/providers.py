@@ -0,0 +1,318 @@
+# Market Data Providers
+# Per-provider concurrency budgets, health tracking, circuit breakers and hedged failover
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+from utils.config import Config
+import asyncio
+import contextvars
+import httpx
+import logging
+import time
+
+logger = logging.getLogger("finbreaker")
+
+
+class ProviderPool:
+    """
+    Concurrency budget for one upstream provider.
+
+    HTTP providers share an async client; blocking libraries (yfinance) get their own
+    thread pool instead of Starlette's default one. Either way, at most `max_concurrency`
+    calls are in flight and the rest wait on this provider's semaphore only.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, threads: int = 0, timeout: float = 15.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=name) if threads else None
+        # asyncio primitives and httpx clients belong to one event loop
+        self._loop_state: "WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = WeakKeyDictionary()
+        self.in_flight = 0
+        self.waiting = 0
+
+    def _state(self) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        state = self._loop_state.get(loop)
+        if state is None:
+            state = self._loop_state[loop] = {"semaphore": asyncio.Semaphore(self.max_concurrency), "client": None}
+        return state
+
+    @asynccontextmanager
+    async def slot(self):
+        semaphore = self._state()["semaphore"]
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            semaphore.release()
+
+    def client(self) -> httpx.AsyncClient:
+        state = self._state()
+        if state["client"] is None:
+            limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+            state["client"] = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+        return state["client"]
+
+    async def get_json(self, url: str, params: Optional[Dict] = None) -> Any:
+        async with self.slot():
+            response = await self.client().get(url, params=params)
+            response.raise_for_status()
+            return response.json()
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking call on this provider's dedicated executor, in the caller's context like asyncio.to_thread."""
+        context = contextvars.copy_context()
+        async with self.slot():
+            return await asyncio.get_running_loop().run_in_executor(self.executor, partial(context.run, func, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "threads": self.executor._max_workers if self.executor else 0,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+        }
+
+    async def aclose(self):
+        state = self._loop_state.get(asyncio.get_running_loop())
+        if state and state["client"] is not None:
+            await state["client"].aclose()
+            state["client"] = None
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ProviderError(Exception):
+    """An upstream answered, but not with usable data (quota notes, error payloads, empty frames)."""
+
+
+class ProviderHealth:
+    """Rolling latency and error record for one provider."""
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)  # (latency_seconds, ok)
+
+    def record(self, latency: float, ok: Optional[bool]):
+        """
+        Args:
+            ok (bool): None for a call cancelled before it finished, such as the loser of a
+                hedge race; its latency is a lower bound, and it has no outcome
+        """
+        self.samples.append((latency, ok))
+
+    def latency_percentile(self, pct: float) -> Optional[float]:
+        # Cancelled calls count at the time they were cut off: leaving the slowest calls
+        # out would keep p95 low and make hedging fire ever more often
+        latencies = sorted(latency for latency, ok in self.samples if ok is not False)
+        if len(latencies) < Config.PROVIDER_MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(pct / 100 * len(latencies)))]
+
+    def error_rate(self) -> float:
+        outcomes = [ok for _, ok in self.samples if ok is not None]
+        if not outcomes:
+            return 0.0
+        return outcomes.count(False) / len(outcomes)
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p95 = self.latency_percentile(50), self.latency_percentile(95)
+        return {
+            "samples": len(self.samples),
+            "error_rate": round(self.error_rate(), 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after too many failures, open -> half-open after a cooldown,
+    half-open -> closed on the first success (or back to open on failure).
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int, error_rate_threshold: float, cooldown: float, window: int):
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.cooldown = cooldown
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            # Exactly one trial call while half-open
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+            return True
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+        if self.state == self.HALF_OPEN:
+            logger.info("Circuit closed after successful probe")
+            self.outcomes.clear()
+        self.state = self.CLOSED
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        failures = self.outcomes.count(False)
+        tripped = (
+            self.state == self.HALF_OPEN
+            or self.consecutive_failures >= self.failure_threshold
+            or (len(self.outcomes) >= Config.PROVIDER_MIN_SAMPLES and failures / len(self.outcomes) >= self.error_rate_threshold)
+        )
+        if tripped:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+
+    def release(self):
+        """A call was cancelled (lost a hedge race) without an outcome."""
+        self.probe_in_flight = False
+
+
+class Provider:
+    """
+    One upstream data source. Subclasses implement the capabilities they support as
+    async methods; every call goes through `invoke` so health and breaker state stay current.
+    """
+
+    name = "provider"
+    capabilities: Tuple[str, ...] = ()
+
+    def __init__(self, pool: Optional[ProviderPool] = None):
+        self.pool = pool
+        self.health = ProviderHealth(Config.PROVIDER_WINDOW)
+        self.breaker = CircuitBreaker(
+            failure_threshold=Config.BREAKER_FAILURE_THRESHOLD,
+            error_rate_threshold=Config.BREAKER_ERROR_RATE,
+            cooldown=Config.BREAKER_COOLDOWN_SECONDS,
+            window=Config.PROVIDER_WINDOW,
+        )
+
+    def supports(self, capability: str) -> bool:
+        return capability in self.capabilities
+
+    async def invoke(self, capability: str, *args, **kwargs) -> Any:
+        start = time.monotonic()
+        try:
+            result = await getattr(self, capability)(*args, **kwargs)
+        except asyncio.CancelledError:
+            self.health.record(time.monotonic() - start, ok=None)
+            self.breaker.release()
+            raise
+        except Exception:
+            self.health.record(time.monotonic() - start, ok=False)
+            self.breaker.record_failure()
+            raise
+        self.health.record(time.monotonic() - start, ok=True)
+        self.breaker.record_success()
+        return result
+
+    def hedge_delay(self) -> float:
+        p95 = self.health.latency_percentile(95)
+        return p95 if p95 is not None else Config.HEDGE_DEFAULT_DELAY_SECONDS
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **(self.pool.stats() if self.pool else {}),
+            **self.health.stats(),
+            "breaker": self.breaker.state,
+        }
+
+
+class ProviderRouter:
+    """
+    Routes a capability to the first healthy provider in preference order.
+
+    If the primary has not answered within its own p95 latency, the next provider is
+    fired as a hedge and whichever succeeds first wins. Failures fall through to the
+    next provider immediately; open circuits are skipped.
+    """
+
+    def __init__(self, providers: List[Provider], preferences: Dict[str, List[str]]):
+        self.providers = {provider.name: provider for provider in providers}
+        self.preferences = preferences
+
+    def candidates(self, capability: str, exclude: Iterable[str] = ()) -> List[Provider]:
+        order = self.preferences.get(capability, list(self.providers))
+        return [
+            self.providers[name]
+            for name in order
+            if name in self.providers and name not in exclude and self.providers[name].supports(capability)
+        ]
+
+    async def call(self, capability: str, *args, exclude: Iterable[str] = (), **kwargs) -> Tuple[str, Any]:
+        """
+        Returns:
+            tuple: (provider name, payload) from the first provider to succeed
+        """
+        queue = self.candidates(capability, exclude)
+        running: Dict[asyncio.Task, Provider] = {}
+        errors = []
+
+        def launch_next() -> bool:
+            while queue:
+                provider = queue.pop(0)
+                if provider.breaker.allow():
+                    task = asyncio.create_task(provider.invoke(capability, *args, **kwargs))
+                    running[task] = provider
+                    return True
+                errors.append(f"{provider.name}: circuit open")
+            return False
+
+        launch_next()
+        try:
+            while running:
+                # Only hedge while a single call is outstanding and a fallback exists
+                timeout = None
+                if Config.HEDGING_ENABLED and len(running) == 1 and queue:
+                    timeout = next(iter(running.values())).hedge_delay()
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    logger.info(f"Hedging {capability}: {next(iter(running.values())).name} slower than p95")
+                    launch_next()
+                    continue
+                for task in done:
+                    provider = running.pop(task)
+                    if task.exception() is None:
+                        return provider.name, task.result()
+                    errors.append(f"{provider.name}: {task.exception()}")
+                    logger.warning(f"{provider.name} failed for {capability}: {task.exception()}")
+                if not running:
+                    launch_next()
+        finally:
+            for task in running:
+                task.cancel()
+            # Let the losers record their cut-off latency and release their breaker probe before returning
+            await asyncio.gather(*running, return_exceptions=True)
+
+        raise ProviderError(f"All providers failed for {capability}: {'; '.join(errors) or 'none available'}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: provider.stats() for name, provider in self.providers.items()}
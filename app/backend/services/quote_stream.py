@@ -0,0 +1,150 @@
+# Quote Stream
+# One upstream poller per subscribed symbol, fanned out to every WebSocket subscriber as deltas
+
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+from utils.config import Config
+from app.backend.services.market_data import MarketDataService, get_market_data
+import asyncio
+import logging
+
+logger = logging.getLogger("finbreaker")
+
+
+class QuoteSubscriber:
+    """
+    Outbox for one client.
+
+    Pending updates are keyed by ticker, so the outbox never holds more than one entry per
+    subscribed symbol: while the client is busy receiving, newer deltas for a ticker are
+    merged into the one already waiting instead of queueing behind it.
+    """
+
+    def __init__(self):
+        self.tickers: Set[str] = set()
+        self.pending: Dict[str, Dict] = {}
+        self.control: Dict = {}
+        self.coalesced = 0
+        self._ready = asyncio.Event()
+
+    def offer(self, ticker: str, fields: Dict):
+        if ticker in self.pending:
+            self.pending[ticker].update(fields)
+            self.coalesced += 1
+        else:
+            self.pending[ticker] = {"ticker": ticker, **fields}
+        self._ready.set()
+
+    def notify(self, **control):
+        self.control.update(control)
+        self._ready.set()
+
+    async def next_message(self) -> Dict:
+        """Wait for anything to send, then drain the outbox into one message."""
+        await self._ready.wait()
+        self._ready.clear()
+        message = {**self.control}
+        if self.pending:
+            message["quotes"] = list(self.pending.values())
+        self.pending, self.control = {}, {}
+        return message
+
+
+class QuoteHub:
+    """
+    Shares one poller per symbol across all subscribers.
+
+    Pollers go through MarketDataService, so they use the same per-provider pools, breakers
+    and failover as the REST endpoints. Upstream volume depends on the number of distinct
+    symbols watched, not on the number of clients; a poller stops with its last subscriber.
+    """
+
+    def __init__(self, market: MarketDataService, interval: float, max_tickers: int):
+        self.market = market
+        self.interval = interval
+        self.max_tickers = max_tickers
+        self.subscribers: Dict[str, Set[QuoteSubscriber]] = {}
+        self.pollers: Dict[str, asyncio.Task] = {}
+        self.last: Dict[str, Dict] = {}
+        self.upstream_calls = 0
+        self.updates = 0
+
+    def subscribe(self, subscriber: QuoteSubscriber, tickers: Iterable[str]) -> List[str]:
+        """Returns the tickers actually added; the rest were duplicates or over the per-client cap."""
+        added = []
+        for ticker in tickers:
+            ticker = ticker.strip().upper()
+            if not ticker or ticker in subscriber.tickers:
+                continue
+            if len(subscriber.tickers) >= self.max_tickers:
+                break
+            subscriber.tickers.add(ticker)
+            self.subscribers.setdefault(ticker, set()).add(subscriber)
+            added.append(ticker)
+            if ticker in self.last:
+                subscriber.offer(ticker, self.last[ticker])  # full snapshot first, deltas after
+            if ticker not in self.pollers:
+                self.pollers[ticker] = asyncio.create_task(self._poll(ticker))
+        return added
+
+    def unsubscribe(self, subscriber: QuoteSubscriber, tickers: Optional[Iterable[str]] = None):
+        for ticker in list(subscriber.tickers if tickers is None else (t.strip().upper() for t in tickers)):
+            if ticker not in subscriber.tickers:
+                continue
+            subscriber.tickers.discard(ticker)
+            subscriber.pending.pop(ticker, None)
+            watchers = self.subscribers.get(ticker)
+            watchers.discard(subscriber)
+            if not watchers:
+                del self.subscribers[ticker]
+                self.last.pop(ticker, None)
+                poller = self.pollers.pop(ticker, None)
+                if poller:
+                    poller.cancel()
+
+    def publish(self, ticker: str, quote: Dict):
+        """Send the fields that changed since the last quote to every subscriber of `ticker`."""
+        last = self.last.get(ticker, {})
+        delta = {field: value for field, value in quote.items() if field != "ticker" and last.get(field) != value}
+        if not delta:
+            return
+        self.last[ticker] = {**last, **delta}
+        self.updates += 1
+        for subscriber in self.subscribers.get(ticker, ()):
+            subscriber.offer(ticker, delta)
+
+    async def _poll(self, ticker: str):
+        while ticker in self.subscribers:
+            try:
+                self.upstream_calls += 1
+                quote = await self.market.fetch_quote(ticker)
+                if quote is not None:
+                    self.publish(ticker, quote.model_dump(exclude_none=True))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Quote poll failed for {ticker}: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        pollers = list(self.pollers.values())
+        for poller in pollers:
+            poller.cancel()
+        await asyncio.gather(*pollers, return_exceptions=True)
+        self.pollers.clear()
+
+    def stats(self) -> Dict:
+        clients = set().union(*self.subscribers.values()) if self.subscribers else set()
+        return {
+            "symbols": len(self.pollers),
+            "clients": len(clients),
+            "subscriptions": sum(len(watchers) for watchers in self.subscribers.values()),
+            "upstream_calls": self.upstream_calls,
+            "updates": self.updates,
+            "coalesced": sum(client.coalesced for client in clients),
+        }
+
+
+@lru_cache
+def get_quote_hub() -> QuoteHub:
+    return QuoteHub(get_market_data(), Config.QUOTE_POLL_INTERVAL_SECONDS, Config.QUOTE_STREAM_MAX_TICKERS)
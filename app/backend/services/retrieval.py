@@ -1,51 +1,426 @@
-# Retriever Agent
-# Handles indexing and retrieval from vector store
-
-from fastapi import APIRouter
-from functools import lru_cache
-from typing import List
-from langchain.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.docstore import InMemoryDocstore
-from langchain.schema import Document
-import faiss
-import logging
-
-router = APIRouter(prefix="/retriever", tags=["Retriever Agent"])
-
-model_name = "sentence-transformers/all-mpnet-base-v2"  
-model_kwargs = {'device': 'cpu'}  
-encode_kwargs = {'normalize_embeddings': False}
-logger = logging.getLogger("finbreaker")
-
-
-class VectorStoreService:
-    def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(  
-            model_name=model_name,  
-            model_kwargs=model_kwargs,  
-            encode_kwargs=encode_kwargs  
-            )
-        test_emb = self.embeddings.embed_query("test")
-        embedding_size = len(test_emb)
-        index = faiss.IndexFlatL2(embedding_size)
-        docstore = InMemoryDocstore({})
-        self.vector_store = FAISS(self.embeddings.embed_query, index, docstore, {})
-        
-    def index_documents(self, docs: List[str]):
-        logger.info(f"Indexing {len(docs)} documents.")
-        doc_objs = [Document(page_content=doc) for doc in docs]
-        ids = self.vector_store.add_documents(doc_objs)
-        logger.info(f"Indexed {len(ids)} documents.")
-        return {"indexed": len(ids)}
-
-    def retrieve(self, query: str, k: int = 3):
-        logger.info(f"Retrieving top {k} results for query: {query}")
-        results = self.vector_store.similarity_search(query, k=k)
-        logger.info(f"Retrieved {len(results)} results.")
-        return {"results": [r.page_content for r in results]}
-    
-
-@lru_cache
-def get_vector_store() -> VectorStoreService:
-    return VectorStoreService()
\ No newline at end of file
+# Retriever Agent
+# Handles indexing and retrieval from vector store
+
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import datetime
+from fastapi import APIRouter
+from functools import lru_cache
+from itertools import islice
+from threading import RLock
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+from langchain.embeddings import HuggingFaceEmbeddings
+from langchain.schema import Document
+from utils.config import Config
+from app.backend.api.schema import DeleteRequest, IndexRequest, RetrievalRequest
+from app.backend.services.bm25 import BM25Index, reciprocal_rank_fusion
+import numpy as np
+import asyncio
+import faiss
+import logging
+import time
+
+router = APIRouter(prefix="/retriever", tags=["Retriever Agent"])
+
+model_name = "sentence-transformers/all-mpnet-base-v2"
+model_kwargs = {'device': 'cpu'}
+encode_kwargs = {'normalize_embeddings': False}
+logger = logging.getLogger("finbreaker")
+
+# Metadata fields that get an inverted id-set index for pre-filtering
+FILTER_FIELDS = ("ticker", "source", "topic")
+# Below this many candidates, score the subset directly instead of scanning the index with a selector
+SUBSET_SCAN_MAX = 4096
+RRF_K = 60
+
+
+def _filter_values(metadata: Dict, field: str) -> List[Any]:
+    """Chunks carry either a scalar (`ticker`) or a list (`tickers`) for a field."""
+    values = metadata.get(f"{field}s", [])
+    if metadata.get(field) is not None:
+        values = [*values, metadata[field]]
+    return [v.upper() if field == "ticker" and isinstance(v, str) else v for v in values]
+
+
+class VectorStoreService:
+    def __init__(self):
+        self.embeddings = HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs=model_kwargs,
+            encode_kwargs=encode_kwargs
+            )
+        test_emb = self.embeddings.embed_query("test")
+        embedding_size = len(test_emb)
+        # Int64 ids let metadata filters hand FAISS an id selector, and keep ids stable for deletes
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(embedding_size))
+        self.docs: Dict[int, Document] = {}
+        self.sparse = BM25Index()
+        self.postings: Dict[str, Dict[Any, Set[int]]] = {field: defaultdict(set) for field in FILTER_FIELDS}
+        # Sorted (timestamp, id). Deletes leave their entries behind; maintenance prunes them in one pass
+        self.timeline: List[tuple] = []
+        # Deleted ids whose vectors are still in FAISS; masked out of searches until compaction
+        self.tombstones: Set[int] = set()
+        self._next_id = 0
+        # Bumped by every change to the index, so the index writer knows when to publish a snapshot
+        self.mutations = 0
+        self._lock = RLock()
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self.last_maintenance: Dict = {}
+
+    def index_documents(self, docs: Iterable[Union[str, Document]], batch_size: Optional[int] = None) -> Dict:
+        """
+        Index raw strings or prepared chunks.
+
+        `docs` is consumed lazily, one embedding batch at a time, so a parser's chunk
+        generator flows straight into the index without being materialized.
+        """
+        iterator = iter(docs)
+        indexed = 0
+        while batch := list(islice(iterator, batch_size or Config.NEWS_INGEST_BATCH_SIZE)):
+            chunks = [doc if isinstance(doc, Document) else Document(page_content=doc) for doc in batch]
+            indexed += len(self.index_chunks(chunks))
+        logger.info(f"Indexed {indexed} documents.")
+        return {"indexed": indexed}
+
+    def index_chunks(self, chunks: List[Document]) -> List[int]:
+        """
+        Embed a batch of chunks in one model call and append them to the dense and sparse indexes.
+
+        Args:
+            chunks (List[Document]): chunks with their metadata attached
+
+        Returns:
+            list: ids of the appended chunks
+        """
+        if not chunks:
+            return []
+        vectors = np.asarray(self.embeddings.embed_documents([c.page_content for c in chunks]), dtype="float32")
+        now = time.time()
+        for chunk in chunks:
+            chunk.metadata.setdefault("timestamp", now)
+
+        with self._lock:
+            ids = np.arange(self._next_id, self._next_id + len(chunks), dtype="int64")
+            self._next_id += len(chunks)
+            self.index.add_with_ids(vectors, ids)
+            for doc_id, chunk in zip(ids.tolist(), chunks):
+                self.docs[doc_id] = chunk
+                self.sparse.add(doc_id, chunk.page_content)
+                for field in FILTER_FIELDS:
+                    for value in _filter_values(chunk.metadata, field):
+                        self.postings[field][value].add(doc_id)
+                insort(self.timeline, (float(chunk.metadata["timestamp"]), doc_id))
+            self.mutations += 1
+
+        logger.info(f"Appended {len(ids)} chunks to the index.")
+        return ids.tolist()
+
+    def delete(self, ids: Iterable[int]) -> int:
+        """
+        Delete documents by id.
+
+        Text, postings and BM25 entries go immediately; the vectors are tombstoned and
+        removed from FAISS, and the timeline entries pruned, in batches by `run_maintenance`.
+
+        Returns:
+            int: number of documents deleted
+        """
+        with self._lock:
+            doomed = {doc_id for doc_id in ids if doc_id in self.docs}
+            if not doomed:
+                return 0
+            for doc_id in doomed:
+                doc = self.docs.pop(doc_id)
+                self.sparse.remove(doc_id, doc.page_content)
+                for field in FILTER_FIELDS:
+                    for value in _filter_values(doc.metadata, field):
+                        posting = self.postings[field].get(value)
+                        if posting is not None:
+                            posting.discard(doc_id)
+                            if not posting:
+                                del self.postings[field][value]
+            self.tombstones |= doomed
+            self.mutations += 1
+        logger.info(f"Deleted {len(doomed)} documents ({len(self.tombstones)} tombstones pending).")
+        return len(doomed)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Delete documents older than their source's retention window."""
+        now = now or time.time()
+        policies = Config.RETENTION_DAYS
+        if not policies:
+            return 0
+        oldest_cutoff = now - min(policies.values()) * 86400
+        with self._lock:
+            expired = []
+            for timestamp, doc_id in self.timeline[:bisect_right(self.timeline, (oldest_cutoff, float("inf")))]:
+                doc = self.docs.get(doc_id)
+                if doc is None:
+                    continue
+                days = policies.get(doc.metadata.get("source"))
+                if days is not None and timestamp < now - days * 86400:
+                    expired.append(doc_id)
+        return self.delete(expired)
+
+    def enforce_capacity(self) -> int:
+        """
+        Evict oldest documents first once the store is over its size cap.
+
+        Runs with maintenance rather than on every append, so the store can overshoot the cap
+        by one maintenance interval's worth of ingestion.
+        """
+        with self._lock:
+            overflow = len(self.docs) - Config.VECTOR_STORE_MAX_DOCS
+            if overflow <= 0:
+                return 0
+            live = (doc_id for _, doc_id in self.timeline if doc_id in self.docs)
+            oldest = list(islice(live, overflow))
+        logger.warning(f"Vector store over capacity, evicting {len(oldest)} oldest documents.")
+        return self.delete(oldest)
+
+    def count(self, **filters) -> int:
+        """Number of live documents matching the same filters `retrieve` accepts."""
+        with self._lock:
+            ids = self._candidate_ids(**filters)
+            return len(self.docs) if ids is None else len(ids)
+
+    def prune_timeline(self) -> int:
+        """Drop the timeline entries of deleted documents."""
+        with self._lock:
+            before = len(self.timeline)
+            self.timeline = [entry for entry in self.timeline if entry[1] in self.docs]
+            pruned = before - len(self.timeline)
+            if pruned:
+                self.mutations += 1
+            return pruned
+
+    def fragmentation(self) -> float:
+        """Share of vectors in FAISS that belong to deleted documents."""
+        return len(self.tombstones) / self.index.ntotal if self.index.ntotal else 0.0
+
+    def compact(self):
+        """Apply pending deletes to FAISS, rebuilding the index when fragmentation is high."""
+        with self._lock:
+            if not self.tombstones:
+                return {"removed": 0, "rebuilt": False}
+            removed = len(self.tombstones)
+            rebuild = self.fragmentation() >= Config.COMPACTION_THRESHOLD
+            if rebuild:
+                # Copy live vectors into a fresh index so the old buffer's capacity is released
+                ids = faiss.vector_to_array(self.index.id_map)
+                vectors = faiss.downcast_index(self.index.index).reconstruct_n(0, self.index.ntotal)
+                live = ~np.isin(ids, np.fromiter(self.tombstones, dtype="int64", count=removed))
+                index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.index.d))
+                index.add_with_ids(vectors[live], ids[live])
+                self.index = index
+            else:
+                doomed = np.fromiter(self.tombstones, dtype="int64", count=removed)
+                self.index.remove_ids(faiss.IDSelectorBatch(len(doomed), faiss.swig_ptr(doomed)))
+            self.tombstones.clear()
+            self.mutations += 1
+        logger.info(f"Compacted vector index: removed {removed} vectors (rebuilt={rebuild}).")
+        return {"removed": removed, "rebuilt": rebuild}
+
+    def run_maintenance(self) -> Dict:
+        """Expire by retention policy, enforce the size cap, prune the timeline, then compact if deletes have piled up."""
+        expired = self.expire()
+        evicted = self.enforce_capacity()
+        self.prune_timeline()
+        compaction = {"removed": 0, "rebuilt": False}
+        if (
+            len(self.tombstones) >= Config.DELETE_BATCH_SIZE
+            or self.fragmentation() >= Config.COMPACTION_THRESHOLD
+        ):
+            compaction = self.compact()
+        # Only the steps that changed the index counted as mutations; an idle pass publishes nothing
+        with self._lock:
+            self.last_maintenance = {"expired": expired, "evicted": evicted, **compaction, "finished_at": time.time()}
+        return self.last_maintenance
+
+    async def _maintenance_loop(self):
+        while True:
+            await asyncio.sleep(Config.INDEX_MAINTENANCE_INTERVAL_SECONDS)
+            try:
+                await asyncio.to_thread(self.run_maintenance)
+            except Exception as e:
+                logger.error(f"Vector index maintenance failed: {e}")
+
+    def start_maintenance(self):
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+    async def stop_maintenance(self):
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except asyncio.CancelledError:
+                pass
+            self._maintenance_task = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            vector_bytes = self.index.ntotal * self.index.d * 4
+            text_bytes = sum(len(doc.page_content) for doc in self.docs.values())
+            return {
+                "documents": len(self.docs),
+                "vectors": self.index.ntotal,
+                "tombstones": len(self.tombstones),
+                "fragmentation": round(self.fragmentation(), 4),
+                "capacity": Config.VECTOR_STORE_MAX_DOCS,
+                "estimated_bytes": vector_bytes + text_bytes,
+                "sources": {source: len(ids) for source, ids in self.postings["source"].items()},
+                "oldest": next((t for t, doc_id in self.timeline if doc_id in self.docs), None),
+                "newest": next((t for t, doc_id in reversed(self.timeline) if doc_id in self.docs), None),
+                "last_maintenance": self.last_maintenance,
+            }
+
+    def _candidate_ids(
+        self,
+        ticker: Optional[str] = None,
+        source: Optional[str] = None,
+        topic: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> Optional[Set[int]]:
+        """Intersect the id sets of every active filter; None means no filter is active."""
+        sets: List[Set[int]] = []
+        for field, value in (("ticker", ticker.upper() if ticker else None), ("source", source), ("topic", topic)):
+            if value is not None:
+                sets.append(self.postings[field].get(value, set()))
+        if start is not None or end is not None:
+            lo = bisect_left(self.timeline, (start,)) if start is not None else 0
+            hi = bisect_right(self.timeline, (end, float("inf"))) if end is not None else len(self.timeline)
+            sets.append({doc_id for _, doc_id in self.timeline[lo:hi] if doc_id in self.docs})
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return set(sets[0]).intersection(*sets[1:])
+
+    def _dense_search(self, query_vector: np.ndarray, k: int, candidates: Optional[Set[int]]) -> List[tuple]:
+        if candidates is not None and len(candidates) <= SUBSET_SCAN_MAX:
+            ids = np.fromiter(candidates, dtype="int64", count=len(candidates))
+            vectors = np.vstack([self.index.reconstruct(int(i)) for i in ids])
+            distances = ((vectors - query_vector) ** 2).sum(axis=1)
+            top = np.argsort(distances)[:k]
+            return [(int(ids[i]), float(distances[i])) for i in top]
+
+        params = None
+        if candidates is not None:
+            subset = np.fromiter(candidates, dtype="int64", count=len(candidates))
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(len(subset), faiss.swig_ptr(subset)))
+        elif self.tombstones:
+            doomed = np.fromiter(self.tombstones, dtype="int64", count=len(self.tombstones))
+            selector = faiss.IDSelectorNot(faiss.IDSelectorBatch(len(doomed), faiss.swig_ptr(doomed)))
+            params = faiss.SearchParameters(sel=selector)
+        distances, ids = self.index.search(query_vector, k, params=params)
+        return [(int(i), float(d)) for i, d in zip(ids[0], distances[0]) if i != -1]
+
+    def retrieve(
+        self,
+        query: str,
+        k: int = 3,
+        ticker: Optional[str] = None,
+        source: Optional[str] = None,
+        topic: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        mode: str = "hybrid",
+    ):
+        """
+        Hybrid retrieval: BM25 and dense search over the same pre-filtered id set, merged with RRF.
+
+        Args:
+            query (str): free-text query
+            k (int): number of results
+            ticker, source, topic: metadata filters applied before scoring
+            start, end (float): epoch-second bounds on the chunk timestamp
+            mode (str): "hybrid", "dense" or "sparse"
+
+        Returns:
+            dict: results with content, metadata and scores
+        """
+        logger.info(f"Retrieving top {k} results for query: {query}")
+        # Embed outside the lock so ingestion is not blocked behind the model call
+        query_vector = np.asarray([self.embeddings.embed_query(query)], dtype="float32") if mode != "sparse" else None
+        with self._lock:
+            candidates = self._candidate_ids(ticker, source, topic, start, end)
+            if (candidates is not None and not candidates) or not self.docs:
+                return {"results": []}
+
+            fetch_k = max(k * 4, 20)
+            dense = self._dense_search(query_vector, fetch_k, candidates) if mode != "sparse" else []
+            sparse = self.sparse.search(query, fetch_k, candidates) if mode != "dense" else []
+
+            dense_scores = dict(dense)
+            sparse_scores = dict(sparse)
+            fused = reciprocal_rank_fusion([[i for i, _ in dense], [i for i, _ in sparse]], k=RRF_K)[:k]
+            results = [
+                {
+                    "id": doc_id,
+                    "content": self.docs[doc_id].page_content,
+                    "metadata": self.docs[doc_id].metadata,
+                    "score": round(score, 6),
+                    "dense_distance": dense_scores.get(doc_id),
+                    "sparse_score": sparse_scores.get(doc_id),
+                }
+                for doc_id, score in fused
+                if doc_id in self.docs
+            ]
+
+        logger.info(f"Retrieved {len(results)} results (candidates={'all' if candidates is None else len(candidates)}).")
+        return {"results": results}
+
+
+@lru_cache
+def get_vector_store() -> VectorStoreService:
+    if Config.MULTI_WORKER and Config.ROLE != "index-writer":
+        # Imported here: the writer module builds on VectorStoreService
+        from app.backend.services.index_writer import SharedVectorStore
+        return SharedVectorStore()
+    return VectorStoreService()
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value else None
+
+
+@router.post("/index")
+def index_documents(request: IndexRequest):
+    metadata = request.metadata or {}
+    chunks = [Document(page_content=doc, metadata=dict(metadata)) for doc in request.docs]
+    return {"indexed": len(get_vector_store().index_chunks(chunks))}
+
+
+@router.post("/search")
+def search(request: RetrievalRequest):
+    return get_vector_store().retrieve(
+        request.query,
+        k=request.k,
+        ticker=request.ticker,
+        source=request.source,
+        topic=request.topic,
+        start=_timestamp(request.start_date),
+        end=_timestamp(request.end_date),
+        mode=request.mode,
+    )
+
+
+@router.post("/delete")
+def delete_documents(request: DeleteRequest):
+    return {"deleted": get_vector_store().delete(request.ids)}
+
+
+@router.post("/compact")
+def compact_index():
+    return get_vector_store().run_maintenance()
+
+
+@router.get("/stats")
+def index_stats():
+    return get_vector_store().stats()
+
+
+@router.get("/")
+def root():
+    return {"status": "Retriever Agent running"}
@@ -1,29 +1,335 @@
-# Scraping Agent
-# Handles crawling of filings and documents
-
-from fastapi import APIRouter, Query
-from bs4 import BeautifulSoup
-import requests
-
-router = APIRouter(prefix="/scraping", tags=["Scraping Agent"])
-
-@router.get("/filing")
-def get_filing(
-    ticker: str = Query(..., description="Stock ticker symbol, e.g. TSM"),
-    doc_type: str = Query("10-K", description="Filing type, e.g. 10-K, 20-F, 6-K")
-):
-    # Simple EDGAR search for US stocks, fallback to Yahoo for others
-    base_url = f"https://www.sec.gov/cgi-bin/browse-edgar?action=getcompany&CIK={ticker}&type={doc_type}&dateb=&owner=exclude&count=1"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    resp = requests.get(base_url, headers=headers)
-    if resp.status_code == 200:
-        soup = BeautifulSoup(resp.text, "html.parser")
-        doc_link = soup.find('a', {'id': 'documentsbutton'})
-        if doc_link:
-            return {"filing_url": f"https://www.sec.gov{doc_link['href']}"}
-        return {"message": "No filing found"}
-    return {"error": "Failed to fetch filing"}
-
-@router.get("/")
-def root():
-    return {"status": "Scraping Agent running"}
+# Scraping Agent
+# Async EDGAR crawler: ticker -> CIK -> filing index -> primary document, cached on disk and fed to the vector store
+
+from datetime import datetime, timezone
+from functools import lru_cache
+from hashlib import sha1
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query
+from utils.config import Config
+from app.backend.api.schema import BackfillRequest, Filing
+from app.backend.services.providers import ProviderPool
+from app.backend.services.filing_parser import iter_blocks, iter_text_blocks, parse_filing
+from app.backend.services.retrieval import VectorStoreService, get_vector_store
+from app.backend.utils.shared_state import shared_path
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+import uuid
+
+router = APIRouter(prefix="/scraping", tags=["Scraping Agent"])
+logger = logging.getLogger("finbreaker")
+
+SEC_TICKERS_URL = "https://www.sec.gov/files/company_tickers.json"
+SEC_SUBMISSIONS_URL = "https://data.sec.gov/submissions/CIK{cik:010d}.json"
+SEC_ARCHIVES_URL = "https://www.sec.gov/Archives/edgar/data/{cik}/{folder}"
+
+
+class RateLimiter:
+    """
+    Spaces requests at least 1/rate seconds apart across every task sharing it.
+
+    With `path`, the next free slot lives in that file under an flock, so every worker
+    process sharing it stays within one rate together.
+    """
+
+    def __init__(self, rate: float, path: Optional[Path] = None):
+        self.interval = 1.0 / rate
+        self.path = path
+        self._next = 0.0
+
+    def _reserve(self) -> float:
+        """Claim the next slot in the shared file; returns how long to wait for it."""
+        fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                booked = float(os.read(fd, 64) or 0)
+            except ValueError:
+                booked = 0.0
+            now = time.time()
+            slot = max(now, booked)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, repr(slot + self.interval).encode())
+            return slot - now
+        finally:
+            os.close(fd)  # releases the flock
+
+    async def wait(self):
+        if self.path is not None:
+            delay = await asyncio.to_thread(self._reserve)
+        else:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+            delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class HttpCache:
+    """Response bodies on disk with the validators (ETag, Last-Modified) needed to revalidate them."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        key = sha1(url.encode()).hexdigest()
+        base = self.root / "http" / key[:2] / key
+        return base.with_suffix(".body"), base.with_suffix(".json")
+
+    def get(self, url: str) -> Optional[Tuple[Dict, Path]]:
+        """Validators and body path of a cached response."""
+        body_path, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        return (meta, body_path) if body_path.exists() else None
+
+    async def put(self, url: str, chunks: AsyncIterator[bytes], headers) -> int:
+        """Stream a response body to disk; multi-megabyte filings are never held in memory whole."""
+        body_path, meta_path = self._paths(url)
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        size = 0
+        # Unique per writer: the same URL can be fetched by two tasks or workers at once
+        suffix = f".{os.getpid()}.{uuid.uuid4().hex[:8]}"
+        tmp_path = body_path.with_suffix(f"{suffix}.part")
+        with open(tmp_path, "wb") as f:
+            async for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        tmp_path.replace(body_path)
+        # Metadata last: a reader only trusts a body whose metadata exists
+        meta = {
+            "url": url,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "fetched_at": time.time(),
+        }
+        tmp_path = meta_path.with_suffix(f"{suffix}.tmp")
+        tmp_path.write_text(json.dumps(meta))
+        tmp_path.replace(meta_path)
+        return size
+
+
+def recent_filings(ticker: str, cik: int, submissions: Dict, forms: List[str], limit: int) -> List[Filing]:
+    """Most recent filings of the given forms from a submissions document, newest first."""
+    # Columnar: one array per field, index i across all arrays is one filing
+    recent = submissions.get("filings", {}).get("recent", {})
+    wanted = {form.upper() for form in forms}
+
+    def column(name: str, i: int) -> Optional[str]:
+        values = recent.get(name) or []
+        return values[i] or None if i < len(values) else None
+
+    filings = []
+    for i, form in enumerate(recent.get("form", [])):
+        document = column("primaryDocument", i)
+        if form.upper() not in wanted or not document:
+            continue
+        accession = recent["accessionNumber"][i]
+        folder = SEC_ARCHIVES_URL.format(cik=cik, folder=accession.replace("-", ""))
+        filings.append(Filing(
+            ticker=ticker,
+            cik=cik,
+            form=form,
+            accession=accession,
+            filing_date=recent["filingDate"][i],
+            report_date=column("reportDate", i),
+            description=column("primaryDocDescription", i),
+            index_url=f"{folder}/{accession}-index.htm",
+            document_url=f"{folder}/{document}",
+        ))
+        if len(filings) >= limit:
+            break
+    return filings
+
+
+def filing_metadata(filing: Filing) -> Dict:
+    """Metadata attached to every chunk of a filing."""
+    return {
+        "source": "filing",
+        "ticker": filing.ticker,
+        "form": filing.form,
+        "accession": filing.accession,
+        "url": filing.document_url,
+        "title": f"{filing.ticker} {filing.form} filed {filing.filing_date}",
+        "timestamp": datetime.strptime(filing.filing_date, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp(),
+    }
+
+
+def document_text(path: Path, plain_text: bool = False) -> str:
+    with open(path, "rb") as f:
+        blocks = iter_text_blocks(f) if plain_text else iter_blocks(f)
+        return "\n".join(text for _, text in blocks)
+
+
+class EdgarCrawler:
+    """
+    Fetches filings from EDGAR within SEC's fair-access limits.
+
+    Every request goes through one rate limiter, shared by all workers when running several,
+    and the `edgar` pool. Archive documents are
+    immutable once filed, so a cached copy is served without touching the network. Mutable
+    resources (the submissions feed, the ticker list) are revalidated with conditional GETs,
+    and a 304 reuses the cached body.
+    """
+
+    def __init__(self, vector_store: VectorStoreService, cache_dir: str = Config.SEC_CACHE_DIR):
+        self.vector_store = vector_store
+        self.cache = HttpCache(cache_dir)
+        # SEC's fair-access limit is per IP, not per worker
+        shared = shared_path("locks", "edgar-rate") if Config.MULTI_WORKER else None
+        self.limiter = RateLimiter(Config.SEC_MAX_REQUESTS_PER_SECOND, shared)
+        self.pool = ProviderPool("edgar", Config.SEC_MAX_CONCURRENCY, timeout=30.0)
+        self.headers = {"User-Agent": Config.SEC_USER_AGENT, "Accept-Encoding": "gzip, deflate"}
+        self.ciks: Optional[Dict[str, int]] = None
+        self.indexed_path = Path(cache_dir) / "indexed.json"
+        self.indexed = set(json.loads(self.indexed_path.read_text())) if self.indexed_path.exists() else set()
+        self.indexing = set()  # accessions being indexed right now
+        self.stats = {"requests": 0, "cache_hits": 0, "not_modified": 0, "downloaded_bytes": 0}
+
+    async def fetch(self, url: str, immutable: bool = False) -> bytes:
+        return (await self.fetch_path(url, immutable)).read_bytes()
+
+    async def fetch_path(self, url: str, immutable: bool = False) -> Path:
+        """Make sure `url` is in the on-disk cache and return the path of its body."""
+        cached = self.cache.get(url)
+        if cached and immutable:
+            self.stats["cache_hits"] += 1
+            return cached[1]
+
+        headers = dict(self.headers)
+        if cached:
+            meta = cached[0]
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        await self.limiter.wait()
+        async with self.pool.slot():
+            async with self.pool.client().stream("GET", url, headers=headers) as response:
+                self.stats["requests"] += 1
+                if response.status_code == 304 and cached:
+                    self.stats["not_modified"] += 1
+                    return cached[1]
+                response.raise_for_status()
+                self.stats["downloaded_bytes"] += await self.cache.put(url, response.aiter_bytes(), response.headers)
+        return self.cache.get(url)[1]
+
+    async def resolve_cik(self, ticker: str) -> Optional[int]:
+        """Ticker -> CIK from the local SEC ticker file, fetched (and revalidated) once per process if missing."""
+        if self.ciks is None:
+            path = Path(Config.SYMBOLS_FILE)
+            raw = path.read_bytes() if path.exists() else await self.fetch(SEC_TICKERS_URL)
+            self.ciks = {row["ticker"].upper(): int(row["cik_str"]) for row in json.loads(raw).values()}
+        return self.ciks.get(ticker.upper().replace(".", "-"))
+
+    async def list_filings(self, ticker: str, forms: Optional[List[str]] = None, limit: int = 1) -> List[Filing]:
+        cik = await self.resolve_cik(ticker)
+        if cik is None:
+            logger.warning(f"No CIK for {ticker}")
+            return []
+        submissions = json.loads(await self.fetch(SEC_SUBMISSIONS_URL.format(cik=cik)))
+        return recent_filings(ticker.upper(), cik, submissions, forms or Config.FILING_FORMS, limit)
+
+    async def fetch_document(self, filing: Filing) -> str:
+        path = await self.fetch_path(filing.document_url, immutable=True)
+        return await asyncio.to_thread(document_text, path, filing.document_url.endswith(".txt"))
+
+    def _index_path(self, filing: Filing, path: Path) -> int:
+        with open(path, "rb") as f:
+            chunks = parse_filing(
+                f,
+                filing_metadata(filing),
+                Config.FILING_CHUNK_SIZE,
+                Config.FILING_CHUNK_OVERLAP,
+                plain_text=filing.document_url.endswith(".txt"),
+            )
+            return self.vector_store.index_documents(chunks)["indexed"]
+
+    async def index_filing(self, filing: Filing) -> int:
+        """Stream a filing from the cache through the section parser into the vector store, once."""
+        if filing.accession in self.indexed or filing.accession in self.indexing:
+            return 0
+        # Claimed before the first await, so a ticker listed twice in one backfill indexes it once
+        self.indexing.add(filing.accession)
+        try:
+            path = await self.fetch_path(filing.document_url, immutable=True)
+            added = await asyncio.to_thread(self._index_path, filing, path)
+        finally:
+            self.indexing.discard(filing.accession)
+        self.indexed.add(filing.accession)
+        self.indexed_path.parent.mkdir(parents=True, exist_ok=True)
+        self.indexed_path.write_text(json.dumps(sorted(self.indexed)))
+        logger.info(f"Indexed {added} chunks from {filing.ticker} {filing.form} {filing.accession}")
+        return added
+
+    async def backfill(self, tickers: List[str], forms: Optional[List[str]] = None, limit: int = 4) -> Dict:
+        """
+        Fetch and index the last `limit` filings of `forms` for every ticker.
+
+        Returns:
+            dict: per-ticker filing and chunk counts, plus crawler request stats
+        """
+        async def one(ticker: str) -> Dict:
+            try:
+                filings = await self.list_filings(ticker, forms, limit)
+                chunks = 0
+                for filing in filings:
+                    chunks += await self.index_filing(filing)
+                return {"filings": len(filings), "chunks": chunks}
+            except Exception as e:
+                logger.error(f"Filing backfill failed for {ticker}: {e}")
+                return {"error": str(e)}
+
+        tickers = list(dict.fromkeys(tickers))
+        results = await asyncio.gather(*(one(ticker) for ticker in tickers))
+        return {"tickers": dict(zip(tickers, results)), "crawler": dict(self.stats)}
+
+
+@lru_cache
+def get_edgar_crawler() -> EdgarCrawler:
+    return EdgarCrawler(get_vector_store())
+
+
+@router.get("/filing", response_model=Filing, response_model_exclude_none=True)
+async def get_filing(
+    ticker: str = Query(..., description="Stock ticker symbol, e.g. TSM"),
+    doc_type: str = Query("10-K", description="Filing type, e.g. 10-K, 20-F, 6-K"),
+    index: bool = Query(False, description="Also add the filing to the vector store"),
+):
+    """Latest filing of a type with its primary document as text."""
+    crawler = get_edgar_crawler()
+    filings = await crawler.list_filings(ticker, [doc_type], limit=1)
+    if not filings:
+        raise HTTPException(status_code=404, detail="No filing found")
+    filing = filings[0]
+    filing.text = await crawler.fetch_document(filing)
+    if index:
+        await crawler.index_filing(filing)
+    return filing
+
+
+@router.post("/backfill")
+async def backfill_filings(request: BackfillRequest):
+    """Fetch and index the most recent filings for a list of tickers."""
+    return await get_edgar_crawler().backfill(request.tickers, request.forms, request.limit)
+
+
+@router.get("/stats")
+def crawler_stats():
+    crawler = get_edgar_crawler()
+    return {**crawler.stats, "indexed_filings": len(crawler.indexed), **crawler.pool.stats()}
+
+
+@router.get("/")
+def root():
+    return {"status": "Scraping Agent running"}
@@ -1,9 +1,155 @@
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-class Config:
-    GOOGLE_API_KEY = os.getenv("GEMINI_API_KEY")
-    ALPHAVANTAGE_API_KEY = os.getenv("ALPHAVANTAGE_API_KEY")
-    FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
\ No newline at end of file
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_days(name: str, default: str) -> dict:
+    """Parse "source:days,source:days" into {source: days}."""
+    return _env_map(name, default, float)
+
+
+def _env_map(name: str, default: str, cast=str) -> dict:
+    """Parse "key:value,key:value" into {key: cast(value)}."""
+    pairs = (item.split(":", 1) for item in _env_list(name, default))
+    return {key.strip(): cast(value.strip()) for key, value in pairs}
+
+
+def _env_watchlists(name: str, default: str) -> dict:
+    """Parse "name:T1|T2;name:T3" into {name: [T1, T2], name: [T3]}."""
+    watchlists = {}
+    for item in os.getenv(name, default).split(";"):
+        if ":" in item:
+            watchlist, tickers = item.split(":", 1)
+            watchlists[watchlist.strip()] = [t.strip().upper() for t in tickers.split("|") if t.strip()]
+    return watchlists
+
+
+def _env_list(name: str, default: str = "") -> list:
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+
+class Config:
+    GOOGLE_API_KEY = os.getenv("GEMINI_API_KEY")
+    ALPHAVANTAGE_API_KEY = os.getenv("ALPHAVANTAGE_API_KEY")
+    FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
+
+    # News ingestion
+    # Off by default: every topic and ticker is one NEWS_SENTIMENT call per poll
+    NEWS_INGEST_ENABLED = os.getenv("NEWS_INGEST_ENABLED", "false").lower() == "true"
+    # AlphaVantage's free tier allows 25 calls a day; polls stop for the day once this is spent
+    NEWS_INGEST_MAX_CALLS_PER_DAY = int(os.getenv("NEWS_INGEST_MAX_CALLS_PER_DAY", "25"))
+    NEWS_INGEST_TOPICS = _env_list("NEWS_INGEST_TOPICS", "earnings,financial_markets,technology")
+    WATCHLIST_TICKERS = _env_list("WATCHLIST_TICKERS", "TSM,NVDA,AAPL,MSFT,GOOGL")
+    NEWS_INGEST_INTERVAL_SECONDS = int(os.getenv("NEWS_INGEST_INTERVAL_SECONDS", "900"))
+    NEWS_INGEST_BATCH_SIZE = int(os.getenv("NEWS_INGEST_BATCH_SIZE", "32"))
+    NEWS_CHUNK_SIZE = int(os.getenv("NEWS_CHUNK_SIZE", "800"))
+    NEWS_CHUNK_OVERLAP = int(os.getenv("NEWS_CHUNK_OVERLAP", "100"))
+    NEWS_SEEN_URLS_MAX = int(os.getenv("NEWS_SEEN_URLS_MAX", "50000"))
+
+    # Vector index retention and compaction
+    RETENTION_DAYS = _env_days("RETENTION_DAYS", "news:30,filing:730")
+    VECTOR_STORE_MAX_DOCS = int(os.getenv("VECTOR_STORE_MAX_DOCS", "200000"))
+    DELETE_BATCH_SIZE = int(os.getenv("DELETE_BATCH_SIZE", "1000"))
+    COMPACTION_THRESHOLD = float(os.getenv("COMPACTION_THRESHOLD", "0.2"))
+    INDEX_MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("INDEX_MAINTENANCE_INTERVAL_SECONDS", "600"))
+
+    # Morning brief pre-generation
+    BRIEF_PRECOMPUTE_ENABLED = os.getenv("BRIEF_PRECOMPUTE_ENABLED", "true").lower() == "true"
+    # Watchlist names are substituted into the questions, so name them the way users ask
+    BRIEF_WATCHLISTS = _env_watchlists("BRIEF_WATCHLISTS", "Asia tech stocks:TSM|BABA|SONY|UMC|ASX")
+    BRIEF_QUESTIONS = [q.strip() for q in os.getenv(
+        "BRIEF_QUESTIONS",
+        "What's our risk exposure in {watchlist} today, and highlight any earnings surprises?;"
+        "Summarize the overnight news for {watchlist}.",
+    ).split(";") if q.strip()]
+    BRIEF_PRECOMPUTE_TIME = os.getenv("BRIEF_PRECOMPUTE_TIME", "08:45")
+    BRIEF_TIMEZONE = os.getenv("BRIEF_TIMEZONE", "America/New_York")
+    BRIEF_REFRESH_INTERVAL_SECONDS = int(os.getenv("BRIEF_REFRESH_INTERVAL_SECONDS", "300"))
+    BRIEF_PRICE_MOVE_PCT = float(os.getenv("BRIEF_PRICE_MOVE_PCT", "1.0"))
+    BRIEF_NEWS_THRESHOLD = int(os.getenv("BRIEF_NEWS_THRESHOLD", "3"))
+    BRIEF_CONCURRENCY = int(os.getenv("BRIEF_CONCURRENCY", "2"))
+    BRIEF_CACHE_DIR = os.getenv("BRIEF_CACHE_DIR", "data/briefs")
+
+    # SEC EDGAR crawler. SEC asks for a descriptive User-Agent with contact details and at most 10 requests/second.
+    # The rate is per host: with several workers they share one limiter through SHARED_STATE_DIR.
+    SEC_USER_AGENT = os.getenv("SEC_USER_AGENT", "fin-breaker admin@example.com")
+    SEC_MAX_REQUESTS_PER_SECOND = float(os.getenv("SEC_MAX_REQUESTS_PER_SECOND", "8"))
+    SEC_MAX_CONCURRENCY = int(os.getenv("SEC_MAX_CONCURRENCY", "4"))
+    SEC_CACHE_DIR = os.getenv("SEC_CACHE_DIR", "data/edgar")
+    FILING_FORMS = _env_list("FILING_FORMS", "10-K,10-Q,20-F,6-K,8-K")
+    FILING_CHUNK_SIZE = int(os.getenv("FILING_CHUNK_SIZE", "1500"))
+    FILING_CHUNK_OVERLAP = int(os.getenv("FILING_CHUNK_OVERLAP", "150"))
+
+    # Multi-worker mode: one index writer process, readers on mmap'd snapshots, SQLite WAL for shared state
+    MULTI_WORKER = int(os.getenv("WEB_CONCURRENCY", "1")) > 1 or os.getenv("MULTI_WORKER", "false").lower() == "true"
+    ROLE = os.getenv("FINBREAKER_ROLE", "worker")
+    SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR", "data/shared")
+    INDEX_WRITER_ADDRESS = os.getenv("INDEX_WRITER_ADDRESS", os.path.join(SHARED_STATE_DIR, "index-writer.sock"))
+    # The writer socket carries pickled calls; without an explicit key a random one is generated
+    # into SHARED_STATE_DIR (mode 0600) and read by every process sharing that directory
+    INDEX_WRITER_AUTHKEY = os.getenv("INDEX_WRITER_AUTHKEY")
+    EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "768"))
+    SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "30"))
+    SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "1"))
+    TOOL_CACHE_TTL_SECONDS = int(os.getenv("TOOL_CACHE_TTL_SECONDS", "60"))
+
+    # Per-provider concurrency caps for market data
+    ALPHAVANTAGE_MAX_CONCURRENCY = int(os.getenv("ALPHAVANTAGE_MAX_CONCURRENCY", "8"))
+    FINNHUB_MAX_CONCURRENCY = int(os.getenv("FINNHUB_MAX_CONCURRENCY", "8"))
+    YFINANCE_THREADS = int(os.getenv("YFINANCE_THREADS", "8"))
+    YFINANCE_MAX_CONCURRENCY = int(os.getenv("YFINANCE_MAX_CONCURRENCY", "8"))
+
+    # Provider health, circuit breakers and hedging
+    PROVIDER_WINDOW = int(os.getenv("PROVIDER_WINDOW", "100"))
+    PROVIDER_MIN_SAMPLES = int(os.getenv("PROVIDER_MIN_SAMPLES", "20"))
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+    BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "30"))
+    HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "true").lower() == "true"
+    HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("HEDGE_DEFAULT_DELAY_SECONDS", "1.5"))
+
+    # Live quote streaming: one poller per subscribed symbol, shared by all WebSocket clients
+    QUOTE_POLL_INTERVAL_SECONDS = float(os.getenv("QUOTE_POLL_INTERVAL_SECONDS", "2"))
+    QUOTE_STREAM_MAX_TICKERS = int(os.getenv("QUOTE_STREAM_MAX_TICKERS", "50"))
+
+    # On-demand sampling profiler (admin routes and the X-Profile header); both are refused while ADMIN_TOKEN is unset
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+    PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+    PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "300"))
+    PROFILER_KEEP = int(os.getenv("PROFILER_KEEP", "20"))
+
+    # Response compression (brotli when the client accepts it, gzip otherwise)
+    COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+    BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+    # Deterministic intent router in front of the LLM planner
+    INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+    INTENT_ROUTER_MIN_SCORE = float(os.getenv("INTENT_ROUTER_MIN_SCORE", "0.6"))
+    INTENT_ROUTER_MIN_MARGIN = float(os.getenv("INTENT_ROUTER_MIN_MARGIN", "0.05"))
+    INTENT_ROUTER_MAX_TICKERS = int(os.getenv("INTENT_ROUTER_MAX_TICKERS", "8"))
+    # SEC company_tickers.json layout; watchlist tickers are always known even without it
+    SYMBOLS_FILE = os.getenv("SYMBOLS_FILE", "data/company_tickers.json")
+
+    # Agent graph execution: draft the answer while the evaluator runs, skip it on clean tool output
+    SPECULATIVE_SYNTHESIS = os.getenv("SPECULATIVE_SYNTHESIS", "true").lower() == "true"
+    EVALUATOR_SKIP_ON_CLEAN_TOOLS = os.getenv("EVALUATOR_SKIP_ON_CLEAN_TOOLS", "true").lower() == "true"
+
+    # Latency-budgeted model selection. Tiers run from most capable to fastest; a stage starts
+    # at its configured model and steps down the ladder when the request's deadline is tight.
+    MODEL_TIERS = _env_list("MODEL_TIERS", "gemini-2.5-pro-latest,gemini-2.5-flash,gemini-2.0-flash-001")
+    STAGE_MODELS = _env_map(
+        "STAGE_MODELS", "planner:gemini-2.5-pro-latest,evaluator:gemini-2.5-pro-latest,synthesis:gemini-2.0-flash-001"
+    )
+    # Seconds per call before any latency has been observed
+    MODEL_LATENCY_PRIORS = _env_map("MODEL_LATENCY_PRIORS", "gemini-2.5-pro-latest:8,gemini-2.5-flash:3,gemini-2.0-flash-001:1.5", float)
+    STAGE_THINKING_TOKENS = _env_map("STAGE_THINKING_TOKENS", "planner:1024,evaluator:256,synthesis:0", int)
+    STAGE_MAX_OUTPUT_TOKENS = _env_map("STAGE_MAX_OUTPUT_TOKENS", "planner:1024,evaluator:32,synthesis:1024", int)
+    REQUEST_LATENCY_BUDGET_SECONDS = float(os.getenv("REQUEST_LATENCY_BUDGET_SECONDS", "30"))
+    REQUEST_TOKEN_BUDGET = int(os.getenv("REQUEST_TOKEN_BUDGET", "32000"))
+
+    # Admission control for LLM calls: interactive requests queue ahead of batch (brief precompute)
+    LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+    LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+    LLM_INTERACTIVE_MAX_WAIT_SECONDS = float(os.getenv("LLM_INTERACTIVE_MAX_WAIT_SECONDS", "10"))
+    LLM_BATCH_MAX_WAIT_SECONDS = float(os.getenv("LLM_BATCH_MAX_WAIT_SECONDS", "300"))
@@ -1,36 +1,36 @@
-import logging
-from logging.config import dictConfig
-
-logging_config = {
-    "version": 1,
-    "disable_existing_loggers": False,
-    "formatters": {
-        "default": {
-            "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-            "datefmt": "%Y-%m-%d %H:%M:%S",
-        },
-    },
-    "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "formatter": "default",
-            "stream": "ext://sys.stdout",
-        },
-        "file": {
-            "class": "logging.handlers.RotatingFileHandler",
-            "formatter": "default",
-            "filename": "app.log",
-            "maxBytes": 1024 * 1024,  # 1MB
-            "backupCount": 5,
-        },
-    },
-    "loggers": {
-        "uvicorn": {
-            "handlers": ["console", "file"],
-            "level": "DEBUG",
-        },
-    },
-}
-
-def setup_logging():
+import logging
+from logging.config import dictConfig
+
+logging_config = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "default": {
+            "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+            "datefmt": "%Y-%m-%d %H:%M:%S",
+        },
+    },
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+            "formatter": "default",
+            "stream": "ext://sys.stdout",
+        },
+        "file": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "formatter": "default",
+            "filename": "app.log",
+            "maxBytes": 1024 * 1024,  # 1MB
+            "backupCount": 5,
+        },
+    },
+    "loggers": {
+        "uvicorn": {
+            "handlers": ["console", "file"],
+            "level": "DEBUG",
+        },
+    },
+}
+
+def setup_logging():
     dictConfig(logging_config)
\ No newline at end of file
@@ -0,0 +1,33 @@
+# Serialization
+# orjson encoding shared by API responses and agent tool results
+
+from typing import Any
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+import orjson
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(exclude_none=True)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()  # pandas Timestamps and dates that orjson does not know natively
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=OPTIONS)
+
+
+def compact_json(obj: Any) -> str:
+    """Compact JSON for tool results going into the agent's context, instead of Python reprs."""
+    return dumps(obj).decode()
+
+
+class CompactJSONResponse(JSONResponse):
+    """Default response class: orjson, no whitespace, None fields of models dropped."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
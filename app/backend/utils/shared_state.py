@@ -0,0 +1,174 @@
+import asyncio
+import fcntl
+import functools
+import inspect
+import json
+import logging
+import os
+import pickle
+import secrets
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+from utils.config import Config
+
+logger = logging.getLogger("finbreaker")
+
+_leader_locks = {}
+
+
+def shared_path(*parts: str) -> Path:
+    path = Path(Config.SHARED_STATE_DIR, *parts)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def secret_key(name: str) -> bytes:
+    """
+    A random key shared by every process using SHARED_STATE_DIR, created on first use.
+
+    The file is only readable by its owner; a key file others can read is refused.
+    """
+    path = shared_path("keys", f"{name}.key")
+    if not path.exists():
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(secrets.token_hex(32).encode())
+        try:
+            # Link rather than rename: if another process created the key first, keep theirs
+            os.link(tmp, path)
+        except FileExistsError:
+            pass
+        finally:
+            tmp.unlink()
+    if path.stat().st_mode & 0o077:
+        raise PermissionError(f"{path} must only be accessible by its owner (chmod 600)")
+    return path.read_bytes()
+
+
+def connect_wal(path: Path, **kwargs) -> sqlite3.Connection:
+    """Open a SQLite database in WAL mode so many worker processes can read while one writes."""
+    conn = sqlite3.connect(path, timeout=5, **kwargs)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SharedCache:
+    """TTL key/value cache in a WAL-mode SQLite file shared by every uvicorn worker."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect_wal(self.path)
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._conn().execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return pickle.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, pickle.dumps(value), time.time() + ttl),
+            )
+
+    def delete(self, key: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge_expired(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+
+
+@functools.lru_cache
+def get_shared_cache() -> SharedCache:
+    return SharedCache(shared_path("cache.sqlite3"))
+
+
+def shared_cached(ttl: float, cache_if: Optional[Callable[[Any], bool]] = None) -> Callable:
+    """
+    Cache a function's result across workers, keyed by its name and arguments.
+
+    Results failing `cache_if` (errors, empty answers) are returned but not stored, so the next
+    call retries instead of serving them for the whole TTL. Coroutine functions do their SQLite
+    reads and writes in a thread, off the event loop.
+    """
+    def decorator(func):
+        def cache_key(args, kwargs):
+            return f"{func.__module__}.{func.__name__}:{json.dumps([args, kwargs], sort_keys=True, default=str)}"
+
+        def store(key, result):
+            if cache_if is None or cache_if(result):
+                get_shared_cache().set(key, result, ttl)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = cache_key(args, kwargs)
+                result = await asyncio.to_thread(get_shared_cache().get, key)
+                if result is None:
+                    result = await func(*args, **kwargs)
+                    await asyncio.to_thread(store, key, result)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = cache_key(args, kwargs)
+            result = get_shared_cache().get(key)
+            if result is None:
+                result = func(*args, **kwargs)
+                store(key, result)
+            return result
+        return wrapper
+    return decorator
+
+
+def leader_lock(name: str) -> bool:
+    """
+    Try to become the one process that runs a background job.
+
+    The lock is an flock held for the life of the process, so it is released automatically
+    if the worker dies and another worker can take over on its next start.
+    """
+    if name in _leader_locks:
+        return True
+    fd = os.open(shared_path("locks", f"{name}.lock"), os.O_CREAT | os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return False
+    _leader_locks[name] = fd
+    logger.info(f"Process {os.getpid()} is leader for {name}")
+    return True
+
+
+def get_checkpointer():
+    """LangGraph checkpointer: in-process by default, a shared SQLite file when running several workers."""
+    if not Config.MULTI_WORKER:
+        from langgraph.checkpoint.memory import MemorySaver
+        return MemorySaver()
+
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    path = shared_path("checkpoints.sqlite3")
+    connect_wal(path).close()  # journal_mode=WAL is persistent, set it once up front
+    # The connection thread is started lazily by the saver's first awaited call
+    return AsyncSqliteSaver(aiosqlite.connect(path))
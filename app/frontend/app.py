@@ -1,54 +1,130 @@
-import streamlit as st
-import requests
-import io
-
-st.set_page_config(page_title="FinBreaker", layout="centered")
-st.title("FinBreaker ☕💹")
-
-st.markdown("""
-Morning news breaker for finance!
-This assistant answers: **"What’s our risk exposure in Asia tech stocks today, and highlight any earnings surprises?"**
-
-- Upload a voice question or type your query below.
-- Get a spoken and text market brief.
-""")
-
-# Voice input
-st.header("🎤 Voice Input")
-audio_file = st.file_uploader("Upload a WAV audio file with your question", type=["wav"])
-
-if audio_file and st.button("Transcribe & Analyze (Voice)"):
-    st.info("Transcribing...")
-    audio_bytes = audio_file.read()
-    # Call orchestrator for full workflow
-    resp = requests.post(
-        "http://localhost:8000/orchestrator/morning_brief",
-        json={"audio": audio_bytes.decode('ISO-8859-1')}
-    )
-    result = resp.json()
-    transcript = result.get("transcript", "")
-    st.write(f"**Transcript:** {transcript}")
-    answer = result.get("answer", "No answer.")
-    st.success(answer)
-    audio_out = result.get("audio", None)
-    if audio_out:
-        st.audio(io.BytesIO(bytes(audio_out, encoding='ISO-8859-1')), format="audio/wav")
-
-# Text input
-st.header("⌨️ Text Input")
-user_query = st.text_area("Type your market question", "What’s our risk exposure in Asia tech stocks today, and highlight any earnings surprises?")
-if st.button("Analyze (Text)"):
-    st.info("Generating market brief...")
-    resp = requests.post(
-        "http://localhost:8000/orchestrator/morning_brief",
-        json={"question": user_query}
-    )
-    result = resp.json()
-    answer = result.get("answer", "No answer.")
-    st.success(answer)
-    audio_out = result.get("audio", None)
-    if audio_out:
-        st.audio(io.BytesIO(bytes(audio_out, encoding='ISO-8859-1')), format="audio/wav")
-
-st.markdown("---")
-st.caption("Open-source multi-agent finance assistant. Powered by FastAPI, LangChain, Deepgram, pyttsx3, and Streamlit.")
+import streamlit as st
+import httpx
+import io
+import json
+import os
+import time
+import uuid
+from typing import Optional
+
+API_URL = os.getenv("FINBREAKER_API_URL", "http://localhost:8000")
+# Identical submissions within a session are answered from cache for this long
+BRIEF_CACHE_TTL_SECONDS = int(os.getenv("BRIEF_CACHE_TTL_SECONDS", "600"))
+STAGE_LABELS = {
+    "router": "Matched the question to a tool plan",
+    "planner": "Planned tool calls",
+    "toolbox": "Fetched market data",
+    "evaluator": "Checked the context",
+    "synthesis": "Wrote the answer",
+}
+
+st.set_page_config(page_title="FinBreaker", layout="centered")
+st.title("FinBreaker ☕💹")
+
+st.markdown("""
+Morning news breaker for finance!
+This assistant answers: **"What’s our risk exposure in Asia tech stocks today, and highlight any earnings surprises?"**
+
+- Upload a voice question or type your query below.
+- Get a spoken and text market brief.
+""")
+
+
+def http_client() -> httpx.Client:
+    """One pooled client per browser session, so reruns reuse a kept-alive connection."""
+    if "http" not in st.session_state:
+        st.session_state.http = httpx.Client(base_url=API_URL, timeout=httpx.Timeout(120.0, connect=5.0))
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.http
+
+
+def describe(event: dict) -> str:
+    label = STAGE_LABELS.get(event["stage"], event["stage"])
+    if event.get("tools"):
+        label += f": {', '.join(event['tools'])}"
+    if event.get("verdict"):
+        label += f" ({event['verdict']})"
+    return label
+
+
+@st.cache_data(ttl=BRIEF_CACHE_TTL_SECONDS, max_entries=32, show_spinner=False)
+def run_brief(session_id: str, question: Optional[str], audio: Optional[bytes], _client: httpx.Client) -> dict:
+    """
+    Stream a brief from the backend and render it as it arrives: stage progress, then the answer
+    token by token, then the audio.
+
+    Cached per session and exact question or recording; a cache hit replays the rendered output
+    without calling the backend. Failed runs raise, so they are not cached.
+    """
+    payload = {"question": question} if question else {"audio": audio.decode("ISO-8859-1")}
+    started = time.perf_counter()
+    timings = {}
+    tokens = []
+    status = st.status("Generating market brief...", expanded=True)
+    transcript_box, answer_box, audio_box = st.empty(), st.empty(), st.empty()
+
+    with _client.stream("POST", "/orchestrator/morning_brief/stream", json=payload) as response:
+        if response.status_code == 429:
+            raise RuntimeError(f"The assistant is busy, retry in {response.headers.get('Retry-After', 'a few')} seconds.")
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            timings.setdefault("first_render_ms", round((time.perf_counter() - started) * 1000))
+            kind = event["event"]
+            if kind == "transcript" and not question:
+                transcript_box.markdown(f"**Transcript:** {event['text']}")
+            elif kind == "progress":
+                status.write(describe(event))
+            elif kind == "token":
+                timings.setdefault("first_token_ms", round((time.perf_counter() - started) * 1000))
+                tokens.append(event["text"])
+                answer_box.markdown("".join(tokens) + "▌")
+            elif kind == "answer":
+                timings.setdefault("first_token_ms", round((time.perf_counter() - started) * 1000))
+                answer_box.success(event["answer"] or "No answer.")
+                status.update(label="Precomputed brief" if event.get("precomputed") else "Brief ready", state="complete", expanded=False)
+            elif kind == "audio" and event.get("audio"):
+                audio_box.audio(io.BytesIO(event["audio"].encode("ISO-8859-1")), format="audio/wav")
+            elif kind == "error":
+                status.update(label="Failed", state="error")
+                raise RuntimeError(f"The assistant is busy, retry in {event.get('retry_after', 'a few')} seconds.")
+
+    timings["total_ms"] = round((time.perf_counter() - started) * 1000)
+    return {"timings": timings, "finished_at": time.time()}
+
+
+def show_brief(question: Optional[str] = None, audio: Optional[bytes] = None):
+    client = http_client()
+    submitted = time.time()
+    try:
+        result = run_brief(st.session_state.session_id, question, audio, client)
+    except (httpx.HTTPError, RuntimeError) as e:
+        st.error(f"Could not get a brief: {e}")
+        return
+    timings = result["timings"]
+    if result["finished_at"] < submitted:
+        st.caption(f"Served from this session's cache (first run: first render {timings['first_render_ms']} ms, total {timings['total_ms']} ms)")
+        return
+    first, token, total = st.columns(3)
+    first.metric("Time to first render", f"{timings['first_render_ms']} ms")
+    token.metric("First answer text", f"{timings.get('first_token_ms', timings['total_ms'])} ms")
+    total.metric("Complete brief", f"{timings['total_ms']} ms")
+
+
+# Voice input
+st.header("🎤 Voice Input")
+audio_file = st.file_uploader("Upload a WAV audio file with your question", type=["wav"])
+
+if audio_file and st.button("Transcribe & Analyze (Voice)"):
+    show_brief(audio=audio_file.getvalue())
+
+# Text input
+st.header("⌨️ Text Input")
+user_query = st.text_area("Type your market question", "What’s our risk exposure in Asia tech stocks today, and highlight any earnings surprises?")
+if st.button("Analyze (Text)"):
+    show_brief(question=user_query)
+
+st.markdown("---")
+st.caption("Open-source multi-agent finance assistant. Powered by FastAPI, LangChain, Deepgram, pyttsx3, and Streamlit.")
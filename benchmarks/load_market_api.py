@@ -0,0 +1,105 @@
+"""
+Load test: saturating one market data provider must not slow the others down.
+
+Runs the market API in-process over httpx's ASGI transport, with upstream calls replaced
+by fixed-latency fakes (yfinance blocks a thread, AlphaVantage awaits), then compares
+AlphaVantage-backed endpoint latency with and without a burst of slow yfinance calls.
+
+    python benchmarks/load_market_api.py --burst 200 --yf-latency 1.0
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT), str(ROOT / "app" / "backend")]
+
+import httpx
+from fastapi import FastAPI
+from app.backend.services.market_data import MarketDataService, get_market_data
+from app.backend.api.endpoints.market_api import router
+from app.backend.api.schema import Earnings, EarningsQuarter
+
+
+def build_app(yf_latency: float, av_latency: float) -> FastAPI:
+    service = MarketDataService()
+
+    def slow_earnings(ticker):
+        time.sleep(yf_latency)  # yfinance scrapes block the calling thread
+        return Earnings(ticker=ticker, quarters=[EarningsQuarter(period="2025-06-30", eps_estimate=2.4)])
+
+    async def fake_get_json(url, params=None):
+        async with service.pools["alphavantage"].slot():
+            await asyncio.sleep(av_latency)
+        return {"feed": [], "params": params}
+
+    service.router.providers["yfinance"]._earnings = slow_earnings
+    service.pools["alphavantage"].get_json = fake_get_json
+    # Keep each endpoint on a single provider so the measurement isolates the executors
+    service.router.preferences = {**service.router.preferences, "earnings": ["yfinance"], "company_news": ["alphavantage"]}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_market_data] = lambda: service
+    return app
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def probe(client: httpx.AsyncClient, requests: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/api/company_news", json={"ticker": f"T{i}"})
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies
+
+
+def report(label, latencies):
+    print(
+        f"{label:<28} n={len(latencies):<4} p50={statistics.median(latencies):7.1f}ms "
+        f"p95={percentile(latencies, 95):7.1f}ms max={max(latencies):7.1f}ms"
+    )
+
+
+async def main(args):
+    app = build_app(args.yf_latency, args.av_latency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        report("alphavantage (idle)", await probe(client, args.probes, args.probe_concurrency))
+
+        burst = [
+            asyncio.create_task(client.post("/api/earnings", json={"ticker": f"Y{i}"}))
+            for i in range(args.burst)
+        ]
+        await asyncio.sleep(0.05)  # let the burst fill the yfinance pool
+        stats = (await client.get("/api/providers")).json()["yfinance"]
+        print(f"yfinance pool during burst: in_flight={stats['in_flight']} waiting={stats['waiting']}")
+        report("alphavantage (yf saturated)", await probe(client, args.probes, args.probe_concurrency))
+
+        start = time.perf_counter()
+        await asyncio.gather(*burst)
+        print(f"yfinance burst of {args.burst} drained in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=200, help="concurrent slow yfinance requests")
+    parser.add_argument("--yf-latency", type=float, default=1.0, help="seconds each yfinance call blocks")
+    parser.add_argument("--av-latency", type=float, default=0.05, help="seconds each AlphaVantage call takes")
+    parser.add_argument("--probes", type=int, default=100)
+    parser.add_argument("--probe-concurrency", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,137 @@
+"""
+Load test: a market-open spike on /orchestrator/morning_brief against a rate-limited mock LLM.
+
+Runs the orchestrator router in-process over httpx's ASGI transport. Gemini is replaced by a
+mock whose latency grows once more than `--llm-capacity` calls are in flight (the way a
+provider slows down past its rate limit); speech, the precomputed-brief cache and the intent
+router are stubbed out so every request runs the planner and synthesis through admission control.
+Interactive users and a batch tenant are fired at the same time, and throughput, latency
+percentiles and 429s are reported per class.
+
+    python benchmarks/load_morning_brief.py --interactive 200 --batch 100 --max-in-flight 8
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT), str(ROOT / "app" / "backend")]
+
+import httpx
+from fastapi import FastAPI
+from utils.config import Config
+
+
+class MockGemini:
+    """Stands in for `genai.Client`: fixed latency up to `capacity` concurrent calls, proportionally slower beyond."""
+
+    def __init__(self, latency: float, capacity: int):
+        self.latency = latency
+        self.capacity = capacity
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self.generate_content))
+
+    async def generate_content(self, model, contents, config=None):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency * max(1.0, self.in_flight / self.capacity))
+        finally:
+            self.in_flight -= 1
+        part = SimpleNamespace(text="Exposure is moderate; TSM beat estimates.", function_call=None, thought=False)
+        return SimpleNamespace(
+            candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))],
+            usage_metadata=SimpleNamespace(prompt_token_count=800, candidates_token_count=60),
+        )
+
+
+def build_app(args) -> (FastAPI, MockGemini):
+    import app.backend.agent.agent as agent
+    import app.backend.api.endpoints.orchestrator_api as orchestrator_api
+    from app.backend.services.admission import get_admission
+
+    Config.LLM_MAX_IN_FLIGHT = args.max_in_flight
+    Config.LLM_MAX_QUEUE = args.max_queue
+    Config.LLM_INTERACTIVE_MAX_WAIT_SECONDS = args.interactive_wait
+    get_admission.cache_clear()
+
+    mock = MockGemini(args.llm_latency, args.llm_capacity)
+    agent.llm_service.client = mock
+    agent.intent_router.route = lambda question: None  # always go through the planner
+    agent.gemini_tools = []  # the planner answers directly, so each request is planner + synthesis
+    voice = SimpleNamespace(speak=lambda text: {"audio": None})
+    orchestrator_api.get_voice_model = lambda: voice
+    orchestrator_api.get_brief_scheduler = lambda: SimpleNamespace(lookup=lambda question, watchlist=None: None)
+
+    app = FastAPI()
+    app.include_router(orchestrator_api.router)
+    return app, mock
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def fire(client, priority, tenant, results):
+    start = time.perf_counter()
+    response = await client.post(
+        "/orchestrator/morning_brief",
+        json={"question": "What's our risk exposure in Asia tech stocks today?", "priority": priority},
+        headers={"X-Tenant-ID": tenant},
+    )
+    results[priority].append((response.status_code, (time.perf_counter() - start) * 1000, response.headers.get("retry-after")))
+
+
+def report(label, results, wall):
+    ok = [ms for status, ms, _ in results if status == 200]
+    shed = [ms for status, ms, _ in results if status == 429]
+    line = f"{label:<12} sent={len(results):<4} ok={len(ok):<4} 429={len(shed):<4} throughput={len(ok) / wall:6.1f}/s"
+    if ok:
+        line += f" p50={statistics.median(ok):7.0f}ms p95={percentile(ok, 95):7.0f}ms p99={percentile(ok, 99):7.0f}ms"
+    if shed:
+        retry = sorted({int(r) for status, _, r in results if status == 429 and r})
+        line += f" | 429 p50={statistics.median(shed):5.0f}ms retry-after={retry[0]}..{retry[-1]}s"
+    print(line)
+
+
+async def main(args):
+    app, mock = build_app(args)
+    from app.backend.services.admission import get_admission
+
+    results = defaultdict(list)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        batch = [fire(client, "batch", "precompute", results) for _ in range(args.batch)]
+        interactive = [fire(client, "interactive", f"user{i % args.tenants}", results) for i in range(args.interactive)]
+        await asyncio.gather(*batch, *interactive)
+        wall = time.perf_counter() - start
+
+    print(f"{args.interactive} interactive + {args.batch} batch requests in {wall:.1f}s")
+    report("interactive", results["interactive"], wall)
+    report("batch", results["batch"], wall)
+    print(f"mock LLM: {mock.calls} calls, peak concurrency {mock.peak} (capacity {args.llm_capacity})")
+    print(f"admission: {get_admission().stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interactive", type=int, default=200, help="interactive requests in the spike")
+    parser.add_argument("--batch", type=int, default=100, help="batch requests fired at the same time")
+    parser.add_argument("--tenants", type=int, default=20, help="interactive tenants the requests are spread over")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per mock LLM call under capacity")
+    parser.add_argument("--llm-capacity", type=int, default=8, help="concurrent calls before the mock slows down")
+    parser.add_argument("--max-in-flight", type=int, default=Config.LLM_MAX_IN_FLIGHT)
+    parser.add_argument("--max-queue", type=int, default=Config.LLM_MAX_QUEUE)
+    parser.add_argument("--interactive-wait", type=float, default=Config.LLM_INTERACTIVE_MAX_WAIT_SECONDS)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,104 @@
+"""
+Payload benchmark: response bytes and serialization time for a batch of tickers.
+
+Compares the old path (yfinance `DataFrame.to_dict()` output with timestamp keys, run through
+FastAPI's jsonable_encoder and stdlib json, or `str()`-ed into the agent context) with the
+typed columnar `Bars` payload serialized by orjson. Prices are synthetic so the run is offline.
+
+    python benchmarks/serialization_payloads.py --tickers 500 --bars 78
+"""
+
+import argparse
+import gzip
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT), str(ROOT / "app" / "backend")]
+
+from fastapi.encoders import jsonable_encoder
+from app.backend.api.schema import Bars
+from app.backend.utils.serialization import dumps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+EASTERN = timezone(timedelta(hours=-4))
+
+
+def synthetic_series(bars: int, rng: random.Random):
+    start = datetime(2025, 7, 17, 9, 30, tzinfo=EASTERN)
+    times = [start + timedelta(minutes=5 * i) for i in range(bars)]
+    price = rng.uniform(20, 500)
+    rows = []
+    for _ in times:
+        open_ = price
+        price = max(1.0, price * (1 + rng.gauss(0, 0.002)))
+        rows.append((open_, max(open_, price) * 1.001, min(open_, price) * 0.999, price, rng.randint(1_000, 2_000_000)))
+    return times, rows
+
+
+def legacy_payload(times, rows):
+    """The shape `history().to_dict()` produced: {column: {Timestamp: value}}."""
+    columns = ("Open", "High", "Low", "Close", "Volume")
+    payload = {column: {t: row[i] for t, row in zip(times, rows)} for i, column in enumerate(columns)}
+    payload["Dividends"] = {t: 0.0 for t in times}
+    payload["Stock Splits"] = {t: 0.0 for t in times}
+    return payload
+
+
+def columnar_payload(ticker, times, rows):
+    return Bars(
+        ticker=ticker,
+        interval="5m",
+        t=[int(t.timestamp()) for t in times],
+        o=[round(r[0], 4) for r in rows],
+        h=[round(r[1], 4) for r in rows],
+        l=[round(r[2], 4) for r in rows],
+        c=[round(r[3], 4) for r in rows],
+        v=[r[4] for r in rows],
+    )
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return body, statistics.median(samples)
+
+
+def report(label, body, ms):
+    sizes = f"raw={len(body) / 1024:8.1f}KiB gzip={len(gzip.compress(body, 6)) / 1024:7.1f}KiB"
+    if brotli:
+        sizes += f" br={len(brotli.compress(body, quality=4)) / 1024:7.1f}KiB"
+    print(f"{label:<34} {sizes} serialize={ms:8.1f}ms")
+
+
+def main(args):
+    rng = random.Random(7)
+    series = {f"T{i:03d}": synthetic_series(args.bars, rng) for i in range(args.tickers)}
+    legacy = {ticker: legacy_payload(*data) for ticker, data in series.items()}
+    columnar = [columnar_payload(ticker, *data) for ticker, data in series.items()]
+
+    print(f"{args.tickers} tickers x {args.bars} bars, median of {args.repeat} runs")
+    report("legacy to_dict + json", *timed(lambda: json.dumps(jsonable_encoder(legacy)).encode(), args.repeat))
+    report("legacy to_dict + str (agent ctx)", *timed(lambda: str(legacy).encode(), args.repeat))
+    report("typed columnar + json", *timed(lambda: json.dumps([m.model_dump(exclude_none=True) for m in columnar]).encode(), args.repeat))
+    report("typed columnar + orjson", *timed(lambda: dumps(columnar), args.repeat))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--bars", type=int, default=78, help="bars per ticker (78 = one session of 5m bars)")
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
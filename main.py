@@ -1,40 +1,75 @@
-# Main FastAPI app combining all agent routers
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-
-from services.market_data import router as api_router
-from services.scraping_agent import router as scraping_router
-from services.retrieval import router as retriever_router
-from services.analysis_agent import router as analysis_router
-from services.synthesis import router as language_router
-from services.voice import router as voice_router
-from utils.logging_config import setup_logging
-from orchestrator.orchestrator import router as orchestrator_router
-
-# Call this at the top of your main.py or app entry point
-setup_logging()
-
-app = FastAPI(title="Multi-Agent Finance Assistant")
-
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Or specify your frontend's URL
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-
-# Include all agent routers
-app.include_router(api_router)
-app.include_router(scraping_router)
-app.include_router(retriever_router)
-app.include_router(analysis_router)
-app.include_router(language_router)
-app.include_router(voice_router)
-app.include_router(orchestrator_router)
-
-@app.get("/")
-def root():
-    return {"status": "Multi-Agent Finance Assistant running"}
+# Main FastAPI app combining all agent routers
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from brotli_asgi import BrotliMiddleware
+
+from app.backend.api.endpoints.market_api import router as api_router
+from app.backend.api.endpoints.orchestrator_api import router as orchestrator_router
+from utils.logging_config import setup_logging
+from app.backend.services.news_ingestion import router as ingestion_router, get_news_ingestion
+from app.backend.services.retrieval import router as retriever_router, get_vector_store
+from app.backend.services.scraping_agent import router as scraping_router
+from app.backend.services.market_data import get_market_data
+from app.backend.services.quote_stream import get_quote_hub
+from app.backend.services.brief_precompute import get_brief_scheduler
+from app.backend.services.profiler import router as profiler_router
+from app.backend.utils.shared_state import leader_lock
+from app.backend.utils.serialization import CompactJSONResponse
+from utils.config import Config
+
+# Call this at the top of your main.py or app entry point
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background jobs run on the app's event loop for the lifetime of the server.
+    # With several workers, ingestion and index maintenance live in the index writer
+    # process and only the worker holding the leader lock schedules briefs.
+    if not Config.MULTI_WORKER:
+        if Config.NEWS_INGEST_ENABLED:
+            get_news_ingestion().start()
+        get_vector_store().start_maintenance()
+    if Config.BRIEF_PRECOMPUTE_ENABLED and (not Config.MULTI_WORKER or leader_lock("brief-scheduler")):
+        get_brief_scheduler().start()
+    yield
+    await get_brief_scheduler().stop()
+    await get_news_ingestion().stop()
+    await get_vector_store().stop_maintenance()
+    await get_quote_hub().stop()
+    await get_market_data().aclose()
+
+
+app = FastAPI(title="Multi-Agent Finance Assistant", lifespan=lifespan, default_response_class=CompactJSONResponse)
+
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Or specify your frontend's URL
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+# Small payloads are not worth the CPU; gzip is the fallback for clients without br.
+# Streamed endpoints are left alone: the compressor would hold events back until its buffer fills.
+app.add_middleware(
+    BrotliMiddleware,
+    quality=Config.BROTLI_QUALITY,
+    minimum_size=Config.COMPRESSION_MIN_BYTES,
+    gzip_fallback=True,
+    excluded_handlers=[r"/stream$"],
+)
+
+
+# Include all agent routers
+app.include_router(api_router)
+app.include_router(scraping_router)
+app.include_router(retriever_router)
+app.include_router(orchestrator_router)
+app.include_router(ingestion_router)
+app.include_router(profiler_router)
+
+@app.get("/")
+def root():
+    return {"status": "Multi-Agent Finance Assistant running"}
@@ -0,0 +1,156 @@
+import asyncio
+import time
+import pytest
+from app.backend.services.admission import BATCH, INTERACTIVE, AdmissionController, Overloaded, RequestContext, current_request
+
+def make_controller(max_in_flight=1, max_queue=10, interactive_wait=1.0, batch_wait=5.0):
+    return AdmissionController(max_in_flight, max_queue, {INTERACTIVE: interactive_wait, BATCH: batch_wait})
+
+async def run_in_order(controller, contexts, hold=0.01):
+    order = []
+
+    async def call(context):
+        async with controller.slot(context):
+            order.append(context.tenant)
+            await asyncio.sleep(hold)
+
+    async with controller.slot(RequestContext("holder")):
+        tasks = []
+        for context in contexts:
+            tasks.append(asyncio.create_task(call(context)))
+            await asyncio.sleep(0)  # enqueue in submission order
+    await asyncio.gather(*tasks)
+    return order
+
+def test_interactive_jumps_batch_queue():
+    contexts = [RequestContext("b1", BATCH), RequestContext("b2", BATCH), RequestContext("i1", INTERACTIVE)]
+    assert asyncio.run(run_in_order(make_controller(), contexts)) == ["i1", "b1", "b2"]
+
+def test_tenants_are_served_round_robin():
+    contexts = [RequestContext("a")] * 3 + [RequestContext("b"), RequestContext("c")]
+    assert asyncio.run(run_in_order(make_controller(), contexts)) == ["a", "b", "c", "a", "a"]
+
+def test_in_flight_never_exceeds_limit():
+    controller, peak = make_controller(max_in_flight=3, max_queue=100), [0]
+
+    async def call(i):
+        async with controller.slot(RequestContext(f"t{i % 4}")):
+            peak[0] = max(peak[0], controller.in_flight)
+            await asyncio.sleep(0.005)
+
+    async def main():
+        await asyncio.gather(*(call(i) for i in range(40)))
+
+    asyncio.run(main())
+    assert peak[0] == 3 and controller.in_flight == 0 and controller.waiting == 0
+
+def test_wait_is_capped_by_deadline_and_returns_retry_after():
+    controller = make_controller(interactive_wait=5.0)
+
+    async def main():
+        async with controller.slot(RequestContext("holder")):
+            with pytest.raises(Overloaded) as excinfo:
+                await controller.acquire("late", INTERACTIVE, deadline=time.monotonic() + 0.02)
+            assert excinfo.value.retry_after >= 1
+        assert controller.in_flight == 0 and controller.waiting == 0
+
+    asyncio.run(main())
+    assert controller.timed_out == 1
+
+def test_full_queue_rejects_fast():
+    controller = make_controller(max_queue=1)
+
+    async def main():
+        async with controller.slot(RequestContext("holder")):
+            queued = asyncio.create_task(controller.acquire("a"))
+            await asyncio.sleep(0)
+            with pytest.raises(Overloaded):
+                controller.check(INTERACTIVE)
+            with pytest.raises(Overloaded):
+                await controller.acquire("b")
+        await queued
+        controller.release()
+
+    asyncio.run(main())
+    assert controller.rejected == 2
+
+def test_interactive_displaces_batch_when_queue_is_full():
+    controller = make_controller(max_queue=1)
+
+    async def main():
+        async with controller.slot(RequestContext("holder")):
+            batch = asyncio.create_task(controller.acquire("precompute", BATCH))
+            await asyncio.sleep(0)
+            interactive = asyncio.create_task(controller.acquire("user", INTERACTIVE))
+            await asyncio.sleep(0)
+            with pytest.raises(Overloaded):
+                await batch
+        await interactive
+        controller.release()
+
+    asyncio.run(main())
+    assert controller.in_flight == 0 and controller.waiting == 0
+
+def test_admitted_request_is_not_shed_midway():
+    controller = make_controller(max_queue=1, interactive_wait=0.05)
+
+    async def main():
+        context = controller.admit(RequestContext("user"))
+        async with controller.slot(RequestContext("holder")):
+            follow_on = asyncio.create_task(controller.acquire(context.tenant, context.priority, admitted=True))
+            await asyncio.sleep(0)
+            # The queue is full, yet the admitted call's draft also gets in line
+            draft = asyncio.create_task(controller.acquire(context.tenant, context.priority, admitted=True))
+            await asyncio.sleep(0)
+            assert not draft.done()
+            with pytest.raises(Overloaded):
+                await controller.acquire("newcomer")
+        await follow_on
+        controller.release()
+        await draft
+        controller.release()
+        controller.finish(context)
+
+    asyncio.run(main())
+    assert controller.in_flight == 0 and controller.waiting == 0
+    assert controller.timed_out == 0 and controller.requests[INTERACTIVE] == 0
+
+def test_admitted_calls_still_give_up_at_their_wait_limit():
+    controller = make_controller(interactive_wait=0.02)
+
+    async def main():
+        context = controller.admit(RequestContext("user"))
+        async with controller.slot(RequestContext("holder")):
+            with pytest.raises(Overloaded):
+                await controller.acquire(context.tenant, context.priority, admitted=True)
+
+    asyncio.run(main())
+    assert controller.timed_out == 1
+
+def test_burst_is_shed_before_any_request_queues_a_call():
+    controller = make_controller(max_in_flight=2, max_queue=2, interactive_wait=60.0)
+    contexts = [controller.admit(RequestContext(f"t{i}")) for i in range(4)]
+    with pytest.raises(Overloaded):
+        controller.admit(RequestContext("t4"))
+    controller.finish(contexts[0])
+    with controller.request(RequestContext("t5")) as context:
+        assert context.admitted and current_request.get() == context
+        assert controller.requests[INTERACTIVE] == 4
+    assert current_request.get() is None and controller.requests[INTERACTIVE] == 3
+
+def test_waiters_that_give_up_leave_the_queue():
+    controller = make_controller(max_queue=1, interactive_wait=0.01)
+
+    async def main():
+        async with controller.slot(RequestContext("holder")):
+            with pytest.raises(Overloaded):
+                await controller.acquire("a")
+            cancelled = asyncio.create_task(controller.acquire("b"))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.gather(cancelled, return_exceptions=True)
+            assert controller.queued(INTERACTIVE) == 0
+            assert not controller.queues[INTERACTIVE]
+            assert controller._has_room(BATCH)
+
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+import asyncio
+import orjson
+import pytest
+from types import SimpleNamespace
+from utils.config import Config
+from app.backend.agent import agent
+from app.backend.agent.agent import progress_event, stream_question, tool_event
+
+USAGE = SimpleNamespace(input_tokens=100, output_tokens=20)
+
+class FakeLLM:
+    def __init__(self, verdict="CONTINUE"):
+        self.verdict = verdict
+
+    async def evaluate(self, question, context, choice=None):
+        await asyncio.sleep(0.05)
+        return SimpleNamespace(content=[SimpleNamespace(text=self.verdict)], usage=USAGE)
+
+    async def synthesize(self, question, context, choice=None, on_token=None):
+        for text in ("TSM ", "beat."):
+            await asyncio.sleep(0)
+            if on_token:
+                on_token(text)
+        return SimpleNamespace(content=[SimpleNamespace(text="TSM beat.")], usage=USAGE)
+
+def test_tool_event_passes_json_through():
+    event = tool_event({"name": "get_quote", "args": {"ticker": "TSM"}}, '{"ticker":"TSM","price":101.5}', 0.0123)
+    assert event == {
+        "event": "tool", "name": "get_quote", "args": {"ticker": "TSM"},
+        "ok": True, "result": {"ticker": "TSM", "price": 101.5}, "ms": 12,
+    }
+    assert tool_event({"name": "news", "args": {}}, "No data found", 0)["result"] == "No data found"
+    failed = tool_event({"name": "news", "args": {}}, RuntimeError("upstream down"), 0)
+    assert failed["result"] == {"error": "upstream down"} and not failed["ok"]
+
+def test_progress_event_fields():
+    calls = [{"name": "get_quote", "args": {"ticker": "TSM"}}]
+    routed = progress_event("router", {"plan": "Routed to quote (score 0.91)", "tool_calls": calls})
+    assert routed == {"event": "progress", "stage": "router", "plan": "Routed to quote (score 0.91)", "tools": ["get_quote"], "tool_calls": calls}
+    assert progress_event("toolbox", {"context": []}) == {"event": "progress", "stage": "toolbox", "tools_ok": False}
+    judged = progress_event("evaluator", {"context_enough": "CONTINUE", "output": "draft", "model_log": [{"stage": "evaluator"}]})
+    assert judged["verdict"] == "CONTINUE" and judged["speculative_answer"] and judged["models"] == [{"stage": "evaluator"}]
+
+def test_stream_question_frames_graph_output(monkeypatch):
+    class FakeGraph:
+        async def astream(self, state, config, stream_mode):
+            assert state["stream"] and stream_mode == ["updates", "custom"]
+            yield "updates", {"router": {"tool_calls": []}}
+            yield "custom", {"event": "token", "text": "All quiet."}
+            yield "updates", {"synthesis": {"output": "All quiet.", "model_log": [{"stage": "synthesis"}]}}
+
+    monkeypatch.setattr(agent, "get_graph", lambda: FakeGraph())
+
+    async def collect():
+        return [event async for event in stream_question("Any news?")]
+
+    events = asyncio.run(collect())
+    assert [(event["event"], event.get("stage")) for event in events] == [
+        ("progress", "router"), ("token", None), ("progress", "synthesis"), ("answer", None),
+    ]
+    assert all("ts" in event for event in events)
+    assert all("node_ms" in event for event in events if event["event"] == "progress")
+    assert events[-1]["answer"] == "All quiet." and events[-1]["models"] == [{"stage": "synthesis"}]
+
+@pytest.mark.parametrize("speculate", [True, False])
+def test_stream_reports_each_tool_and_streams_the_answer(monkeypatch, speculate):
+    async def slow(ticker):
+        await asyncio.sleep(0.05)
+        return '{"ticker":"%s","price":101.5}' % ticker
+
+    async def empty(ticker):
+        return "No data found"
+
+    monkeypatch.setitem(agent.TOOL_MAP, "slow_quote", slow)
+    monkeypatch.setitem(agent.TOOL_MAP, "empty_news", empty)
+    monkeypatch.setattr(agent.intent_router, "route", lambda prompt: {
+        "intent": "quote", "score": 0.9,
+        "tool_calls": [{"name": "slow_quote", "args": {"ticker": "TSM"}}, {"name": "empty_news", "args": {"ticker": "TSM"}}],
+    })
+    monkeypatch.setattr(agent, "llm_service", FakeLLM())
+    monkeypatch.setattr(Config, "SPECULATIVE_SYNTHESIS", speculate)
+
+    async def collect():
+        return [event async for event in stream_question("How is TSM doing?")]
+
+    events = asyncio.run(collect())
+    order = [event.get("name") or event.get("stage") or event["event"] for event in events]
+    # Tools report in completion order, before the toolbox node finishes
+    assert order[:4] == ["router", "empty_news", "slow_quote", "toolbox"]
+    assert not events[3]["tools_ok"]
+    # The answer text arrives as tokens whether the evaluator's draft was kept or synthesis ran
+    assert "".join(event["text"] for event in events if event["event"] == "token") == "TSM beat."
+    assert order.index("token") > order.index("toolbox")
+    assert ("synthesis" in order) is not speculate
+    assert events[-1]["event"] == "answer" and events[-1]["answer"] == "TSM beat."
+
+def test_encode_framing():
+    from app.backend.api.endpoints.orchestrator_api import _encode
+    event = {"event": "token", "text": "TSM"}
+    line = _encode(event, start=0.0)
+    assert line.endswith(b"\n") and line.count(b"\n") == 1 and b'"t_ms"' in line
+    message = _encode(event, start=0.0, sse=True)
+    assert message.startswith(b"event: token\ndata: {") and message.endswith(b"}\n\n")
+
+@pytest.fixture
+def client(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.backend.api.endpoints import orchestrator_api
+
+    async def fake_stream(question, latency_budget=None, token_budget=None):
+        yield {"event": "progress", "stage": "router", "ts": 0}
+        yield {"event": "answer", "answer": "All quiet.", "ts": 0}
+
+    monkeypatch.setattr(orchestrator_api, "stream_question", fake_stream)
+    app = FastAPI()
+    app.include_router(orchestrator_api.router)
+    return TestClient(app)
+
+def test_agent_stream_defaults_to_ndjson(client):
+    response = client.post("/orchestrator/agent/stream", json={"question": "Any news?"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [event["event"] for event in events] == ["progress", "answer", "done"]
+    assert all("t_ms" in event for event in events)
+
+@pytest.mark.parametrize("kwargs", [{"params": {"format": "sse"}}, {"headers": {"Accept": "text/event-stream"}}])
+def test_agent_stream_speaks_sse(client, kwargs):
+    response = client.post("/orchestrator/agent/stream", json={"question": "Any news?"}, **kwargs)
+    assert response.headers["content-type"].startswith("text/event-stream")
+    messages = response.text.split("\n\n")[:-1]
+    assert [message.splitlines()[0] for message in messages] == ["event: progress", "event: answer", "event: done"]
+    assert all(message.splitlines()[1].startswith("data: {") for message in messages)
@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from datetime import date
+from utils.config import Config
+from app.backend.services import brief_precompute
+from app.backend.services.brief_precompute import BriefScheduler, BriefStore, drift_reason, normalize_question
+
+def test_normalize_question_ignores_case_and_punctuation():
+    assert normalize_question("What’s our risk exposure in Asia tech stocks today?") == normalize_question(
+        "what s our risk   exposure in asia tech stocks today"
+    )
+
+def test_drift_on_price_move_and_news():
+    old = {"prices": {"TSM": 100.0}, "news": {"TSM": 10}}
+    assert drift_reason(old, {"prices": {"TSM": 100.5}, "news": {"TSM": 11}}) is None
+    assert "TSM moved" in drift_reason(old, {"prices": {"TSM": 102.0}, "news": {"TSM": 10}})
+    assert "news" in drift_reason(old, {"prices": {"TSM": 100.0}, "news": {"TSM": 20}})
+
+def test_brief_store_roundtrip(tmp_path):
+    store = BriefStore(str(tmp_path))
+    day = date(2026, 10, 19)
+    store.put("Asia tech stocks", "Summarize the overnight news.", day, "All quiet.", b"RIFF", {"prices": {}, "news": {}})
+    brief = store.get("Asia tech stocks", "summarize the overnight news", day)
+    assert brief["answer"] == "All quiet."
+    assert brief["audio"] == b"RIFF"
+    store.invalidate("Asia tech stocks", "Summarize the overnight news.", day)
+    assert store.get("Asia tech stocks", "Summarize the overnight news.", day) is None
+
+FINGERPRINT = {"prices": {"TSM": 100.0}, "news": {"TSM": 1}}
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "BRIEF_WATCHLISTS", {"Asia tech stocks": ["TSM"]})
+    monkeypatch.setattr(Config, "BRIEF_QUESTIONS", ["Summarize the overnight news for {watchlist}.", "Any earnings surprises in {watchlist}?"])
+    scheduler = BriefScheduler(BriefStore(str(tmp_path)))
+    scheduler.generated = []
+
+    async def generate(watchlist, question, day):
+        scheduler.generated.append(question)
+        scheduler.store.put(watchlist, question, day, f"Fresh: {question}", None, FINGERPRINT)
+
+    monkeypatch.setattr(scheduler, "generate", generate)
+    return scheduler
+
+def test_lookup_matches_todays_brief(scheduler):
+    question = "Summarize the overnight news for Asia tech stocks."
+    assert scheduler.lookup(question) is None
+    scheduler.store.put("Asia tech stocks", question, scheduler.today(), "All quiet.", None, FINGERPRINT)
+    assert scheduler.lookup("summarize the overnight news for asia tech stocks")["answer"] == "All quiet."
+    assert scheduler.lookup(question, watchlist="US banks") is None
+    assert scheduler.lookup("What moved TSM?") is None
+
+def test_refresh_regenerates_only_stale_briefs(scheduler, monkeypatch):
+    day = scheduler.today()
+    for _, question in scheduler.jobs():
+        scheduler.store.put("Asia tech stocks", question, day, "Old.", None, FINGERPRINT)
+
+    async def unchanged(tickers):
+        return FINGERPRINT
+
+    monkeypatch.setattr(brief_precompute, "take_fingerprint", unchanged)
+    assert asyncio.run(scheduler.refresh()) == {"stale": 0, "regenerated": 0}
+
+    async def moved(tickers):
+        return {"prices": {"TSM": 103.0}, "news": {"TSM": 1}}
+
+    monkeypatch.setattr(brief_precompute, "take_fingerprint", moved)
+    assert asyncio.run(scheduler.refresh()) == {"stale": 2, "regenerated": 2}
+    assert all(brief["answer"].startswith("Fresh") for brief in scheduler.store.entries(day))
+
+def test_restart_keeps_briefs_already_generated_today(scheduler):
+    kept = "Summarize the overnight news for Asia tech stocks."
+    scheduler.store.put("Asia tech stocks", kept, scheduler.today(), "Generated before the restart.", None, FINGERPRINT)
+    assert asyncio.run(scheduler.precompute_all(only_missing=True))["generated"] == 1
+    assert scheduler.generated == ["Any earnings surprises in Asia tech stocks?"]
+    assert scheduler.lookup(kept)["answer"] == "Generated before the restart."
+    assert scheduler.today() in scheduler.generated_days
+    assert asyncio.run(scheduler.precompute_all(only_missing=True))["generated"] == 0
+
+def test_failed_refresh_keeps_serving_the_old_brief(scheduler, monkeypatch):
+    question = "Summarize the overnight news for Asia tech stocks."
+    scheduler.store.put("Asia tech stocks", question, scheduler.today(), "Old.", b"RIFF", FINGERPRINT)
+
+    async def moved(tickers):
+        return {"prices": {"TSM": 103.0}, "news": {"TSM": 1}}
+
+    async def failing(watchlist, question, day):
+        raise RuntimeError("LLM unavailable")
+
+    monkeypatch.setattr(brief_precompute, "take_fingerprint", moved)
+    monkeypatch.setattr(scheduler, "generate", failing)
+    assert asyncio.run(scheduler.refresh()) == {"stale": 1, "regenerated": 0}
+    assert scheduler.lookup(question)["answer"] == "Old."
+
+def test_replacing_a_brief_drops_its_old_audio(tmp_path):
+    store = BriefStore(str(tmp_path))
+    day = date(2026, 10, 19)
+    store.put("Asia tech stocks", "Any news?", day, "Old.", b"RIFF", FINGERPRINT)
+    store.put("Asia tech stocks", "Any news?", day, "New.", None, FINGERPRINT)
+    assert store.get("Asia tech stocks", "Any news?", day)["audio"] is None
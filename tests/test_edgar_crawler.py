@@ -0,0 +1,109 @@
+import asyncio
+import json
+import httpx
+from utils.config import Config
+from app.backend.services.retrieval import VectorStoreService
+from app.backend.services.scraping_agent import EdgarCrawler, RateLimiter, recent_filings
+
+SUBMISSIONS = {
+    "filings": {"recent": {
+        "accessionNumber": ["0001046179-25-000010", "0001046179-25-000007", "0001046179-24-000020"],
+        "form": ["6-K", "20-F", "20-F"],
+        "filingDate": ["2025-05-10", "2025-04-17", "2024-04-18"],
+        "reportDate": ["", "2024-12-31", "2023-12-31"],
+        "primaryDocument": ["a6k.htm", "tsm-20241231.htm", "tsm-20231231.htm"],
+        "primaryDocDescription": ["6-K", "20-F", "20-F"],
+    }},
+}
+DOCUMENT = b"<html><body><script>x()</script><p>Revenue grew   33%.</p><p>Risk factors follow.</p></body></html>"
+
+class FakeStore:
+    def __init__(self):
+        self.chunks = []
+
+    def index_chunks(self, chunks):
+        self.chunks.extend(chunks)
+        return list(range(len(chunks)))
+
+    index_documents = VectorStoreService.index_documents
+
+def make_crawler(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SYMBOLS_FILE", str(tmp_path / "missing.json"))
+    crawler = EdgarCrawler(FakeStore(), cache_dir=str(tmp_path / "edgar"))
+    crawler.limiter = RateLimiter(1000)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        url = str(request.url)
+        if url.endswith("company_tickers.json"):
+            return httpx.Response(200, json={"0": {"cik_str": 1046179, "ticker": "TSM", "title": "Taiwan Semiconductor"}})
+        if "submissions" in url:
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, json=SUBMISSIONS, headers={"ETag": '"v1"'})
+        return httpx.Response(200, content=DOCUMENT)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    crawler.pool.client = lambda: client
+    return crawler, requests
+
+def test_recent_filings_filters_forms_and_builds_archive_urls():
+    filings = recent_filings("TSM", 1046179, SUBMISSIONS, ["20-F"], limit=1)
+    assert [f.accession for f in filings] == ["0001046179-25-000007"]
+    assert filings[0].document_url == "https://www.sec.gov/Archives/edgar/data/1046179/000104617925000007/tsm-20241231.htm"
+    assert filings[0].report_date == "2024-12-31"
+
+def test_backfill_indexes_once_and_never_redownloads(tmp_path, monkeypatch):
+    crawler, requests = make_crawler(tmp_path, monkeypatch)
+    first = asyncio.run(crawler.backfill(["TSM"], ["20-F"], limit=2))
+    assert first["tickers"]["TSM"] == {"filings": 2, "chunks": 2}
+    assert crawler.vector_store.chunks[0].page_content == "Revenue grew 33%.\nRisk factors follow."
+    assert crawler.vector_store.chunks[0].metadata["source"] == "filing"
+    assert len(requests) == 4  # ticker list, submissions, two documents
+
+    second = asyncio.run(crawler.backfill(["TSM"], ["20-F"], limit=2))
+    assert second["tickers"]["TSM"] == {"filings": 2, "chunks": 0}
+    assert len(requests) == 5  # only the conditional GET for submissions
+    assert requests[-1].headers["If-None-Match"] == '"v1"'
+    assert crawler.stats["not_modified"] == 1 and crawler.stats["cache_hits"] == 0  # indexed filings are not reopened
+
+    filing = recent_filings("TSM", 1046179, SUBMISSIONS, ["20-F"], limit=1)[0]
+    assert asyncio.run(crawler.fetch_document(filing)) == "Revenue grew 33%.\nRisk factors follow."
+    assert len(requests) == 5 and crawler.stats["cache_hits"] == 1
+
+def test_rate_limiter_spaces_requests():
+    async def main():
+        limiter = RateLimiter(50)
+        start = asyncio.get_running_loop().time()
+        await asyncio.gather(*(limiter.wait() for _ in range(6)))
+        return asyncio.get_running_loop().time() - start
+
+    assert asyncio.run(main()) >= 0.09
+
+def test_rate_limiter_is_shared_through_its_file(tmp_path):
+    # Two limiters on one file stand in for two worker processes
+    workers = [RateLimiter(50, tmp_path / "edgar-rate"), RateLimiter(50, tmp_path / "edgar-rate")]
+
+    async def main():
+        start = asyncio.get_running_loop().time()
+        await asyncio.gather(*(workers[i % 2].wait() for i in range(6)))
+        return asyncio.get_running_loop().time() - start
+
+    assert asyncio.run(main()) >= 0.09
+
+def test_duplicate_tickers_and_concurrent_fetches_index_once(tmp_path, monkeypatch):
+    crawler, requests = make_crawler(tmp_path, monkeypatch)
+    result = asyncio.run(crawler.backfill(["TSM", "tsm", "TSM"], ["20-F"], limit=2))
+    assert list(result["tickers"]) == ["TSM", "tsm"]
+    assert sum(counts["chunks"] for counts in result["tickers"].values()) == 2
+    assert len(crawler.vector_store.chunks) == 2
+
+    filing = recent_filings("TSM", 1046179, SUBMISSIONS, ["20-F"], limit=1)[0]
+
+    async def fetch_twice():
+        return await asyncio.gather(*(crawler.fetch_path(filing.document_url) for _ in range(2)))
+
+    first, second = asyncio.run(fetch_twice())
+    assert first == second and first.read_bytes() == DOCUMENT
+    assert not list(first.parent.glob("*.part"))
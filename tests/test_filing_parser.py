@@ -0,0 +1,101 @@
+import io
+from app.backend.services.filing_parser import iter_blocks, parse_filing, section_heading
+
+FILING = b"""<html><head><title>10-K</title><style>p {color: red}</style></head><body>
+<div style="display:none"><ix:header><ix:hidden>dei:EntityRegistrantName</ix:hidden></ix:header></div>
+<div><span>Apple Inc.</span> <span>Annual Report</span></div>
+<table><tr><td>Item 1A.</td><td>Risk Factors</td><td>17</td></tr></table>
+<div><span style="font-weight:700">Item 1A. Risk Factors</span></div>
+<p>The Company's business can be affected by macroeconomic conditions.</p>
+<p>Supply chain concentration in <b>Asia</b> is a risk.</p>
+<div><div style="font-weight:700">Item 7. Management&#8217;s Discussion and Analysis</div>
+<div>Net sales increased <ix:nonFraction name="us-gaap:Revenues">2</ix:nonFraction>% year over year.</div></div>
+<div>Item 8. Financial Statements and Supplementary Data</div>
+<table>
+<tr><th>Fiscal year</th><th>2024</th><th>2023</th></tr>
+<tr><td>Net sales</td><td><div>391,035</div></td><td>383,285</td></tr>
+</table>
+</body></html>"""
+
+def parse(chunk_size=400):
+    stream = io.BytesIO(FILING)
+    return list(parse_filing(stream, {"ticker": "AAPL", "form": "10-K"}, chunk_size, 40))
+
+def test_blocks_skip_hidden_and_style_and_keep_order():
+    blocks = list(iter_blocks(io.BytesIO(FILING), read_size=50))
+    assert blocks[0] == ("text", "Apple Inc. Annual Report")
+    assert blocks[1] == ("table", "Item 1A. | Risk Factors | 17")
+    assert ("text", "Net sales increased 2% year over year.") in blocks
+    assert blocks[-1] == ("table", "Fiscal year | 2024 | 2023\nNet sales | 391,035 | 383,285")
+    assert not any("EntityRegistrantName" in text or "color" in text for _, text in blocks)
+
+def test_chunks_carry_sections_and_never_straddle_them():
+    chunks = parse()
+    by_section = {}
+    for chunk in chunks:
+        by_section.setdefault(chunk.metadata["section_title"], []).append(chunk)
+    assert set(by_section) == {"Cover", "Risk Factors", "MD&A", "Financial Statements"}
+    risk = by_section["Risk Factors"][0]
+    assert risk.metadata["section"] == "Item 1A" and risk.metadata["ticker"] == "AAPL"
+    assert "Supply chain concentration in Asia is a risk." in risk.page_content
+    assert "Net sales" not in risk.page_content
+    table = by_section["Financial Statements"][-1]
+    assert table.metadata["kind"] == "table" and "391,035" in table.page_content
+    assert [c.metadata["chunk"] for c in chunks] == list(range(len(chunks)))
+
+def test_section_headings():
+    assert section_heading("ITEM 7A. QUANTITATIVE AND QUALITATIVE DISCLOSURES", "10-K") == ("Item 7A", "Market Risk")
+    assert section_heading("Item 5. Operating and Financial Review and Prospects", "20-F") == ("Item 5", "MD&A")
+    assert section_heading("D. Risk Factors", "20-F") == (None, "Risk Factors")
+    assert section_heading("Item 4 of this report discusses " + "x" * 200, "10-K") is None
+    assert section_heading("Item 1A of this report describes the risks we face.", "10-K") is None
+    assert section_heading("ITEM 1A.", "10-K") == ("Item 1A", "Risk Factors")
+
+def test_inline_text_beside_blocks_keeps_its_place():
+    mixed = (
+        b"<html><body><div><span>Alpha</span> <span>Beta</span><p>Gamma</p> Delta <b>Epsilon</b>"
+        b"<div>Item 7. Management's Discussion and Analysis</div>Zeta</div></body></html>"
+    )
+    assert list(iter_blocks(io.BytesIO(mixed), read_size=7)) == [
+        ("text", "Alpha Beta"), ("text", "Gamma"), ("text", "Delta Epsilon"),
+        ("text", "Item 7. Management's Discussion and Analysis"), ("text", "Zeta"),
+    ]
+    chunks = list(parse_filing(io.BytesIO(mixed), {"form": "10-K"}, 400, 40))
+    assert [(c.metadata["section_title"], c.page_content) for c in chunks] == [
+        ("Cover", "Alpha Beta\nGamma\nDelta Epsilon"),
+        ("MD&A", "Item 7. Management's Discussion and Analysis\nZeta"),
+    ]
+
+def test_empty_document_has_no_blocks():
+    assert list(iter_blocks(io.BytesIO(b""))) == []
+
+def test_index_documents_pulls_chunks_one_batch_at_a_time():
+    from app.backend.services.retrieval import VectorStoreService
+
+    class Store:
+        def __init__(self):
+            self.batches = []
+
+        def index_chunks(self, chunks):
+            self.batches.append(len(chunks))
+            return list(range(len(chunks)))
+
+    pulled = []
+
+    def chunks():
+        for chunk in parse(chunk_size=60):
+            pulled.append(chunk)
+            yield chunk
+
+    store = Store()
+    result = VectorStoreService.index_documents(store, chunks(), batch_size=2)
+    assert result == {"indexed": len(pulled)}
+    assert store.batches[:-1] == [2] * (len(store.batches) - 1) and len(store.batches) > 2
+
+def test_inline_xbrl_xhtml_parses_like_html():
+    xhtml = (
+        b'<?xml version="1.0" encoding="utf-8"?>\n'
+        b'<html xmlns="http://www.w3.org/1999/xhtml" xmlns:ix="http://www.xbrl.org/2013/inlineXBRL">'
+        + FILING.split(b"<html>", 1)[1].replace(b"<div>Item 8", b"<!-- page 40 --><div>Item 8")
+    )
+    assert list(iter_blocks(io.BytesIO(xhtml), read_size=50)) == list(iter_blocks(io.BytesIO(FILING), read_size=50))
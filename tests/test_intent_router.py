@@ -0,0 +1,59 @@
+import hashlib
+import numpy as np
+from app.backend.agent.intent_router import INTENT_EXEMPLARS, IntentRouter
+
+class BagOfWordsEmbeddings:
+    def _vec(self, text):
+        vec = np.zeros(256, dtype="float32")
+        for token in text.lower().replace("?", " ").replace("'s", " ").split():
+            vec[int(hashlib.md5(token.encode()).hexdigest(), 16) % 256] += 1
+        return vec.tolist()
+
+    def embed_query(self, text):
+        return self._vec(text)
+
+    def embed_documents(self, texts):
+        return [self._vec(t) for t in texts]
+
+def make_router():
+    symbols = {"NVDA": "NVIDIA Corp", "TSM": "Taiwan Semiconductor Manufacturing Co Ltd", "AAPL": "Apple Inc.", "TGT": "Target Corp", "A": "Agilent Technologies"}
+    return IntentRouter(BagOfWordsEmbeddings(), symbols, {"Asia tech stocks": ["TSM", "SONY"]})
+
+def test_extracts_tickers_names_topics_and_watchlist():
+    router = make_router()
+    entities = router.extract_entities("Is Apple or $NVDA a buy? A price target, plus technology news for Asia tech stocks")
+    assert entities["tickers"] == ["NVDA", "AAPL"]
+    assert "technology" in entities["topics"]
+    assert entities["watchlist"] == "Asia tech stocks"
+
+def test_routes_earnings_question_without_llm():
+    route = make_router().route("What were NVDA's earnings last quarter?")
+    assert route["intent"] == "earnings"
+    assert route["tool_calls"] == [{"name": "fetch_earnings", "args": {"ticker": "NVDA"}}]
+
+def test_routes_watchlist_exposure_to_every_ticker():
+    question = "What's our risk exposure in Asia tech stocks today, and highlight any earnings surprises?"
+    route = make_router().route(question)
+    assert route["intent"] == "exposure"
+    names = [(call["name"], call["args"].get("ticker")) for call in route["tool_calls"]]
+    assert ("fetch_earnings", "SONY") in names and ("fetch_time_series_market_data", "TSM") in names
+    assert route["tool_calls"][-1] == {"name": "retrieve_from_vector_store", "args": {"query": question}}
+
+def test_defers_when_unsure_or_entities_missing():
+    router = make_router()
+    assert router.route("Explain how the Federal Reserve balance sheet runoff works") is None
+    assert router.route("What were the earnings last quarter?") is None  # no ticker to call the tool with
+    assert router.decisions["deferred"] == 2
+
+def test_intent_words_are_not_masked_as_topics_next_to_a_ticker():
+    router = make_router()
+    question = "What were NVDA's earnings last quarter?"
+    entities = router.extract_entities(question)
+    assert entities["topics"] == []
+    assert router.mask(question, entities) == "What were the company's earnings last quarter?"
+
+    exposure = "What's our risk exposure in Asia tech stocks today, and highlight any earnings surprises?"
+    assert router.mask(exposure, router.extract_entities(exposure)) == INTENT_EXEMPLARS["exposure"][0]
+
+    assert router.extract_entities("Latest earnings news")["topics"] == ["earnings"]
+    assert router.extract_entities("NVDA and the technology sector today")["topics"] == ["technology"]
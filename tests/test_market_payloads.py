@@ -0,0 +1,42 @@
+import orjson
+from app.backend.api.schema import NewsItem
+from app.backend.services.market_data import bars_from_alpha, earnings_from_rows, news_from_alpha, news_from_finnhub
+from app.backend.utils.serialization import compact_json
+
+ALPHA_DAILY = {
+    "Meta Data": {"2. Symbol": "TSM"},
+    "Time Series (Daily)": {
+        "2025-07-17": {"1. open": "240.1", "2. high": "245.0", "3. low": "239.5", "4. close": "244.2", "5. volume": "1200"},
+        "2025-07-16": {"1. open": "238.0", "2. high": "241.0", "3. low": "237.1", "4. close": "240.0", "5. volume": "900"},
+        "2025-06-02": {"1. open": "200.0", "2. high": "201.0", "3. low": "199.0", "4. close": "200.5", "5. volume": "800"},
+    },
+}
+
+def test_alpha_bars_are_columnar_oldest_first_and_trimmed_to_period():
+    bars = bars_from_alpha("TSM", "5d", ALPHA_DAILY)
+    assert bars.c == [240.0, 244.2]
+    assert bars.v == [900, 1200]
+    assert bars.t[0] < bars.t[1]
+    assert len(bars_from_alpha("TSM", "1y", ALPHA_DAILY).t) == 3
+
+def test_alpha_news_is_normalised():
+    feed = news_from_alpha({"feed": [
+        {"title": "TSMC beats", "url": "https://x/1", "time_published": "20250717T063000",
+         "overall_sentiment_score": "0.31", "ticker_sentiment": [{"ticker": "TSM"}]},
+        {"title": "no url"},
+    ]})
+    assert len(feed.items) == 1
+    item = feed.items[0]
+    assert item.published == 1752733800 and item.sentiment == 0.31 and item.tickers == ["TSM"]
+
+def test_finnhub_news_and_earnings_are_normalised():
+    feed = news_from_finnhub([{"headline": "Sony guides up", "url": "https://x/2", "datetime": 1752733800, "related": "SONY,"}])
+    assert feed.items[0].title == "Sony guides up" and feed.items[0].tickers == ["SONY"]
+
+    rows = [{"period": "2025-03-31", "actual": 1.2, "estimate": 1.0, "surprisePercent": 20.0}] * 6
+    earnings = earnings_from_rows("SONY", rows, "period", "actual", "estimate", "surprisePercent")
+    assert len(earnings.quarters) == 4 and earnings.quarters[0].surprise_pct == 20.0
+
+def test_compact_json_drops_none_fields():
+    item = NewsItem(title="t", url="u", source=None, summary=None, tickers=[])
+    assert orjson.loads(compact_json([item])) == [{"title": "t", "url": "u", "tickers": []}]
@@ -0,0 +1,46 @@
+import time
+from types import SimpleNamespace
+from app.backend.services.model_policy import ModelPolicy
+
+TIERS = ["gemini-2.5-pro-latest", "gemini-2.5-flash", "gemini-2.0-flash-001"]
+STAGES = {"planner": "gemini-2.5-pro-latest", "evaluator": "gemini-2.5-pro-latest", "synthesis": "gemini-2.0-flash-001"}
+
+def make_policy():
+    return ModelPolicy(TIERS, STAGES)
+
+def test_generous_budget_keeps_preferred_models():
+    policy = make_policy()
+    budget = policy.new_budget(60, 32000)
+    planner = policy.choose("planner", budget, [])
+    assert planner.model == "gemini-2.5-pro-latest" and not planner.degraded
+    assert planner.thinking_budget >= 128
+    synthesis = policy.choose("synthesis", budget, [])
+    assert synthesis.model == "gemini-2.0-flash-001" and synthesis.thinking_budget is None
+
+def test_tight_deadline_degrades_to_faster_tier():
+    policy = make_policy()
+    choice = policy.choose("planner", policy.new_budget(8, 32000), [])
+    assert choice.degraded and choice.model != "gemini-2.5-pro-latest"
+
+def test_observed_latency_drives_degradation():
+    policy = make_policy()
+    budget = {"started": time.time(), "deadline": time.time() + 20, "tokens": 32000}
+    assert policy.choose("planner", budget, []).model == "gemini-2.5-pro-latest"
+    slow = policy.choose("planner", budget, [])
+    for _ in range(20):
+        policy.observe(slow, 25.0, SimpleNamespace(input_tokens=500, output_tokens=50))
+    assert policy.choose("planner", budget, []).model == "gemini-2.5-flash"
+
+def test_spent_tokens_shrink_max_tokens():
+    policy = make_policy()
+    budget = policy.new_budget(60, 4000)
+    log = [{"input_tokens": 3500, "output_tokens": 200}]
+    choice = policy.choose("synthesis", budget, log)
+    assert choice.max_tokens <= 300
+
+def test_observe_returns_stage_record():
+    policy = make_policy()
+    choice = policy.choose("evaluator", policy.new_budget(), [])
+    entry = policy.observe(choice, 1.25, SimpleNamespace(input_tokens=900, output_tokens=3))
+    assert entry["stage"] == "evaluator" and entry["latency_ms"] == 1250 and entry["input_tokens"] == 900
+    assert policy.stats()["latency_ms"] == {f"evaluator/{choice.model}": 1250}
@@ -0,0 +1,117 @@
+import pytest
+from app.backend.services import news_ingestion
+from app.backend.services.news_ingestion import (
+    DailyCallBudget, NewsIngestionService, SeenUrls, chunk_articles, dedupe_articles, split_text,
+)
+
+ARTICLE = {
+    "url": "https://example.com/nvda-beats",
+    "title": "NVDA beats estimates",
+    "summary": "Nvidia reported revenue well above consensus. " * 40,
+    "time_published": "20250521T203000",
+    "source": "Example Wire",
+    "topics": [{"topic": "Earnings", "relevance_score": "0.9"}, {"topic": "Technology", "relevance_score": "0.5"}],
+    "ticker_sentiment": [{"ticker": "NVDA", "ticker_sentiment_score": "0.4"}],
+    "overall_sentiment_score": 0.31,
+    "overall_sentiment_label": "Somewhat-Bullish",
+}
+
+def test_dedupe_by_url():
+    seen = SeenUrls(max_size=10)
+    articles = list(dedupe_articles([ARTICLE, dict(ARTICLE), {"url": "https://example.com/other"}], seen))
+    assert [a["url"] for a in articles] == ["https://example.com/nvda-beats", "https://example.com/other"]
+
+def test_seen_urls_is_bounded():
+    seen = SeenUrls(max_size=2)
+    for i in range(5):
+        seen.add(f"https://example.com/{i}")
+    assert len(seen) == 2
+    assert seen.add("https://example.com/0")
+
+def test_split_text_overlaps_and_covers_text():
+    text = " ".join(f"word{i}" for i in range(300))
+    chunks = list(split_text(text, chunk_size=200, overlap=40))
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert chunks[0].startswith("word0") and chunks[-1].endswith("word299")
+
+def test_chunks_carry_metadata():
+    chunks = list(chunk_articles([ARTICLE], chunk_size=500, overlap=50))
+    assert len(chunks) > 1
+    metadata = chunks[0].metadata
+    assert metadata["source"] == "news"
+    assert metadata["tickers"] == ["NVDA"]
+    assert metadata["topics"] == ["earnings", "technology"]
+    assert metadata["sentiment_label"] == "Somewhat-Bullish"
+    assert metadata["timestamp"] == 1747859400.0
+
+def test_dedupe_does_not_mark_urls_seen():
+    seen = SeenUrls(max_size=10)
+    assert len(list(dedupe_articles([ARTICLE], seen))) == 1
+    assert ARTICLE["url"] not in seen
+
+class FlakyStore:
+    def __init__(self):
+        self.fail = True
+        self.indexed = []
+
+    def index_chunks(self, chunks):
+        if self.fail:
+            raise RuntimeError("embedding failed")
+        self.indexed += chunks
+        return list(range(len(chunks)))
+
+def test_failed_indexing_retries_articles_on_next_poll(monkeypatch):
+    monkeypatch.setattr(news_ingestion, "poll_news_feed", lambda *args, **kwargs: iter([ARTICLE]))
+    store = FlakyStore()
+    service = NewsIngestionService(store)
+    with pytest.raises(RuntimeError):
+        service.run_once()
+    assert ARTICLE["url"] not in service.seen
+
+    store.fail = False
+    assert service.run_once()["articles"] == 1
+    assert ARTICLE["url"] in service.seen
+    assert service.run_once()["articles"] == 0
+
+def test_daily_call_budget_stops_polling(monkeypatch):
+    calls = []
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"feed": []}
+
+    monkeypatch.setattr(news_ingestion.requests, "get", lambda url, params, timeout: calls.append(params) or Response())
+    budget = DailyCallBudget(max_calls=3)
+    list(news_ingestion.poll_news_feed(["earnings", "technology"], ["TSM", "NVDA"], budget=budget))
+    list(news_ingestion.poll_news_feed(["earnings"], [], budget=budget))
+    assert len(calls) == 3
+    assert budget.used == 3
+
+def test_cursors_only_advance_for_queries_that_came_back(monkeypatch):
+    calls = []
+
+    class Response:
+        def __init__(self, params):
+            self.params = params
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"Note": "rate limited"} if self.params.get("tickers") == "NVDA" else {"feed": []}
+
+    monkeypatch.setattr(news_ingestion.requests, "get", lambda url, params, timeout: calls.append(params) or Response(params))
+    monkeypatch.setattr(news_ingestion.Config, "NEWS_INGEST_MAX_CALLS_PER_DAY", 3)
+    service = NewsIngestionService(FlakyStore())
+    service.run_once(topics=["earnings"], tickers=["TSM", "NVDA", "AAPL"])
+    assert set(service.cursors) == {"topics=earnings", "tickers=TSM"}
+
+    # The next day, the failed and the skipped queries are polled first, from the beginning
+    service.budget.used, calls[:] = 0, []
+    service.run_once(topics=["earnings"], tickers=["TSM", "NVDA", "AAPL"])
+    assert [call.get("tickers") for call in calls] == ["NVDA", "AAPL", None]
+    assert not any("time_from" in call for call in calls[:2]) and "time_from" in calls[2]
+    assert set(service.cursors) == {"topics=earnings", "tickers=TSM", "tickers=AAPL"}
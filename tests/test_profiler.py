@@ -0,0 +1,90 @@
+import asyncio
+import time
+import pytest
+from fastapi import HTTPException
+from utils.config import Config
+from app.backend.services.profiler import (
+    Profiler, authorized, load_profile, require_admin, stage, staged, to_collapsed, to_speedscope,
+)
+
+def burn(seconds):
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+
+def test_request_is_a_noop_when_profiling_is_off():
+    profiler = Profiler()
+    with profiler.request() as session:
+        assert session is None
+    assert profiler.active is None and profiler._thread is None
+
+def test_samples_are_attributed_to_stages_across_loop_and_threads(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SHARED_STATE_DIR", str(tmp_path))
+    profiler = Profiler()
+
+    async def planner():
+        burn(0.15)  # on the event loop thread
+        await asyncio.sleep(0.1)
+
+    async def brief():
+        with profiler.request(force=True) as session:
+            await staged("planner", planner)()
+            with stage("toolbox"):
+                await asyncio.gather(asyncio.to_thread(burn, 0.2), asyncio.to_thread(burn, 0.2))
+            return session
+
+    session = asyncio.run(brief())
+    profiler._thread.join(5)
+    assert profiler.active is None
+
+    profile = load_profile(session.id)
+    stages = profile["summary"]["stages"]
+    assert profile["summary"]["requests"] == 1
+    assert stages["planner"]["cpu_s"] > 0.08 and stages["planner"]["wall_s"] > 0.1
+    assert stages["toolbox"]["cpu_s"] > 0.25  # two worker threads burning at once
+    # The sleep is time the loop spent parked, not planner time
+    assert stages["(event loop idle)"]["wall_s"] > 0.05 and stages["(event loop idle)"]["cpu_s"] < 0.05
+
+    folded = to_collapsed(profile, "cpu").splitlines()
+    assert any(line.startswith("toolbox;asyncio_") and "burn (test_profiler.py" in line for line in folded)
+    speedscope = to_speedscope(profile)
+    assert [p["name"] for p in speedscope["profiles"]] == ["wall time", "cpu time"]
+    frames = speedscope["shared"]["frames"]
+    assert all(0 <= i < len(frames) for sample in speedscope["profiles"][0]["samples"] for i in sample)
+
+def test_only_claimed_requests_are_sampled(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SHARED_STATE_DIR", str(tmp_path))
+    profiler = Profiler()
+
+    async def main():
+        session = profiler.start(requests=1, interval_ms=2)
+
+        async def unprofiled():
+            with stage("other"):
+                await asyncio.to_thread(burn, 0.1)
+
+        other = asyncio.create_task(unprofiled())  # started outside the request's context
+        with profiler.request() as claimed:
+            with stage("mine"):
+                await asyncio.gather(asyncio.to_thread(burn, 0.1), other)
+        with profiler.request() as late:
+            assert late is None
+        return session, claimed
+
+    session, claimed = asyncio.run(main())
+    assert claimed is session
+    profiler._thread.join(5)
+    assert set(load_profile(session.id)["summary"]["stages"]) <= {"mine", "(event loop idle)"}
+
+def test_admin_access_is_denied_without_a_configured_token(monkeypatch):
+    monkeypatch.setattr(Config, "ADMIN_TOKEN", "")
+    assert not authorized("1") and not authorized("") and not authorized(None)
+    with pytest.raises(HTTPException) as excinfo:
+        require_admin(None)
+    assert excinfo.value.status_code == 403
+
+    monkeypatch.setattr(Config, "ADMIN_TOKEN", "s3cret")
+    assert authorized("s3cret") and not authorized("1") and not authorized(None)
+    require_admin("s3cret")
+    with pytest.raises(HTTPException):
+        require_admin("wrong")
@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from utils.config import Config
+from app.backend.services.providers import CircuitBreaker, Provider, ProviderError, ProviderRouter
+
+class FakeProvider(Provider):
+    capabilities = ("quote",)
+
+    def __init__(self, name, delay=0.0, fail=False):
+        super().__init__()
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def quote(self, ticker):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ProviderError(f"{self.name} down")
+        return {"ticker": ticker, "source": self.name}
+
+def test_breaker_opens_then_recovers_after_cooldown(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.backend.services.providers.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=3, error_rate_threshold=0.5, cooldown=30, window=50)
+
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    now[0] += 30
+    assert breaker.allow()  # single half-open probe
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_failed_probe_reopens_breaker(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("app.backend.services.providers.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=1, error_rate_threshold=0.5, cooldown=10, window=50)
+    breaker.record_failure()
+    now[0] += 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+def test_router_falls_through_on_failure(monkeypatch):
+    monkeypatch.setattr(Config, "HEDGING_ENABLED", False)
+    primary, backup = FakeProvider("primary", fail=True), FakeProvider("backup")
+    router = ProviderRouter([primary, backup], {"quote": ["primary", "backup"]})
+
+    name, payload = asyncio.run(router.call("quote", "TSM"))
+    assert name == "backup" and payload["ticker"] == "TSM"
+    assert primary.health.error_rate() == 1.0
+
+def test_router_skips_open_circuit(monkeypatch):
+    primary, backup = FakeProvider("primary"), FakeProvider("backup")
+    primary.breaker.state = CircuitBreaker.OPEN
+    primary.breaker.opened_at = float("inf")
+    router = ProviderRouter([primary, backup], {"quote": ["primary", "backup"]})
+
+    assert asyncio.run(router.call("quote", "TSM"))[0] == "backup"
+    assert primary.calls == 0
+
+def test_router_hedges_slow_primary(monkeypatch):
+    monkeypatch.setattr(Config, "HEDGING_ENABLED", True)
+    monkeypatch.setattr(Config, "HEDGE_DEFAULT_DELAY_SECONDS", 0.05)
+    primary, backup = FakeProvider("primary", delay=5), FakeProvider("backup", delay=0.01)
+    router = ProviderRouter([primary, backup], {"quote": ["primary", "backup"]})
+
+    name, _ = asyncio.run(asyncio.wait_for(router.call("quote", "TSM"), timeout=2))
+    assert name == "backup"
+    assert primary.breaker.state == CircuitBreaker.CLOSED  # losing a hedge race is not a failure
+    # ...but its latency up to the cut-off is kept, and its task has finished by the time call() returns
+    [(latency, ok)] = primary.health.samples
+    assert ok is None and latency >= 0.05
+    assert primary.health.error_rate() == 0.0
+
+def test_cancelled_calls_raise_the_latency_percentile(monkeypatch):
+    monkeypatch.setattr(Config, "PROVIDER_MIN_SAMPLES", 1)
+    provider = FakeProvider("primary")
+    for _ in range(9):
+        provider.health.record(0.01, ok=True)
+    provider.health.record(2.0, ok=None)
+    assert provider.health.latency_percentile(95) == 2.0
+
+def test_router_raises_when_all_providers_fail(monkeypatch):
+    router = ProviderRouter([FakeProvider("a", fail=True), FakeProvider("b", fail=True)], {})
+    with pytest.raises(ProviderError):
+        asyncio.run(router.call("quote", "TSM"))
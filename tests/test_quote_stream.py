@@ -0,0 +1,59 @@
+import asyncio
+from app.backend.api.schema import Quote
+from app.backend.services.quote_stream import QuoteHub, QuoteSubscriber
+
+class FakeMarket:
+    def __init__(self):
+        self.calls = {}
+        self.prices = {"NVDA": 100.0, "TSM": 200.0}
+
+    async def fetch_quote(self, ticker):
+        self.calls[ticker] = self.calls.get(ticker, 0) + 1
+        return Quote(ticker=ticker, price=self.prices[ticker], volume=1000)
+
+def test_upstream_calls_are_per_symbol_not_per_client():
+    market = FakeMarket()
+
+    async def main():
+        hub = QuoteHub(market, interval=0.01, max_tickers=10)
+        clients = [QuoteSubscriber() for _ in range(200)]
+        for client in clients:
+            hub.subscribe(client, ["nvda", "TSM"])
+        await asyncio.sleep(0.055)
+        assert len(hub.pollers) == 2
+        messages = [await client.next_message() for client in clients]
+        await hub.stop()
+        return messages
+
+    messages = asyncio.run(main())
+    assert all(calls <= 7 for calls in market.calls.values())
+    assert messages[0]["quotes"] == messages[-1]["quotes"]
+    assert {q["ticker"] for q in messages[0]["quotes"]} == {"NVDA", "TSM"}
+
+def test_only_changed_fields_are_sent_and_slow_clients_are_coalesced():
+    hub = QuoteHub(FakeMarket(), interval=1, max_tickers=10)
+    client = QuoteSubscriber()
+    client.tickers.add("NVDA")
+    hub.subscribers["NVDA"] = {client}
+
+    hub.publish("NVDA", {"ticker": "NVDA", "price": 100.0, "volume": 1000})
+    hub.publish("NVDA", {"ticker": "NVDA", "price": 100.0, "volume": 1000})  # no change, nothing sent
+    assert asyncio.run(client.next_message()) == {"quotes": [{"ticker": "NVDA", "price": 100.0, "volume": 1000}]}
+
+    hub.publish("NVDA", {"ticker": "NVDA", "price": 101.0, "volume": 1000})
+    hub.publish("NVDA", {"ticker": "NVDA", "price": 102.0, "volume": 1500})
+    assert asyncio.run(client.next_message()) == {"quotes": [{"ticker": "NVDA", "price": 102.0, "volume": 1500}]}
+    assert client.coalesced == 1
+
+def test_last_unsubscribe_stops_the_poller():
+    async def main():
+        hub = QuoteHub(FakeMarket(), interval=0.01, max_tickers=1)
+        a, b = QuoteSubscriber(), QuoteSubscriber()
+        assert hub.subscribe(a, ["NVDA", "TSM"]) == ["NVDA"]  # over the per-client cap
+        hub.subscribe(b, ["NVDA"])
+        hub.unsubscribe(a)
+        assert "NVDA" in hub.pollers
+        hub.unsubscribe(b)
+        assert not hub.pollers and not hub.subscribers
+
+    asyncio.run(main())
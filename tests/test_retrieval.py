@@ -0,0 +1,151 @@
+from app.backend.services.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCS = {
+    0: "TSM reported Q3 FY25 revenue growth driven by AI accelerators",
+    1: "NVDA guidance for Q4 FY25 beat consensus",
+    2: "Apple CUSIP 037833100 bond issuance priced",
+    3: "Semiconductor demand outlook for Asia tech stocks",
+}
+
+def build_index():
+    index = BM25Index()
+    for doc_id, text in DOCS.items():
+        index.add(doc_id, text)
+    return index
+
+def test_tokenizer_keeps_exact_identifiers():
+    assert tokenize("BRK.B and 037833100 in Q3 FY25") == ["brk.b", "037833100", "q3", "fy25"]
+
+def test_bm25_matches_exact_tokens():
+    index = build_index()
+    assert index.search("037833100", k=1)[0][0] == 2
+    assert index.search("Q3 FY25", k=1)[0][0] == 0
+
+def test_bm25_only_scores_candidates():
+    index = build_index()
+    results = index.search("FY25", k=5, candidates={1, 3})
+    assert [doc_id for doc_id, _ in results] == [1]
+
+def test_bm25_remove():
+    index = build_index()
+    index.remove(2, DOCS[2])
+    assert index.search("037833100", k=1) == []
+    assert len(index) == 3
+
+def test_rrf_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]])
+    assert [doc_id for doc_id, _ in fused][:2] == [1, 3]
+
+import pytest
+import time
+from langchain.schema import Document
+from utils.config import Config
+from app.backend.services import retrieval
+
+DAY = 86400
+NOW = time.time()
+
+class FakeEmbeddings:
+    """One dimension per vocabulary word, so distances are predictable."""
+    VOCAB = ["tsm", "nvda", "apple", "revenue", "guidance", "bond", "demand", "test"]
+
+    def __init__(self, **kwargs):
+        pass
+
+    def embed_query(self, text):
+        words = text.lower().split()
+        return [float(words.count(word)) for word in self.VOCAB]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(retrieval, "HuggingFaceEmbeddings", FakeEmbeddings)
+    monkeypatch.setattr(Config, "RETENTION_DAYS", {"news": 30, "filing": 730})
+    monkeypatch.setattr(Config, "VECTOR_STORE_MAX_DOCS", 100)
+    return retrieval.VectorStoreService()
+
+def add(store, text, source="news", age_days=0, ticker=None):
+    metadata = {"source": source, "timestamp": NOW - age_days * DAY}
+    if ticker:
+        metadata["ticker"] = ticker
+    return store.index_chunks([Document(page_content=text, metadata=metadata)])[0]
+
+def result_ids(results):
+    return [r["id"] for r in results["results"]]
+
+def test_deleted_ids_are_excluded_from_search(store):
+    tsm = add(store, "tsm revenue", ticker="TSM")
+    nvda = add(store, "nvda guidance", ticker="NVDA")
+    assert store.delete([tsm]) == 1
+    assert store.tombstones == {tsm}
+    assert store.index.ntotal == 2  # vector stays until compaction
+    for mode in ("dense", "sparse", "hybrid"):
+        assert tsm not in result_ids(store.retrieve("tsm revenue", k=5, mode=mode))
+    assert store.retrieve("tsm", ticker="TSM")["results"] == []
+    assert store.count(start=NOW - DAY) == 1
+    assert result_ids(store.retrieve("nvda", k=5, start=NOW - DAY, mode="dense")) == [nvda]
+
+def test_expiry_follows_each_sources_retention(store):
+    old_news = add(store, "tsm revenue", "news", age_days=31)
+    fresh_news = add(store, "nvda guidance", "news", age_days=29)
+    old_filing = add(store, "apple bond", "filing", age_days=400)
+    ancient_filing = add(store, "tsm demand", "filing", age_days=800)
+    other = add(store, "test", "upload", age_days=5000)
+    assert store.expire(now=NOW) == 2
+    assert set(store.docs) == {fresh_news, old_filing, other}
+    assert {old_news, ancient_filing} <= store.tombstones
+
+def test_capacity_cap_evicts_oldest_first(store, monkeypatch):
+    ids = [add(store, "tsm revenue", age_days=age) for age in (3, 1, 4, 2)]
+    store.delete([ids[2]])  # the oldest is already gone; its timeline entry is stale
+    monkeypatch.setattr(Config, "VECTOR_STORE_MAX_DOCS", 2)
+    assert len(store.docs) == 3  # appends do not evict
+    assert store.enforce_capacity() == 1
+    assert set(store.docs) == {ids[1], ids[3]}
+
+def test_maintenance_prunes_timeline_and_compacts(store, monkeypatch):
+    monkeypatch.setattr(Config, "COMPACTION_THRESHOLD", 0.3)
+    ids = [add(store, text, age_days=i) for i, text in enumerate(["tsm revenue", "nvda guidance", "apple bond", "tsm demand"])]
+    store.delete(ids[:2])
+    result = store.run_maintenance()
+    assert result["removed"] == 2 and result["rebuilt"]
+    assert [doc_id for _, doc_id in store.timeline] == [ids[3], ids[2]]
+    assert store.index.ntotal == 2 and not store.tombstones
+
+def test_compaction_keeps_ids_mapped_to_their_documents(store, monkeypatch):
+    ids = [add(store, text) for text in ["tsm revenue", "nvda guidance", "apple bond", "tsm demand"]]
+    store.delete([ids[0], ids[2]])
+    monkeypatch.setattr(Config, "COMPACTION_THRESHOLD", 1.0)
+    assert store.compact() == {"removed": 2, "rebuilt": False}
+    store.delete([ids[1]])
+    monkeypatch.setattr(Config, "COMPACTION_THRESHOLD", 0.0)
+    assert store.compact() == {"removed": 1, "rebuilt": True}
+
+    assert store.index.ntotal == 1
+    assert store.index.reconstruct(ids[3]).tolist() == FakeEmbeddings().embed_query("tsm demand")
+    assert result_ids(store.retrieve("tsm demand", k=3, mode="dense")) == [ids[3]]
+    assert [doc_id for doc_id, _ in store.sparse.search("tsm", k=5)] == [ids[3]]
+    assert store.sparse.search("apple", k=5) == []
+    # New ids keep counting up, so they never collide with compacted ones
+    assert add(store, "apple bond") == ids[3] + 1
+
+def test_index_writer_publishes_changes_made_outside_rpc(store, tmp_path, monkeypatch):
+    from app.backend.services import index_writer
+
+    monkeypatch.setattr(Config, "SHARED_STATE_DIR", str(tmp_path))
+    writer = index_writer.IndexWriter(store)
+    assert not writer.publish_if_changed()
+    # Ingestion and maintenance call the store directly
+    doc_id = add(store, "tsm revenue")
+    assert writer.publish_if_changed()
+    assert index_writer.current_snapshot_version() == 1
+    assert not writer.publish_if_changed()
+    # A maintenance pass with nothing to expire, prune or compact does not republish the snapshot
+    store.run_maintenance()
+    assert not writer.publish_if_changed()
+    store.delete([doc_id])
+    store.run_maintenance()
+    assert writer.publish_if_changed()
+    assert index_writer.current_snapshot_version() == 2
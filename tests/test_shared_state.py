@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import pytest
+from app.backend.utils import shared_state
+from app.backend.utils.shared_state import SharedCache, shared_cached
+
+def test_shared_cache_ttl(tmp_path):
+    cache = SharedCache(tmp_path / "cache.sqlite3")
+    cache.set("quote:TSM", {"price": 180.5}, ttl=60)
+    assert cache.get("quote:TSM") == {"price": 180.5}
+    cache.set("quote:NVDA", {"price": 120.0}, ttl=-1)
+    assert cache.get("quote:NVDA") is None
+
+def test_shared_cache_is_visible_across_connections(tmp_path):
+    SharedCache(tmp_path / "cache.sqlite3").set("k", "v", ttl=60)
+    assert SharedCache(tmp_path / "cache.sqlite3").get("k") == "v"
+
+def test_shared_cached_decorator(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_state, "get_shared_cache", lambda: SharedCache(tmp_path / "cache.sqlite3"))
+    calls = []
+
+    @shared_cached(ttl=60)
+    def fetch(ticker):
+        calls.append(ticker)
+        return {"ticker": ticker}
+
+    assert fetch("TSM") == fetch("TSM") == {"ticker": "TSM"}
+    assert calls == ["TSM"]
+
+def test_secret_key_is_shared_and_private(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_state.Config, "SHARED_STATE_DIR", str(tmp_path))
+    key = shared_state.secret_key("index-writer")
+    assert len(key) == 64
+    assert shared_state.secret_key("index-writer") == key
+    path = tmp_path / "keys" / "index-writer.key"
+    assert path.stat().st_mode & 0o777 == 0o600
+    path.chmod(0o644)
+    with pytest.raises(PermissionError):
+        shared_state.secret_key("index-writer")
+
+def test_shared_cached_skips_failed_results_and_runs_sqlite_off_the_loop(tmp_path, monkeypatch):
+    cache = SharedCache(tmp_path / "cache.sqlite3")
+    loop_threads = []
+    get = cache.get
+
+    def tracking_get(key):
+        loop_threads.append(threading.get_ident())
+        return get(key)
+
+    monkeypatch.setattr(cache, "get", tracking_get)
+    monkeypatch.setattr(shared_state, "get_shared_cache", lambda: cache)
+    calls = []
+
+    @shared_cached(ttl=60, cache_if=lambda result: result != "No data found")
+    async def fetch(ticker):
+        calls.append(ticker)
+        return "No data found" if len(calls) == 1 else f"{ticker} data"
+
+    async def main():
+        return [await fetch("TSM") for _ in range(3)], threading.get_ident()
+
+    results, loop_thread = asyncio.run(main())
+    assert results == ["No data found", "TSM data", "TSM data"]
+    assert calls == ["TSM", "TSM"]
+    assert loop_thread not in loop_threads
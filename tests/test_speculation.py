@@ -0,0 +1,63 @@
+import asyncio
+from types import SimpleNamespace
+from app.backend.agent.speculation import SpeculationMetrics, evaluate_with_draft, has_data
+
+class FakeLLM:
+    def __init__(self, verdict, eval_delay, draft_delay):
+        self.verdict, self.eval_delay, self.draft_delay = verdict, eval_delay, draft_delay
+        self.draft_cancelled = False
+
+    async def evaluate(self, question, context, choice=None):
+        await asyncio.sleep(self.eval_delay)
+        return SimpleNamespace(content=[SimpleNamespace(text=self.verdict)], usage=SimpleNamespace(input_tokens=100, output_tokens=1))
+
+    async def synthesize(self, question, context, choice=None, on_token=None):
+        try:
+            for text in ("dr", "aft"):
+                await asyncio.sleep(self.draft_delay / 2)
+                if on_token:
+                    on_token(text)
+        except asyncio.CancelledError:
+            self.draft_cancelled = True
+            raise
+        return SimpleNamespace(content=[SimpleNamespace(text="draft")], usage=SimpleNamespace(input_tokens=120, output_tokens=40))
+
+def test_has_data():
+    assert has_data('{"ticker":"TSM","quarters":[{"period":"2025-06-30"}]}')
+    assert has_data("TSMC reported record revenue")
+    assert not has_data("No data found")
+    assert not has_data('{"results":[]}')
+    assert not has_data({"error": "timeout"})
+    assert not has_data(ValueError("boom"))
+
+def test_continue_keeps_draft_and_overlaps_latency():
+    metrics = SpeculationMetrics()
+    verdict, draft = asyncio.run(evaluate_with_draft(FakeLLM("CONTINUE", 0.05, 0.05), "q", ["ctx"], metrics))
+    assert (verdict, draft) == ("CONTINUE", "draft")
+    assert metrics.hits == 1 and metrics.saved_seconds > 0.03
+
+def test_replan_cancels_in_flight_draft():
+    llm, metrics = FakeLLM("REPLAN", 0.01, 1.0), SpeculationMetrics()
+    assert asyncio.run(evaluate_with_draft(llm, "q", ["ctx"], metrics)) == ("REPLAN", None)
+    assert llm.draft_cancelled and metrics.cancelled_drafts == 1
+
+def test_replan_after_finished_draft_counts_wasted_tokens():
+    metrics = SpeculationMetrics()
+    asyncio.run(evaluate_with_draft(FakeLLM("REPLAN", 0.05, 0.0), "q", ["ctx"], metrics))
+    assert metrics.wasted_output_tokens == 40 and metrics.wasted_input_tokens == 120
+
+def test_observe_sees_every_completed_call():
+    observed = []
+    asyncio.run(evaluate_with_draft(
+        FakeLLM("CONTINUE", 0.01, 0.01), "q", ["ctx"], SpeculationMetrics(),
+        eval_choice="eval", draft_choice="draft", observe=lambda choice, seconds, usage: observed.append(choice),
+    ))
+    assert sorted(observed) == ["draft", "eval"]
+
+def test_draft_tokens_are_released_only_once_accepted():
+    tokens = []
+    asyncio.run(evaluate_with_draft(FakeLLM("CONTINUE", 0.05, 0.02), "q", ["ctx"], SpeculationMetrics(), on_token=tokens.append))
+    assert "".join(tokens) == "draft"
+    tokens.clear()
+    asyncio.run(evaluate_with_draft(FakeLLM("REPLAN", 0.05, 0.02), "q", ["ctx"], SpeculationMetrics(), on_token=tokens.append))
+    assert tokens == []
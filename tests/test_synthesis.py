@@ -0,0 +1,30 @@
+import asyncio
+from types import SimpleNamespace
+from app.backend.services.synthesis import LLMService
+
+class FakeModels:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = []
+
+    async def generate_content_stream(self, model, contents, config=None):
+        self.calls.append(model)
+
+        async def stream():
+            for text in self.chunks:
+                await asyncio.sleep(0)
+                yield SimpleNamespace(text=text, usage_metadata=None)
+            yield SimpleNamespace(text=None, usage_metadata=SimpleNamespace(prompt_token_count=900, candidates_token_count=12))
+        return stream()
+
+def test_synthesize_streams_tokens_and_returns_the_full_result():
+    service = LLMService.__new__(LLMService)
+    models = FakeModels(["TSM ", "beat ", "estimates."])
+    service.client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    tokens = []
+
+    result = asyncio.run(service.synthesize("Any earnings surprises?", ["ctx"], on_token=tokens.append))
+    assert tokens == ["TSM ", "beat ", "estimates."]
+    assert result.content[0].text == "TSM beat estimates."
+    assert (result.usage.input_tokens, result.usage.output_tokens) == (900, 12)
+    assert len(models.calls) == 1